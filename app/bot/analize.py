@@ -1,26 +1,26 @@
-import os
+import asyncio
 import uuid
+from dataclasses import dataclass, field
 from datetime import timedelta
-from io import BytesIO
-from aiogram import types, Bot, Router
-from aiogram.types import BufferedInputFile, FSInputFile  # Измененный импорт
-from fastapi import Depends
+from aiogram import Bot, Router
+from aiogram.types import BufferedInputFile  # Измененный импорт
 from loguru import logger
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.config import config
-from app.database.core import get_async_session
 from app.database.query.candidate import create as create_candidate
 from app.database.query.interview import create as create_interview
-from app.database.schema import Candidate
-from app.parsing import document_to_text
+from cv_ai.backends import get_backend
+from cv_ai.config import config as ai_config
 from cv_ai.cv_analyze import ResumeVacancyAnalyze
-from cv_ai.questions_gen import QuestionsGenerator
+from cv_ai.fused import FusedScreener
+from cv_ai.generation import GenerationTimeout
+from cv_ai.metrics import DEGRADED_STAGES, PIPELINE_SECONDS, timer
+from cv_ai.prescreen import similarity_score
+from cv_ai.questions_gen import FALLBACK_QUESTIONS, QuestionsGenerator
 from cv_ai.shrink import Shrinker
+from cv_ai.workers import InferenceProxy, run_inference
 
-# Максимальные значения для проверки архива
-MAX_ZIP_SIZE = 50 * 1024 * 1024  # 50MB
-MAX_RESUMES_IN_ZIP = 10
-MAX_RESUME_SIZE = 10 * 1024 * 1024  # 10MB
+MAX_CAPTION_LENGTH = 1024
 
 router = Router()
 bot = Bot(config.TG_TOKEN)
@@ -33,74 +33,233 @@ def wrap_media(bytesio, filename, **kwargs):
         **kwargs
     )
 
-def prepare_resume_file(resume_bytes: bytes, candidate: Candidate, file_info: dict) -> BufferedInputFile:
+def prepare_resume_file(resume_bytes: bytes, candidate_id: int, file_info: dict) -> BufferedInputFile:
 
-    filename = f"resume_candidate_{candidate.id}{file_info['extension']}"
+    filename = f"resume_candidate_{candidate_id}{file_info['extension']}"
     
     return BufferedInputFile(
         file=resume_bytes,
         filename=filename
     )
 
-async def analyze_resume(
-    message: types.Message,
-    resume_bytes: bytes,
-    vacancy_text: str,
-    file_format: str,
-    session: AsyncSession,
-):
-    shrinker = Shrinker()
+PASS_THRESHOLD = 70.0
+
+
+@dataclass
+class Screening:
+    """Результат LLM-этапов для одного резюме."""
+
+    match_percentage: float
+    questions: list[str] | None = None
+    summary: str | None = None
+    # Этапы, которые не уложились в бюджет времени: HR видит их в подписи
+    degraded: list[str] = field(default_factory=list)
+
+    @property
+    def passed(self) -> bool:
+        return self.match_percentage >= PASS_THRESHOLD
+
+    def degrade(self, name: str, note: str):
+        logger.warning(f"Этап {name} не уложился в бюджет времени: {note}")
+        DEGRADED_STAGES.inc(stage=name)
+        self.degraded.append(note)
+
+
+def stage(name: str):
+    return timer(PIPELINE_SECONDS, stage=name, model=get_backend().model_name)
+
+
+async def screen_resume(
+    resume_text: str, vacancy_text: str, vacancy_shrunk: str | None = None
+) -> Screening:
+    """Оценка резюме и, если оно прошло отбор, вопросы для интервью.
+    vacancy_shrunk — вакансия, сжатая заранее при загрузке."""
+    return (await screen_resumes([resume_text], vacancy_text, vacancy_shrunk))[0]
+
+
+async def screen_resumes(
+    resume_texts: list[str], vacancy_text: str, vacancy_shrunk: str | None = None
+) -> list[Screening]:
+    """screen_resume для нескольких резюме одной вакансии: сжатие и вопросы
+    идут конкурентно, а оценка всех резюме — одним батчем модели."""
+    screenings: list[Screening | None] = [None] * len(resume_texts)
+    if ai_config.PIPELINE_MODE == "fused":
+        with stage("fused"):
+            results = await asyncio.gather(
+                *(
+                    InferenceProxy(FusedScreener).screen(
+                        resume_text, vacancy_text, config.NUMS_OF_QUESTIONS
+                    )
+                    for resume_text in resume_texts
+                )
+            )
+        for index, result in enumerate(results):
+            if result is not None:
+                screenings[index] = Screening(
+                    result["score"], result["questions"], result["summary"]
+                )
+            else:
+                logger.info(
+                    "Fused-ответ не прошёл валидацию, переходим к пошаговому анализу"
+                )
+
+    pending = [index for index, screening in enumerate(screenings) if screening is None]
+    if pending:
+        multistep = await _screen_multistep(
+            [resume_texts[index] for index in pending], vacancy_text, vacancy_shrunk
+        )
+        for index, screening in zip(pending, multistep):
+            screenings[index] = screening
+    return screenings
 
-    resume = document_to_text(resume_bytes, file_format)
 
-    resume = shrinker.resume_shrink(resume)
-    vacancy_text = shrinker.vacancy_shrink(vacancy_text)
+async def _screen_multistep(
+    resume_texts: list[str], vacancy_text: str, vacancy_shrunk: str | None
+) -> list[Screening]:
+    screenings = [Screening(match_percentage=0.0) for _ in resume_texts]
+    shrinker = InferenceProxy(Shrinker)
 
-    cv_analyze = ResumeVacancyAnalyze()
+    async def shrink_resume(screening: Screening, resume_text: str) -> str:
+        try:
+            return await shrinker.resume_shrink(resume_text)
+        except GenerationTimeout:
+            screening.degrade("shrink", "резюме не сжато, взят исходный текст")
+            return await shrinker.truncate(resume_text)
 
-    match_percentage = cv_analyze.analyze_resume_vs_vacancy(resume, vacancy_text)
+    with stage("shrink"):
+        resumes = await asyncio.gather(
+            *(
+                shrink_resume(screening, resume_text)
+                for screening, resume_text in zip(screenings, resume_texts)
+            )
+        )
+        try:
+            vacancy_text = vacancy_shrunk or await shrinker.vacancy_shrink(vacancy_text)
+        except GenerationTimeout:
+            vacancy_text = await shrinker.truncate(vacancy_text)
+            for screening in screenings:
+                screening.degrade("shrink", "вакансия не сжата, взят исходный текст")
+
+    cv_analyze = InferenceProxy(ResumeVacancyAnalyze)
+
+    with stage("score"):
+        try:
+            scores = await cv_analyze.analyze_batch(resumes, vacancy_text)
+        except GenerationTimeout:
+            scores = await asyncio.gather(
+                *(
+                    run_inference(similarity_score, vacancy_text, resume)
+                    for resume in resumes
+                )
+            )
+            for screening in screenings:
+                screening.degrade("score", "оценка по сходству эмбеддингов, без LLM")
+    for screening, score in zip(screenings, scores):
+        screening.match_percentage = score
+
+    qg = InferenceProxy(QuestionsGenerator)
 
-    if match_percentage >= 70.0:
-        candidate = await create_candidate(session=session, cv=resume_bytes, chat_id = str(message.chat.id))
+    async def add_questions(screening: Screening, resume: str):
+        try:
+            screening.questions = await qg.generate_questions(
+                vacancy_text, resume, config.NUMS_OF_QUESTIONS
+            )
+        except GenerationTimeout as e:
+            # Успевшие вопросы оставляем, недостающие берём из общих
+            questions = QuestionsGenerator.parse(e.partial, config.NUMS_OF_QUESTIONS)
+            questions += FALLBACK_QUESTIONS[: config.NUMS_OF_QUESTIONS - len(questions)]
+            screening.questions = questions
+            screening.degrade("questions", "часть вопросов общие, не по резюме")
 
-        qg = QuestionsGenerator()
-        questions = qg.generate_questions(vacancy_text, resume, config.NUMS_OF_QUESTIONS)
+    passed = [
+        (screening, resume)
+        for screening, resume in zip(screenings, resumes)
+        if screening.passed
+    ]
+    if passed:
+        with stage("questions"):
+            await asyncio.gather(
+                *(add_questions(screening, resume) for screening, resume in passed)
+            )
+    return screenings
 
-        alias_id = uuid.uuid4()
 
+async def persist_screening(
+    session: AsyncSession, chat_id: str, resume_bytes: bytes, screening: Screening
+) -> tuple[int, uuid.UUID]:
+    """Сохраняет кандидата и интервью для резюме, прошедшего отбор."""
+    alias_id = uuid.uuid4()
+    with stage("db"):
+        candidate = await create_candidate(session=session, cv=resume_bytes, chat_id=chat_id)
         await create_interview(
             session=session,
             candidate_id=candidate.id,
-            questions=questions,
+            questions=screening.questions,
             expiration_time=timedelta(days=7),
             alias_id=alias_id
         )
+    return candidate.id, alias_id
 
-        file_info = get_file_info(resume_bytes, file_format)
-        caption = prepare_resume_caption(match_percentage, alias_id, candidate_id=candidate.id)
 
-        input_file = prepare_resume_file(resume_bytes, candidate, file_info)
-
-        await message.answer_document(input_file, caption=caption)
-
-        await message.answer(
-            f"✅ Резюме принято! Совпадение: {match_percentage:.1f}%. HR получил уведомление."
-        )
-    else:
-        await message.answer(
+async def notify_screening(
+    bot: Bot,
+    chat_id: int | str,
+    resume_bytes: bytes,
+    file_format: str,
+    screening: Screening,
+    candidate_id: int | None = None,
+    alias_id: uuid.UUID | None = None,
+):
+    # Отправка по chat_id, а не через Message: задачу из очереди в БД
+    # может обработать другая реплика уже после рестарта бота
+    if not screening.passed:
+        await bot.send_message(
+            chat_id,
             f"❌ Резюме {file_format.upper()} не прошло отбор "
-            f"(совпадение {match_percentage:.1f}%)."
+            f"(совпадение {screening.match_percentage:.1f}%)."
         )
+        return
+
+    file_info = get_file_info(resume_bytes, file_format)
+    caption = prepare_resume_caption(
+        screening.match_percentage,
+        alias_id,
+        candidate_id=candidate_id,
+        summary=screening.summary,
+        degraded=screening.degraded,
+    )
+
+    input_file = prepare_resume_file(resume_bytes, candidate_id, file_info)
+
+    with stage("telegram"):
+        await bot.send_document(chat_id, input_file, caption=caption)
+
+    await bot.send_message(
+        chat_id,
+        f"✅ Резюме принято! Совпадение: {screening.match_percentage:.1f}%. HR получил уведомление."
+    )
 
 
-def prepare_resume_caption(match_percentage: float, alias_id: uuid.UUID, candidate_id: int) -> str:
+def prepare_resume_caption(
+    match_percentage: float,
+    alias_id: uuid.UUID,
+    candidate_id: int,
+    summary: str | None = None,
+    degraded: list[str] | None = None,
+) -> str:
     """Prepares the caption for the resume document."""
-    return (
+    caption = (
         "🎯 Новый кандидат прошел первичный отбор!\n\n"
         f"ID кандидата: {candidate_id}\n"
         f"⚡️ Совпадение с вакансией: {match_percentage:.1f}%\n"
         f"🔗 Ссылка на интервью: {config.DOMAIN}/api/v1/deeplink?id={alias_id}\n"
     )
+    if degraded:
+        caption += f"\n⚠️ Упрощённая обработка: {'; '.join(degraded)}\n"
+    if summary:
+        # Подпись к документу в Telegram ограничена 1024 символами
+        caption += f"\n📝 {summary[: MAX_CAPTION_LENGTH - len(caption) - 3]}"
+    return caption
 
 
 def get_file_info(file_bytes: bytes, original_format: str) -> dict:
@@ -0,0 +1,84 @@
+import os
+import tempfile
+import zipfile
+from dataclasses import dataclass, field
+
+from aiogram import Bot
+
+RESUME_EXTENSIONS = (".pdf", ".txt", ".docx", ".doc")
+MAX_RESUME_SIZE = 2 * 1024 * 1024  # 2MB
+# Больше распаковывать не будем, даже если каждый файл по отдельности в лимите
+MAX_UNCOMPRESSED_SIZE = 50 * 1024 * 1024  # 50MB
+# Текст и PDF сжимаются в разы, а не в сотни раз; больше — признак zip-бомбы
+MAX_COMPRESSION_RATIO = 100
+
+
+class ArchiveError(Exception):
+    pass
+
+
+@dataclass
+class ArchiveCheck:
+    """Итог проверки архива по заголовкам, до распаковки."""
+
+    resume_files: list[str] = field(default_factory=list)
+    oversized: list[str] = field(default_factory=list)
+    suspicious: list[str] = field(default_factory=list)
+    encrypted: list[str] = field(default_factory=list)
+    total_size: int = 0
+
+
+async def spool_download(bot: Bot, file_id: str) -> str:
+    """Скачивает файл из Telegram по частям во временный файл на диске
+    и возвращает путь к нему; удалять файл должен вызывающий код."""
+    file = await bot.get_file(file_id)
+    descriptor, path = tempfile.mkstemp(prefix="resumes-", suffix=".zip")
+    os.close(descriptor)
+    try:
+        await bot.download_file(file.file_path, destination=path)
+    except BaseException:
+        remove_quietly(path)
+        raise
+    return path
+
+
+def remove_quietly(path: str | None):
+    if path:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def inspect_archive(path: str, max_member_size: int) -> ArchiveCheck:
+    """Проверяет архив по центральному каталогу, ничего не распаковывая:
+    размер каждого резюме, степень сжатия и суммарный размер после распаковки.
+    BadZipFile пробрасывается вызывающему коду."""
+    check = ArchiveCheck()
+    with zipfile.ZipFile(path) as archive:
+        for info in archive.infolist():
+            if info.is_dir() or not info.filename.lower().endswith(RESUME_EXTENSIONS):
+                continue
+            check.resume_files.append(info.filename)
+            check.total_size += info.file_size
+
+            size = f"{info.filename} ({info.file_size / 1024 / 1024:.1f}MB)"
+            if info.flag_bits & 0x1:
+                check.encrypted.append(info.filename)
+            if info.file_size > max_member_size:
+                check.oversized.append(size)
+            if info.file_size > MAX_COMPRESSION_RATIO * max(info.compress_size, 1):
+                check.suspicious.append(size)
+    return check
+
+
+def read_member(archive: zipfile.ZipFile, name: str, max_size: int) -> bytes:
+    """Читает один файл архива, распаковывая не больше max_size байт:
+    заголовок с заниженным размером не заставит распаковать лишнее."""
+    with archive.open(name) as member:
+        data = member.read(max_size + 1)
+    if len(data) > max_size:
+        raise ArchiveError(
+            f"{name} больше {max_size / 1024 / 1024:.0f}MB после распаковки"
+        )
+    return data
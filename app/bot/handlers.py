@@ -1,25 +1,29 @@
 import zipfile
-from io import BytesIO
 
 from aiogram import F, Router
-from aiogram.filters import Command
+from aiogram.filters import Command, CommandObject
 from aiogram.types import Message
-from fastapi import Depends
 from loguru import logger
-from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.bot.analize import analyze_resume
-from app.database.core import get_async_session
-from app.parsing import document_to_text
-from app.database.core import async_session
+from app.bot.archive import (
+    MAX_COMPRESSION_RATIO,
+    MAX_RESUME_SIZE,
+    MAX_UNCOMPRESSED_SIZE,
+    inspect_archive,
+    remove_quietly,
+    spool_download,
+)
+from app.bot.jobs import QueueFull, ScreeningJob, job_queue
+from app.bot.screening_queue import describe_batch, enqueue_archive
+from app.bot.session_store import enrich_vacancy, parse_vacancy, session_store
+from app.config import config
 
 
 router = Router()
 
 MAX_VACANCY_SIZE = 5 * 1024 * 1024  # 5MB
-MAX_ZIP_SIZE = 10 * 1024 * 1024  # 10MB
-MAX_RESUME_SIZE = 2 * 1024 * 1024  # 2MB
-MAX_RESUMES_IN_ZIP = 10
+MAX_ZIP_SIZE = 20 * 1024 * 1024  # 20MB, предел скачивания для Bot API
+MAX_RESUMES_IN_ZIP = 50
 
 
 @router.message(Command("start", "help"))
@@ -33,9 +37,9 @@ async def cmd_start_help(message: Message):
         "3. Бот проверит загрузку и сообщит, если чего-то не хватает\n\n"
         "⚡ <b>Ограничения:</b>\n"
         "• Вакансия: до 5MB\n"
-        "• Архив: до 10MB\n"
+        "• Архив: до 20MB\n"
         "• Резюме в архиве: до 2MB каждое\n"
-        "• Максимум 10 резюме в архиве\n\n"
+        "• Максимум 50 резюме в архиве\n\n"
         "⚡ <i>Просто отправьте файлы в нужных форматах, и бот сделает всё остальное!</i>"
     )
     await message.answer(welcome_text, parse_mode="HTML")
@@ -64,15 +68,9 @@ async def handle_vacancy_file(message: Message):
         file_name = message.document.file_name
         file_format = file_name.split(".")[-1].lower()
 
-        user_data = user_file_storage.get(message.from_user.id, {})
-        user_data["vacancy_file"] = {
-            "id": message.document.file_id,
-            "name": file_name,
-            "size": file_size,
-            "bytes": file_bytes,  # Сохраняем содержимое файла
-            "format": file_format  # Сохраняем формат файла
-        }
-        user_file_storage[message.from_user.id] = user_data
+        # Храним разобранный текст вакансии, а не байты файла
+        profile = await parse_vacancy(file_name, file_bytes, file_format)
+        await session_store.put(message.from_user.id, profile)
 
         await message.answer(
             f"✅ <b>Вакансия</b> <code>{file_name}</code> <b>принята!</b>\n"
@@ -87,6 +85,18 @@ async def handle_vacancy_file(message: Message):
             f"<code>{str(e)}</code>",
             parse_mode="HTML",
         )
+        return
+
+    # Сжатие и эмбеддинг считаются после ответа; архив, пришедший раньше,
+    # обработается с одним текстом вакансии
+    try:
+        profile = await enrich_vacancy(profile)
+        current = await session_store.get(message.from_user.id)
+        # Пока считали, пользователь мог загрузить другую вакансию
+        if current is not None and current.text == profile.text:
+            await session_store.put(message.from_user.id, profile)
+    except Exception as e:
+        logger.warning(f"Вакансия {file_name} не подготовлена заранее: {e}")
 
 
 @router.message(F.document & F.document.file_name.endswith(".zip"))
@@ -108,71 +118,94 @@ async def handle_resume_zip(
         )
         return
 
-    user_data = user_file_storage.get(user_id, {})
-    if "vacancy_file" not in user_data:
+    vacancy = await session_store.get(user_id)
+    if vacancy is None:
         await message.answer(
             "❌ <b>Сначала загрузите файл с вакансией!</b>\n",
             parse_mode="HTML",
         )
         return
 
+    archive_path = None
     try:
-        file = await message.bot.get_file(message.document.file_id)
-        downloaded = await message.bot.download_file(file.file_path)
+        # Архив скачивается на диск по частям и целиком в память не попадает
+        archive_path = await spool_download(message.bot, message.document.file_id)
+        check = inspect_archive(archive_path, MAX_RESUME_SIZE)
+        resume_files = check.resume_files
 
-        with zipfile.ZipFile(BytesIO(downloaded.read())) as archive:
-            resume_files = [
-                name
-                for name in archive.namelist()
-                if name.lower().endswith((".pdf", ".txt", ".docx", ".doc"))
-            ]
+        if len(resume_files) > MAX_RESUMES_IN_ZIP:
+            await message.answer(
+                f"❌ <b>Слишком много резюме в архиве!</b>\n\n"
+                f"📊 <b>Найдено резюме:</b> {len(resume_files)}\n"
+                f"📏 <b>Максимально разрешено:</b> {MAX_RESUMES_IN_ZIP}\n\n"
+                "📎 Пожалуйста, уменьшите количество резюме в архиве.",
+                parse_mode="HTML",
+            )
+            return
 
-            if len(resume_files) > MAX_RESUMES_IN_ZIP:
-                await message.answer(
-                    f"❌ <b>Слишком много резюме в архиве!</b>\n\n"
-                    f"📊 <b>Найдено резюме:</b> {len(resume_files)}\n"
-                    f"📏 <b>Максимально разрешено:</b> {MAX_RESUMES_IN_ZIP}\n\n"
-                    "📎 Пожалуйста, уменьшите количество резюме в архиве.",
-                    parse_mode="HTML",
-                )
-                return
+        if check.oversized:
+            oversized_list = "\n".join([f"• {file}" for file in check.oversized])
+            await message.answer(
+                f"❌ <b>Некоторые резюме превышают максимальный размер!</b>\n\n"
+                f"📏 <b>Максимальный размер резюме:</b> {MAX_RESUME_SIZE / 1024 / 1024}MB\n\n"
+                f"📎 <b>Файлы с превышением:</b>\n{oversized_list}\n\n"
+                "📎 Пожалуйста, уменьшите размер этих файлов и попробуйте снова.",
+                parse_mode="HTML",
+            )
+            return
 
-            oversized_files = []
-            for resume_name in resume_files:
-                file_info = archive.getinfo(resume_name)
-                if file_info.file_size > MAX_RESUME_SIZE:
-                    oversized_files.append(
-                        f"{resume_name} ({file_info.file_size / 1024 / 1024:.1f}MB)"
-                    )
+        if check.suspicious or check.total_size > MAX_UNCOMPRESSED_SIZE:
+            suspicious_list = "\n".join([f"• {file}" for file in check.suspicious])
+            await message.answer(
+                "❌ <b>Архив распаковывается в слишком большой объём!</b>\n\n"
+                f"📊 <b>После распаковки:</b> {check.total_size / 1024 / 1024:.1f}MB\n"
+                f"📏 <b>Максимум:</b> {MAX_UNCOMPRESSED_SIZE / 1024 / 1024:.0f}MB, "
+                f"сжатие не больше чем в {MAX_COMPRESSION_RATIO} раз\n"
+                f"{suspicious_list}",
+                parse_mode="HTML",
+            )
+            return
 
-            if oversized_files:
-                oversized_list = "\n".join([f"• {file}" for file in oversized_files])
+        if check.encrypted:
+            await message.answer(
+                "❌ <b>Архив защищён паролем!</b>\n\n"
+                "📎 Пожалуйста, загрузите архив без пароля.",
+                parse_mode="HTML",
+            )
+            return
+
+        # Разбор и анализ идут в фоне, хэндлер сразу освобождает event loop
+        if config.SCREENING_QUEUE == "postgres":
+            # Резюме сохраняются в БД, их обработают воркеры любой реплики
+            job_id = await enqueue_archive(
+                message.chat.id,
+                file_name,
+                archive_path,
+                resume_files,
+                vacancy,
+            )
+            queue_text = ""
+        else:
+            job = ScreeningJob(
+                message=message,
+                archive_name=file_name,
+                archive_path=archive_path,
+                resume_files=resume_files,
+                vacancy=vacancy,
+            )
+            try:
+                ahead = job_queue.submit(job)
+            except QueueFull:
                 await message.answer(
-                    f"❌ <b>Некоторые резюме превышают максимальный размер!</b>\n\n"
-                    f"📏 <b>Максимальный размер резюме:</b> {MAX_RESUME_SIZE / 1024 / 1024}MB\n\n"
-                    f"📎 <b>Файлы с превышением:</b>\n{oversized_list}\n\n"
-                    "📎 Пожалуйста, уменьшите размер этих файлов и попробуйте снова.",
+                    "⏳ <b>Очередь обработки заполнена.</b>\n\n"
+                    "📎 Пожалуйста, отправьте архив чуть позже.",
                     parse_mode="HTML",
                 )
                 return
-
-            vacancy_file = user_data["vacancy_file"]
-            vacancy_bytes = vacancy_file["bytes"]
-            vacancy_format = vacancy_file["format"]
-            vacancy_text = document_to_text(vacancy_bytes, vacancy_format)
-
-            for resume_name in resume_files:
-                resume_bytes = archive.read(resume_name)
-                resume_format = resume_name.split(".")[-1].lower()
-                
-                async with async_session() as session, session.begin():
-                    await analyze_resume(
-                        message=message,
-                        resume_bytes=resume_bytes,
-                        vacancy_text=vacancy_text,
-                        file_format=resume_format,
-                        session=session,
-                    )
+            # Теперь временным файлом владеет задача
+            archive_path = None
+            job_id = job.id
+            queue_text = f"📊 <b>Задач перед ней:</b> {ahead}\n"
 
     except zipfile.BadZipFile:
         await message.answer(
@@ -183,24 +216,39 @@ async def handle_resume_zip(
         return
     except Exception as e:
         await message.answer(
-            f"❌ <b>Ошибка при обработке архива!</b>\n\n",
+            "❌ <b>Ошибка при обработке архива!</b>\n\n",
             parse_mode="HTML",
         )
         logger.error(e)
         return
-
-    user_data["resume_zip"] = {
-        "id": message.document.file_id,
-        "name": file_name,
-        "size": file_size,
-    }
-    user_file_storage[user_id] = user_data
+    finally:
+        remove_quietly(archive_path)
 
     await message.answer(
-        f"✅ <b>Архив</b> <code>{file_name}</code> <b>с резюме принят и обработан!</b>",
+        f"✅ <b>Архив</b> <code>{file_name}</code> <b>с резюме принят!</b>\n\n"
+        f"🆔 <b>Задача:</b> <code>{job_id}</code>\n"
+        f"{queue_text}\n"
+        f"Прогресс будет приходить сюда, статус — по команде <code>/job {job_id}</code>.",
         parse_mode="HTML",
     )
 
+
+@router.message(Command("job"))
+async def cmd_job_status(message: Message, command: CommandObject):
+    job_id = (command.args or "").strip()
+    if config.SCREENING_QUEUE == "postgres":
+        text = await describe_batch(job_id)
+    else:
+        job = job_queue.get(job_id)
+        text = job.describe() if job else None
+    if text is None:
+        await message.answer(
+            "❌ <b>Задача не найдена.</b> Укажите id: <code>/job &lt;id&gt;</code>",
+            parse_mode="HTML",
+        )
+        return
+    await message.answer(text, parse_mode="HTML")
+
 @router.message(F.document)
 async def handle_unknown_document(message: Message):
     file_name = message.document.file_name
@@ -219,11 +267,8 @@ async def handle_text(message: Message):
         "• ZIP-архив с резюме (<code>.zip</code>)\n\n"
         "⚡ <b>Ограничения:</b>\n"
         "• Вакансия: до 5MB\n"
-        "• Архив: до 10MB\n"
+        "• Архив: до 20MB\n"
         "• Резюме в архиве: до 2MB каждое\n"
-        "• Максимум 10 резюме в архиве",
+        "• Максимум 50 резюме в архиве",
         parse_mode="HTML",
     )
-
-
-user_file_storage = {}
@@ -0,0 +1,297 @@
+import asyncio
+import uuid
+import zipfile
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import Message
+from loguru import logger
+
+from app.bot.analize import (
+    Screening,
+    notify_screening,
+    persist_screening,
+    screen_resumes,
+    stage,
+)
+from app.bot.archive import MAX_RESUME_SIZE, read_member, remove_quietly
+from app.bot.pipeline import Pipeline, Stage
+from app.bot.session_store import VacancyProfile
+from app.config import config
+from app.database.core import async_session
+from app.parsing import document_to_text
+from cv_ai.config import config as ai_config
+from cv_ai.prescreen import prescreen
+from cv_ai.warmup import readiness
+from cv_ai.workers import run_inference
+
+# Сколько завершённых задач помнить для /job
+MAX_FINISHED_JOBS = 100
+
+STATUS_TEXT = {
+    "queued": "⏳ в очереди",
+    "parsing": "📄 разбор документов",
+    "screening": "🔍 анализ резюме",
+    "done": "✅ завершена",
+    "failed": "❌ ошибка",
+}
+
+
+class QueueFull(Exception):
+    pass
+
+
+@dataclass
+class ScreeningJob:
+    message: Message
+    archive_name: str
+    # Временный файл архива, удаляется после обработки задачи
+    archive_path: str
+    resume_files: list[str]
+    vacancy: VacancyProfile
+    id: str = field(default_factory=lambda: uuid.uuid4().hex[:8])
+    status: str = "queued"
+    processed: int = 0
+    error: str | None = None
+
+    def describe(self) -> str:
+        text = f"Задача <code>{self.id}</code>: {STATUS_TEXT[self.status]}"
+        if self.status in ("screening", "done"):
+            text += f", обработано {self.processed} из {len(self.resume_files)} резюме"
+        return text
+
+
+@dataclass
+class ResumeItem:
+    """Резюме из архива на пути по конвейеру."""
+
+    name: str
+    format: str
+    data: bytes = b""
+    text: str = ""
+    # Сходство с вакансией, если резюме отсеяно предотбором
+    rejected_similarity: float | None = None
+    screening: Screening | None = None
+    candidate_id: int | None = None
+    alias_id: uuid.UUID | None = None
+
+
+class JobQueue:
+    """Очередь скрининга архивов: хэндлер ставит задачу и сразу отвечает,
+    ограниченное число воркеров обрабатывает архивы в фоне и пишет прогресс в чат."""
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = max(1, workers)
+        self._queue: asyncio.Queue[ScreeningJob] | None = None
+        self._max_pending = max_pending
+        self._tasks: list[asyncio.Task] = []
+        self.jobs: OrderedDict[str, ScreeningJob] = OrderedDict()
+
+    def _ensure_workers(self):
+        # Очередь и воркеры создаются в работающем event loop бота
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self._max_pending)
+        if not self._tasks:
+            self._tasks = [
+                asyncio.create_task(self._worker(), name=f"screening-job-{index}")
+                for index in range(self.workers)
+            ]
+
+    def submit(self, job: ScreeningJob) -> int:
+        """Ставит задачу в очередь и возвращает число задач перед ней."""
+        self._ensure_workers()
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise QueueFull from None
+        self.jobs[job.id] = job
+        self._forget_finished()
+        return self._queue.qsize() - 1
+
+    def get(self, job_id: str) -> ScreeningJob | None:
+        return self.jobs.get(job_id)
+
+    def _forget_finished(self):
+        finished = [
+            job_id
+            for job_id, job in self.jobs.items()
+            if job.status in ("done", "failed")
+        ]
+        for job_id in finished[: max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self.jobs[job_id]
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await run_job(job)
+            except Exception as e:
+                job.status = "failed"
+                job.error = str(e)
+                logger.error(f"Ошибка задачи {job.id}: {e}")
+                await job.message.answer(
+                    f"❌ <b>Ошибка при обработке архива</b> <code>{job.archive_name}</code> "
+                    f"(задача <code>{job.id}</code>)",
+                    parse_mode="HTML",
+                )
+            finally:
+                remove_quietly(job.archive_path)
+                self._queue.task_done()
+
+
+async def report(progress: Message, job: ScreeningJob):
+    try:
+        await progress.edit_text(job.describe(), parse_mode="HTML")
+    except TelegramBadRequest as e:
+        # Telegram отклоняет правку без изменений текста
+        logger.debug(f"Прогресс задачи {job.id} не обновлён: {e}")
+
+
+async def run_job(job: ScreeningJob):
+    message = job.message
+    job.status = "parsing"
+    progress = await message.answer(job.describe(), parse_mode="HTML")
+
+    # Вакансия разобрана, сжата и посчитана в эмбеддинг ещё при загрузке
+    vacancy = job.vacancy
+
+    if not readiness.ready:
+        await message.answer(
+            "⏳ Модель ещё загружается. Резюме будут обработаны, "
+            "как только она будет готова."
+        )
+        await readiness.wait()
+
+    job.status = "screening"
+    await report(progress, job)
+
+    archive = zipfile.ZipFile(job.archive_path)
+
+    async def names():
+        for name in job.resume_files:
+            yield ResumeItem(name=name, format=name.split(".")[-1].lower())
+
+    async def extract(item: ResumeItem) -> ResumeItem:
+        # Файлы распаковываются по одному и не больше лимита на резюме
+        item.data = await asyncio.to_thread(
+            read_member, archive, item.name, MAX_RESUME_SIZE
+        )
+        return item
+
+    async def parse(item: ResumeItem) -> ResumeItem:
+        # Разбор PDF/DOCX занимает процессор, поэтому идёт в потоках
+        with stage("parse"):
+            item.text = await asyncio.to_thread(
+                document_to_text, item.data, item.format
+            )
+        return item
+
+    async def prefilter(items: list[ResumeItem]) -> list[ResumeItem]:
+        # Отсекаем явно нерелевантные резюме по эмбеддингам до вызовов LLM
+        with stage("prescreen"):
+            kept, similarities = await run_inference(
+                prescreen,
+                vacancy.text,
+                [item.text for item in items],
+                vacancy_vector=vacancy.vector,
+            )
+        for index, item in enumerate(items):
+            if index not in kept:
+                item.rejected_similarity = float(similarities[index])
+        return items
+
+    async def llm(items: list[ResumeItem]) -> list[ResumeItem]:
+        # Резюме батча оцениваются одним проходом модели
+        kept = [item for item in items if item.rejected_similarity is None]
+        if kept:
+            screenings = await screen_resumes(
+                [item.text for item in kept], vacancy.text, vacancy.shrunk
+            )
+            for item, screening in zip(kept, screenings):
+                item.screening = screening
+        return items
+
+    async def persist(item: ResumeItem) -> ResumeItem:
+        if item.screening is not None and item.screening.passed:
+            async with async_session() as session, session.begin():
+                item.candidate_id, item.alias_id = await persist_screening(
+                    session, str(message.chat.id), item.data, item.screening
+                )
+        return item
+
+    async def notify(item: ResumeItem) -> None:
+        if item.rejected_similarity is not None:
+            await message.answer(
+                f"❌ Резюме <code>{item.name}</code> не прошло предварительный отбор "
+                f"(сходство с вакансией {item.rejected_similarity:.2f}).",
+                parse_mode="HTML",
+            )
+        else:
+            await notify_screening(
+                message.bot,
+                message.chat.id,
+                item.data,
+                item.format,
+                item.screening,
+                item.candidate_id,
+                item.alias_id,
+            )
+        job.processed += 1
+        await report(progress, job)
+
+    async def on_error(stage: Stage, item: ResumeItem, error: Exception):
+        await message.answer(
+            f"❌ Резюме <code>{item.name}</code> не обработано: ошибка на этапе "
+            f"{stage.name}.",
+            parse_mode="HTML",
+        )
+        job.processed += 1
+        await report(progress, job)
+
+    # top-N выбирается среди всех резюме архива, поэтому такой предотбор
+    # дожидается разбора всех файлов; с одним порогом резюме идут потоком
+    top_n = ai_config.PRESCREEN_ENABLED and ai_config.PRESCREEN_TOP_N > 0
+    pipeline = Pipeline(
+        stages=[
+            # ZipFile не потокобезопасен, файлы читаются по одному
+            Stage("extract", extract),
+            Stage("parse", parse, config.PIPELINE_PARSE_CONCURRENCY),
+            Stage("prefilter", prefilter, collect=True)
+            if top_n
+            # Резюме, разобранные почти одновременно, эмбеддятся одним вызовом
+            else Stage(
+                "prefilter",
+                prefilter,
+                batch_size=config.PIPELINE_PREFILTER_BATCH,
+                batch_wait=config.PIPELINE_PREFILTER_WAIT_MS / 1000,
+            ),
+            Stage(
+                "llm",
+                llm,
+                config.PIPELINE_LLM_CONCURRENCY,
+                batch_size=config.PIPELINE_LLM_BATCH,
+                batch_wait=config.PIPELINE_LLM_WAIT_MS / 1000,
+            ),
+            Stage("persist", persist, config.PIPELINE_PERSIST_CONCURRENCY),
+            # Сообщения в один чат отправляются по одному из-за лимитов Telegram
+            Stage("notify", notify),
+        ],
+        queue_size=config.PIPELINE_QUEUE_SIZE,
+        on_error=on_error,
+    )
+    try:
+        await pipeline.run(names())
+    finally:
+        archive.close()
+    logger.info(f"Задача {job.id}, пропускная способность этапов: {pipeline.summary()}")
+
+    job.status = "done"
+    await report(progress, job)
+    await message.answer(
+        f"✅ <b>Архив</b> <code>{job.archive_name}</code> <b>с резюме обработан!</b>",
+        parse_mode="HTML",
+    )
+
+
+job_queue = JobQueue(config.JOB_WORKERS, config.JOB_QUEUE_SIZE)
@@ -0,0 +1,213 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterable, Awaitable, Callable
+
+from loguru import logger
+
+from cv_ai.metrics import PIPELINE_ITEMS
+
+# Маркер конца потока между этапами
+_DONE = object()
+
+
+@dataclass
+class Stage:
+    """Этап конвейера: handler обрабатывает один элемент и возвращает его
+    (или новый) для следующего этапа, None — элемент дальше не идёт.
+    concurrency — сколько элементов этап обрабатывает одновременно.
+    collect — этап ждёт все элементы и получает их списком (нужно, например,
+    для отбора top-N), возвращает список для следующего этапа.
+    batch_size > 1 — этап получает списком до batch_size элементов, собранных
+    не дольше batch_wait секунд после первого, и тоже возвращает список;
+    concurrency тогда — сколько батчей обрабатывается одновременно."""
+
+    name: str
+    handler: Callable[[Any], Awaitable[Any]]
+    concurrency: int = 1
+    collect: bool = False
+    batch_size: int = 1
+    batch_wait: float = 0.0
+
+
+@dataclass
+class StageStats:
+    items: int = 0
+    errors: int = 0
+    busy_seconds: float = 0.0
+    started: float | None = None
+    finished: float | None = None
+
+    @property
+    def throughput(self) -> float:
+        """Элементов в секунду за время, пока этап работал."""
+        if self.started is None or self.finished is None:
+            return 0.0
+        elapsed = self.finished - self.started
+        return self.items / elapsed if elapsed > 0 else 0.0
+
+
+@dataclass
+class Pipeline:
+    """Потоковый конвейер из этапов, связанных ограниченными asyncio.Queue.
+
+    Пока один элемент на LLM-этапе, следующий уже разбирается, а предыдущий
+    сохраняется в БД и отправляется в Telegram. Ограниченные очереди не дают
+    быстрым этапам уйти далеко вперёд медленных. Ошибка на элементе передаётся
+    в on_error и не останавливает остальные.
+    """
+
+    stages: list[Stage]
+    queue_size: int = 4
+    on_error: Callable[[Stage, Any, Exception], Awaitable[None]] | None = None
+    stats: dict[str, StageStats] = field(default_factory=dict)
+
+    async def run(self, source: AsyncIterable[Any]) -> dict[str, StageStats]:
+        self.stats = {stage.name: StageStats() for stage in self.stages}
+        queues = [asyncio.Queue(maxsize=self.queue_size) for _ in self.stages]
+        # Выход последнего этапа никто не читает, он не ограничен
+        queues.append(asyncio.Queue())
+
+        tasks = [asyncio.create_task(self._feed(source, queues[0]))]
+        for index, stage in enumerate(self.stages):
+            tasks.append(
+                asyncio.create_task(
+                    self._run_stage(stage, queues[index], queues[index + 1])
+                )
+            )
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+        return self.stats
+
+    async def _feed(self, source: AsyncIterable[Any], output: asyncio.Queue):
+        try:
+            async for item in source:
+                await output.put(item)
+        finally:
+            await output.put(_DONE)
+
+    async def _run_stage(
+        self, stage: Stage, inbox: asyncio.Queue, outbox: asyncio.Queue
+    ):
+        if stage.collect:
+            await self._run_collect(stage, inbox, outbox)
+            return
+        if stage.batch_size > 1:
+            await self._run_batched(stage, inbox, outbox)
+            return
+        # Работники этапа по очереди гасят друг друга маркером конца,
+        # последний передаёт его следующему этапу
+        remaining = max(1, stage.concurrency)
+
+        async def worker():
+            nonlocal remaining
+            while True:
+                item = await inbox.get()
+                if item is _DONE:
+                    remaining -= 1
+                    await (outbox if remaining == 0 else inbox).put(_DONE)
+                    return
+                result = await self._handle(stage, item, [item])
+                if result is not None:
+                    await outbox.put(result)
+
+        await asyncio.gather(*(worker() for _ in range(remaining)))
+
+    async def _run_batched(
+        self, stage: Stage, inbox: asyncio.Queue, outbox: asyncio.Queue
+    ):
+        # Батчи собирает один цикл: несколько читателей очереди делили бы
+        # элементы между собой, и батчи бы не набирались. Слот занимается
+        # до сбора, так что пока все слоты заняты, следующий батч копится
+        slots = asyncio.Semaphore(max(1, stage.concurrency))
+        running: set[asyncio.Task] = set()
+
+        async def process(items: list[Any]):
+            try:
+                for result in await self._handle(stage, items, items) or []:
+                    await outbox.put(result)
+            finally:
+                slots.release()
+
+        try:
+            finished = False
+            while not finished:
+                await slots.acquire()
+                items, finished = await self._take(stage, inbox)
+                if not items:
+                    slots.release()
+                    continue
+                task = asyncio.create_task(process(items))
+                running.add(task)
+                task.add_done_callback(running.discard)
+            await asyncio.gather(*running)
+        finally:
+            for task in running:
+                task.cancel()
+        await outbox.put(_DONE)
+
+    async def _take(self, stage: Stage, inbox: asyncio.Queue) -> tuple[list[Any], bool]:
+        """Следующие элементы для этапа и признак конца потока. Батч
+        отправляется, как только набран или истекло ожидание после первого
+        элемента: медленный источник не задерживает уже пришедшие."""
+        item = await inbox.get()
+        if item is _DONE:
+            return [], True
+        items = [item]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + stage.batch_wait
+        while len(items) < stage.batch_size:
+            timeout = deadline - loop.time()
+            try:
+                item = (
+                    inbox.get_nowait()
+                    if timeout <= 0
+                    else await asyncio.wait_for(inbox.get(), timeout)
+                )
+            except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                break
+            if item is _DONE:
+                return items, True
+            items.append(item)
+        return items, False
+
+    async def _run_collect(
+        self, stage: Stage, inbox: asyncio.Queue, outbox: asyncio.Queue
+    ):
+        items = []
+        while (item := await inbox.get()) is not _DONE:
+            items.append(item)
+        if items:
+            for result in await self._handle(stage, items, items) or []:
+                await outbox.put(result)
+        await outbox.put(_DONE)
+
+    async def _handle(self, stage: Stage, payload: Any, items: list[Any]):
+        stats = self.stats[stage.name]
+        started = time.perf_counter()
+        if stats.started is None:
+            stats.started = started
+        try:
+            return await stage.handler(payload)
+        except Exception as e:
+            stats.errors += len(items)
+            logger.error(f"Ошибка на этапе {stage.name}: {e}")
+            if self.on_error is not None:
+                for item in items:
+                    await self.on_error(stage, item, e)
+            return None
+        finally:
+            finished = time.perf_counter()
+            stats.items += len(items)
+            stats.busy_seconds += finished - started
+            stats.finished = finished
+            PIPELINE_ITEMS.inc(len(items), stage=stage.name)
+
+    def summary(self) -> str:
+        return ", ".join(
+            f"{name}: {stats.items} шт., {stats.throughput:.2f}/с"
+            for name, stats in self.stats.items()
+        )
@@ -0,0 +1,271 @@
+import asyncio
+import os
+import socket
+import uuid
+import zipfile
+from dataclasses import asdict
+
+from aiogram import Bot
+from loguru import logger
+
+from app.bot.analize import (
+    Screening,
+    notify_screening,
+    persist_screening,
+    screen_resume,
+    stage,
+)
+from app.bot.archive import MAX_RESUME_SIZE, read_member
+from app.bot.jobs import STATUS_TEXT
+from app.bot.session_store import VacancyProfile
+from app.config import config
+from app.database.core import async_session
+from app.database.query import screening_jobs as queries
+from app.database.schema import ScreeningJob
+from app.enums import ScreeningJobState
+from app.parsing import document_to_text
+from cv_ai.prescreen import prescreen
+from cv_ai.warmup import readiness
+from cv_ai.workers import run_inference
+
+
+class LeaseLost(Exception):
+    """Аренда задачи истекла, и её забрал другой воркер."""
+
+
+async def enqueue_archive(
+    chat_id: int | str,
+    archive_name: str,
+    archive_path: str,
+    resume_files: list[str],
+    vacancy: VacancyProfile,
+) -> str:
+    """Ставит каждое резюме архива отдельной задачей в screening_jobs
+    и возвращает id архива для /job. Архив после этого не нужен."""
+    batch_id = uuid.uuid4().hex[:8]
+    # Резюме читаются и вставляются по одному: в памяти не больше одного файла,
+    # а общая транзакция не оставляет в очереди половину архива
+    with zipfile.ZipFile(archive_path) as archive:
+        async with async_session() as session, session.begin():
+            for name in resume_files:
+                data = await asyncio.to_thread(
+                    read_member, archive, name, MAX_RESUME_SIZE
+                )
+                await queries.enqueue(
+                    session,
+                    [
+                        {
+                            "batch_id": batch_id,
+                            "chat_id": str(chat_id),
+                            "archive_name": archive_name,
+                            "resume_name": name,
+                            "resume_format": name.split(".")[-1].lower(),
+                            "resume": data,
+                            "vacancy_text": vacancy.text,
+                            "vacancy_shrunk": vacancy.shrunk,
+                            "vacancy_vector": vacancy.vector,
+                        }
+                    ],
+                )
+    return batch_id
+
+
+async def describe_batch(batch_id: str) -> str | None:
+    async with async_session() as session:
+        progress = await queries.batch_progress(session, batch_id)
+    total = sum(progress.values())
+    if not total:
+        return None
+    processed = progress.get(ScreeningJobState.DONE, 0) + progress.get(
+        ScreeningJobState.FAILED, 0
+    )
+    if processed == total:
+        status = "done"
+    elif processed or progress.get(ScreeningJobState.RUNNING):
+        status = "screening"
+    else:
+        status = "queued"
+    text = f"Задача <code>{batch_id}</code>: {STATUS_TEXT[status]}"
+    if status != "queued":
+        text += f", обработано {processed} из {total} резюме"
+    if failed := progress.get(ScreeningJobState.FAILED):
+        text += f", с ошибкой {failed}"
+    return text
+
+
+async def keep_lease(worker_id: str, job_id: int):
+    """Продлевает аренду, пока задача обрабатывается: долгий LLM-этап
+    не должен выглядеть для других реплик как упавший воркер."""
+    while True:
+        await asyncio.sleep(config.SCREENING_VISIBILITY_TIMEOUT / 3)
+        try:
+            async with async_session() as session, session.begin():
+                extended = await queries.extend(
+                    session, job_id, worker_id, config.SCREENING_VISIBILITY_TIMEOUT
+                )
+        except Exception as e:
+            logger.warning(f"Аренда задачи {job_id} не продлена: {e}")
+            continue
+        if not extended:
+            logger.warning(f"Задачу {job_id} забрал другой воркер")
+            return
+
+
+async def screen_job(worker_id: str, job: ScreeningJob) -> dict:
+    if not readiness.ready:
+        await readiness.wait()
+
+    with stage("parse"):
+        resume_text = await asyncio.to_thread(
+            document_to_text, job.resume, job.resume_format
+        )
+    # Предотбор по порогу: top-N внутри архива здесь не считается,
+    # резюме одного архива обрабатываются разными воркерами
+    with stage("prescreen"):
+        kept, similarities = await run_inference(
+            prescreen,
+            job.vacancy_text,
+            [resume_text],
+            vacancy_vector=job.vacancy_vector,
+        )
+    if not kept:
+        result = {"rejected_similarity": float(similarities[0])}
+    else:
+        screening = await screen_resume(
+            resume_text, job.vacancy_text, job.vacancy_shrunk
+        )
+        result = {"screening": asdict(screening)}
+
+    async with async_session() as session, session.begin():
+        if "screening" in result and screening.passed:
+            candidate_id, alias_id = await persist_screening(
+                session, job.chat_id, job.resume, screening
+            )
+            result.update(candidate_id=candidate_id, alias_id=str(alias_id))
+        # Кандидат и результат коммитятся вместе и только пока аренда наша:
+        # после повтора или перехвата задачи кандидат не создаётся дважды
+        if not await queries.save_result(session, job.id, worker_id, result):
+            raise LeaseLost
+    return result
+
+
+async def notify_job(bot: Bot, job: ScreeningJob, result: dict):
+    if "rejected_similarity" in result:
+        await bot.send_message(
+            job.chat_id,
+            f"❌ Резюме <code>{job.resume_name}</code> не прошло предварительный отбор "
+            f"(сходство с вакансией {result['rejected_similarity']:.2f}).",
+            parse_mode="HTML",
+        )
+        return
+    alias_id = result.get("alias_id")
+    await notify_screening(
+        bot,
+        job.chat_id,
+        job.resume,
+        job.resume_format,
+        Screening(**result["screening"]),
+        result.get("candidate_id"),
+        uuid.UUID(alias_id) if alias_id else None,
+    )
+
+
+async def notify_if_batch_done(bot: Bot, job: ScreeningJob):
+    # Если два воркера закончат последние резюме архива одновременно,
+    # сообщение может прийти дважды — это лучше, чем не прийти вовсе
+    async with async_session() as session:
+        progress = await queries.batch_progress(session, job.batch_id)
+    if progress.get(ScreeningJobState.QUEUED) or progress.get(
+        ScreeningJobState.RUNNING
+    ):
+        return
+    await bot.send_message(
+        job.chat_id,
+        f"✅ <b>Архив</b> <code>{job.archive_name}</code> <b>с резюме обработан!</b>",
+        parse_mode="HTML",
+    )
+
+
+async def give_up(bot: Bot, worker_id: str, job: ScreeningJob, error: str):
+    async with async_session() as session, session.begin():
+        failed = await queries.fail(session, job.id, worker_id, error)
+    if not failed:
+        return
+    logger.error(f"Задача {job.id} не выполнена, попыток: {job.attempts}: {error}")
+    await bot.send_message(
+        job.chat_id,
+        f"❌ Резюме <code>{job.resume_name}</code> не обработано "
+        f"(задача <code>{job.batch_id}</code>).",
+        parse_mode="HTML",
+    )
+    await notify_if_batch_done(bot, job)
+
+
+async def handle_job(bot: Bot, worker_id: str, job: ScreeningJob):
+    if job.attempts > config.SCREENING_MAX_ATTEMPTS:
+        # Воркеры падали на этой задаче, не успев записать ошибку
+        await give_up(
+            bot, worker_id, job, job.last_error or "воркер не завершил задачу"
+        )
+        return
+
+    lease = asyncio.create_task(keep_lease(worker_id, job.id))
+    try:
+        # Результат уже сохранён, если прошлая попытка упала на отправке в Telegram
+        result = job.result or await screen_job(worker_id, job)
+        await notify_job(bot, job, result)
+    except LeaseLost:
+        logger.warning(f"Задача {job.id} обрабатывается другим воркером")
+        return
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        if job.attempts >= config.SCREENING_MAX_ATTEMPTS:
+            await give_up(bot, worker_id, job, error)
+            return
+        delay = min(
+            config.SCREENING_RETRY_BACKOFF * 2 ** (job.attempts - 1),
+            config.SCREENING_RETRY_MAX_DELAY,
+        )
+        logger.warning(
+            f"Ошибка задачи {job.id} (попытка {job.attempts}): {error}, "
+            f"повтор через {delay:.0f} с"
+        )
+        async with async_session() as session, session.begin():
+            await queries.retry(session, job.id, worker_id, error, delay)
+        return
+    finally:
+        lease.cancel()
+
+    async with async_session() as session, session.begin():
+        finished = await queries.finish(session, job.id, worker_id)
+    if finished:
+        await notify_if_batch_done(bot, job)
+
+
+async def worker_loop(bot: Bot, worker_id: str):
+    """Забирает задачи из screening_jobs, пока бот работает. Сбой БД или
+    Telegram не останавливает цикл: задача вернётся в очередь по аренде."""
+    while True:
+        try:
+            async with async_session() as session, session.begin():
+                job = await queries.claim(
+                    session, worker_id, config.SCREENING_VISIBILITY_TIMEOUT
+                )
+            if job is None:
+                await asyncio.sleep(config.SCREENING_POLL_INTERVAL)
+                continue
+            await handle_job(bot, worker_id, job)
+        except Exception as e:
+            logger.error(f"Ошибка воркера очереди {worker_id}: {e}")
+            await asyncio.sleep(config.SCREENING_POLL_INTERVAL)
+
+
+def start_screening_workers(bot: Bot) -> list[asyncio.Task]:
+    # id воркера различает реплики и процессы: по нему проверяется аренда
+    prefix = f"{socket.gethostname()}-{os.getpid()}"
+    return [
+        asyncio.create_task(
+            worker_loop(bot, f"{prefix}-{index}"), name=f"screening-worker-{index}"
+        )
+        for index in range(max(1, config.SCREENING_WORKERS))
+    ]
@@ -0,0 +1,150 @@
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+
+from loguru import logger
+
+from app.bot.analize import stage
+from app.config import config
+from app.database.core import async_session
+from app.database.query import vacancy_sessions as queries
+from app.parsing import document_to_text
+from cv_ai.generation import GenerationTimeout
+from cv_ai.prescreen import embed_vacancy
+from cv_ai.shrink import Shrinker
+from cv_ai.warmup import readiness
+from cv_ai.workers import InferenceProxy, run_inference
+
+
+@dataclass
+class VacancyProfile:
+    """Вакансия пользователя в том виде, в каком она нужна скринингу:
+    текст, сжатая версия и эмбеддинг. Исходный файл не хранится."""
+
+    file_name: str
+    text: str
+    shrunk: str | None = None
+    vector: list[float] | None = None
+
+    @property
+    def size(self) -> int:
+        """Примерный объём в памяти, байт."""
+        shrunk = len(self.shrunk.encode()) if self.shrunk else 0
+        # float в списке Python — это объект плюс указатель, около 32 байт
+        return len(self.text.encode()) + shrunk + 32 * len(self.vector or ())
+
+
+async def parse_vacancy(
+    file_name: str, data: bytes, file_format: str
+) -> VacancyProfile:
+    with stage("parse"):
+        text = await asyncio.to_thread(document_to_text, data, file_format)
+    return VacancyProfile(file_name=file_name, text=text)
+
+
+async def enrich_vacancy(profile: VacancyProfile) -> VacancyProfile:
+    """Сжимает вакансию и считает её эмбеддинг один раз при загрузке,
+    а не на каждый архив. Пока модель грузится, это сделает скрининг."""
+    if not readiness.ready:
+        return profile
+    shrunk = None
+    try:
+        shrunk = await InferenceProxy(Shrinker).vacancy_shrink(profile.text)
+    except GenerationTimeout:
+        logger.warning(f"Вакансия {profile.file_name} не сжата за отведённое время")
+    vector = await run_inference(embed_vacancy, profile.text)
+    return replace(profile, shrunk=shrunk, vector=vector)
+
+
+class SessionStore(ABC):
+    """Вакансии пользователей бота между загрузкой и архивом с резюме."""
+
+    @abstractmethod
+    async def get(self, user_id: int) -> VacancyProfile | None: ...
+
+    @abstractmethod
+    async def put(self, user_id: int, profile: VacancyProfile): ...
+
+
+class MemorySessionStore(SessionStore):
+    """LRU в памяти процесса: вакансия живёт ttl секунд после загрузки,
+    при превышении max_bytes вытесняются давно не использованные."""
+
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # user_id -> (когда истекает, размер при сохранении, вакансия)
+        self._profiles: OrderedDict[int, tuple[float, int, VacancyProfile]] = (
+            OrderedDict()
+        )
+        self._size = 0
+
+    async def get(self, user_id: int) -> VacancyProfile | None:
+        entry = self._profiles.get(user_id)
+        if entry is None:
+            return None
+        expires_at, _, profile = entry
+        if expires_at <= time.monotonic():
+            self._pop(user_id)
+            return None
+        self._profiles.move_to_end(user_id)
+        return profile
+
+    async def put(self, user_id: int, profile: VacancyProfile):
+        self._pop(user_id)
+        now = time.monotonic()
+        for expired in [
+            key
+            for key, (expires_at, _, _) in self._profiles.items()
+            if expires_at <= now
+        ]:
+            self._pop(expired)
+        size = profile.size
+        self._profiles[user_id] = (now + self.ttl, size, profile)
+        self._size += size
+        # Только что загруженную вакансию не вытесняем, даже если она одна больше лимита
+        while self._size > self.max_bytes and len(self._profiles) > 1:
+            self._pop(next(iter(self._profiles)))
+
+    def _pop(self, user_id: int):
+        entry = self._profiles.pop(user_id, None)
+        if entry is not None:
+            self._size -= entry[1]
+
+
+class PostgresSessionStore(SessionStore):
+    """Вакансии в таблице vacancy_sessions: архив может прийти на другую
+    реплику, чем вакансия, и вакансия переживает рестарт бота."""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+
+    async def get(self, user_id: int) -> VacancyProfile | None:
+        async with async_session() as session:
+            row = await queries.get(session, str(user_id), self.ttl)
+            if row is None:
+                return None
+            return VacancyProfile(row.file_name, row.text, row.shrunk, row.vector)
+
+    async def put(self, user_id: int, profile: VacancyProfile):
+        async with async_session() as session, session.begin():
+            await queries.upsert(
+                session,
+                str(user_id),
+                profile.file_name,
+                profile.text,
+                profile.shrunk,
+                profile.vector,
+            )
+            await queries.delete_expired(session, self.ttl)
+
+
+def create_session_store() -> SessionStore:
+    if config.SESSION_STORE == "postgres":
+        return PostgresSessionStore(config.SESSION_TTL)
+    return MemorySessionStore(config.SESSION_MAX_BYTES, config.SESSION_TTL)
+
+
+session_store = create_session_store()
@@ -5,6 +5,7 @@ from loguru import logger
 
 from app.bot.analize import bot
 from app.bot.handlers import router
+from app.bot.screening_queue import start_screening_workers
 from app.config import config
 
 dp = Dispatcher()
@@ -12,6 +13,14 @@ dp.include_router(router)
 
 
 async def start_bot():
+    workers = []
+    if config.SCREENING_QUEUE == "postgres":
+        workers = start_screening_workers(bot)
+        logger.info(f"Воркеров очереди скрининга в БД: {len(workers)}")
     logger.info("Start polling")
-    await dp.start_polling(bot)
+    try:
+        await dp.start_polling(bot)
+    finally:
+        for worker in workers:
+            worker.cancel()
     logger.info("Stop polling")
@@ -1,3 +1,5 @@
+from typing import Literal
+
 from dotenv import load_dotenv
 from pydantic import Field
 from pydantic_settings import BaseSettings
@@ -18,10 +20,6 @@ class Config(BaseSettings):
     PG_LOGIN: str = Field(description="Логин бд в postgresql", default="pg_log")
     PG_PASSWORD: str = Field(description="Пароль бд в postgresql", default="pg_pass")
 
-    OLLAMA_URL: str = Field(
-        description="URL для подключения к ollama", default="http://localhost:11434"
-    )
-    LLM: str = Field(description="Используемая llm", default="llama3")
     API_PORT: int = Field(
         description="Порт сервера uvicorn",
         default=8000,  # Добавлено значение по умолчанию
@@ -38,6 +36,92 @@ class Config(BaseSettings):
         description="",
         default="http://91.209.135.81"
     )
+    JOB_WORKERS: int = Field(
+        description="Сколько архивов с резюме обрабатывается одновременно",
+        default=2,
+    )
+    JOB_QUEUE_SIZE: int = Field(
+        description="Сколько архивов может ждать в очереди на обработку",
+        default=20,
+    )
+    PIPELINE_PARSE_CONCURRENCY: int = Field(
+        description="Сколько резюме архива разбирается одновременно",
+        default=2,
+    )
+    PIPELINE_LLM_CONCURRENCY: int = Field(
+        description="Сколько батчей резюме архива одновременно на LLM-этапах; "
+        "запросы склеиваются планировщиком в батчи",
+        default=4,
+    )
+    PIPELINE_LLM_BATCH: int = Field(
+        description="Сколько резюме архива LLM-этап оценивает одним батчем модели",
+        default=4,
+    )
+    PIPELINE_LLM_WAIT_MS: int = Field(
+        description="Сколько мс LLM-этап ждёт следующие резюме, чтобы собрать батч",
+        default=50,
+    )
+    PIPELINE_PREFILTER_BATCH: int = Field(
+        description="Сколько резюме архива предотбор эмбеддит одним вызовом",
+        default=8,
+    )
+    PIPELINE_PREFILTER_WAIT_MS: int = Field(
+        description="Сколько мс предотбор ждёт следующие резюме, чтобы собрать батч",
+        default=50,
+    )
+    PIPELINE_PERSIST_CONCURRENCY: int = Field(
+        description="Сколько резюме архива одновременно сохраняется в БД",
+        default=2,
+    )
+    PIPELINE_QUEUE_SIZE: int = Field(
+        description="Размер очереди между этапами обработки архива",
+        default=4,
+    )
+    SCREENING_QUEUE: Literal["memory", "postgres"] = Field(
+        description="Очередь скрининга: memory — в процессе бота, postgres — "
+        "таблица screening_jobs, общая для всех реплик и переживающая рестарт",
+        default="memory",
+    )
+    SCREENING_WORKERS: int = Field(
+        description="Сколько резюме из очереди postgres обрабатывает одна реплика",
+        default=4,
+    )
+    SCREENING_VISIBILITY_TIMEOUT: float = Field(
+        description="Аренда задачи воркером в секундах: если воркер не продлил её, "
+        "задачу забирает другой",
+        default=300,
+    )
+    SCREENING_MAX_ATTEMPTS: int = Field(
+        description="Сколько раз пробовать обработать резюме до отказа",
+        default=3,
+    )
+    SCREENING_RETRY_BACKOFF: float = Field(
+        description="Задержка перед первым повтором в секундах, "
+        "дальше удваивается с каждой попыткой",
+        default=30,
+    )
+    SCREENING_RETRY_MAX_DELAY: float = Field(
+        description="Максимальная задержка перед повтором в секундах",
+        default=600,
+    )
+    SCREENING_POLL_INTERVAL: float = Field(
+        description="Пауза воркера в секундах, когда в очереди postgres нет задач",
+        default=2,
+    )
+    SESSION_STORE: Literal["memory", "postgres"] = Field(
+        description="Где хранится загруженная вакансия пользователя: memory — "
+        "в процессе бота, postgres — таблица vacancy_sessions, общая для реплик",
+        default="memory",
+    )
+    SESSION_MAX_BYTES: int = Field(
+        description="Предел памяти под вакансии пользователей в режиме memory; "
+        "сверх него вытесняются давно не использованные",
+        default=64 * 1024**2,
+    )
+    SESSION_TTL: float = Field(
+        description="Сколько секунд вакансия хранится после загрузки",
+        default=24 * 60 * 60,
+    )
     class Config:
         env_file = ".env"
         case_sensitive = False
@@ -1 +1,7 @@
-from app.database.query import candidate, interview, questions
+from app.database.query import (
+    candidate,
+    interview,
+    questions,
+    screening_jobs,
+    vacancy_sessions,
+)
@@ -18,6 +18,37 @@ async def get_questions(session: AsyncSession, interview_id: int) -> list[Questi
     )
 
 
+async def get_question(session: AsyncSession, question_id: int) -> Question | None:
+    return await session.get(Question, question_id)
+
+
+async def set_answer(session: AsyncSession, question_id: int, answer: str) -> None:
+    stmt = (
+        update(Question)
+        .where(Question.id == question_id)
+        .values({Question.answer: answer, Question.score: None, Question.comment: None})
+    )
+    await session.execute(stmt)
+    await session.flush()
+
+
+async def set_score(
+    session: AsyncSession,
+    question_id: int,
+    answer: str,
+    score: float | None,
+    comment: str,
+) -> None:
+    # Если ответ успели переписать, оценка старого ответа не сохраняется
+    stmt = (
+        update(Question)
+        .where(Question.id == question_id, Question.answer == answer)
+        .values({Question.score: score, Question.comment: comment})
+    )
+    await session.execute(stmt)
+    await session.flush()
+
+
 async def set_answers(session: AsyncSession, update_data: list[dict[str, Any]]) -> None:
     await session.execute(update(Question), update_data)
     await session.flush()
@@ -0,0 +1,131 @@
+from datetime import timedelta
+
+from sqlalchemy import and_, func, insert, or_, select, update
+from sqlalchemy.ext.asyncio.session import AsyncSession
+
+from app.database.schema import ScreeningJob
+from app.enums import ScreeningJobState
+
+
+async def enqueue(session: AsyncSession, jobs: list[dict]) -> None:
+    await session.execute(insert(ScreeningJob), jobs)
+    await session.flush()
+
+
+async def claim(
+    session: AsyncSession, worker_id: str, visibility_timeout: float
+) -> ScreeningJob | None:
+    """Забирает одну готовую к запуску задачу: из очереди или ту, чей воркер
+    не продлил аренду (упал или завис). SKIP LOCKED пропускает строки,
+    которые прямо сейчас забирают другие воркеры, поэтому реплики не ждут
+    друг друга и не получают одну задачу дважды."""
+    now = func.now()
+    claimable = (
+        select(ScreeningJob.id)
+        .where(
+            or_(
+                and_(
+                    ScreeningJob.state == ScreeningJobState.QUEUED,
+                    ScreeningJob.run_after <= now,
+                ),
+                and_(
+                    ScreeningJob.state == ScreeningJobState.RUNNING,
+                    ScreeningJob.locked_until < now,
+                ),
+            )
+        )
+        .order_by(ScreeningJob.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    stmt = (
+        update(ScreeningJob)
+        .where(ScreeningJob.id == claimable)
+        .values(
+            state=ScreeningJobState.RUNNING,
+            attempts=ScreeningJob.attempts + 1,
+            locked_by=worker_id,
+            locked_until=now + timedelta(seconds=visibility_timeout),
+        )
+        .returning(ScreeningJob)
+    )
+    job = (await session.execute(stmt)).scalar()
+    if job is not None:
+        # Задача обрабатывается после коммита, вне этой сессии
+        session.expunge(job)
+    return job
+
+
+def _owned(job_id: int, worker_id: str):
+    # Если аренда истекла и задачу забрал другой воркер, прежний её не трогает
+    return and_(
+        ScreeningJob.id == job_id,
+        ScreeningJob.locked_by == worker_id,
+        ScreeningJob.state == ScreeningJobState.RUNNING,
+    )
+
+
+async def extend(
+    session: AsyncSession, job_id: int, worker_id: str, visibility_timeout: float
+) -> bool:
+    """Продлевает аренду; False — задачу уже забрал другой воркер."""
+    stmt = (
+        update(ScreeningJob)
+        .where(_owned(job_id, worker_id))
+        .values(locked_until=func.now() + timedelta(seconds=visibility_timeout))
+    )
+    return (await session.execute(stmt)).rowcount > 0
+
+
+async def save_result(
+    session: AsyncSession, job_id: int, worker_id: str, result: dict
+) -> bool:
+    stmt = update(ScreeningJob).where(_owned(job_id, worker_id)).values(result=result)
+    return (await session.execute(stmt)).rowcount > 0
+
+
+async def finish(session: AsyncSession, job_id: int, worker_id: str) -> bool:
+    stmt = (
+        update(ScreeningJob)
+        .where(_owned(job_id, worker_id))
+        .values(state=ScreeningJobState.DONE, locked_until=None, last_error=None)
+    )
+    return (await session.execute(stmt)).rowcount > 0
+
+
+async def retry(
+    session: AsyncSession, job_id: int, worker_id: str, error: str, delay: float
+) -> bool:
+    stmt = (
+        update(ScreeningJob)
+        .where(_owned(job_id, worker_id))
+        .values(
+            state=ScreeningJobState.QUEUED,
+            run_after=func.now() + timedelta(seconds=delay),
+            locked_until=None,
+            locked_by=None,
+            last_error=error,
+        )
+    )
+    return (await session.execute(stmt)).rowcount > 0
+
+
+async def fail(session: AsyncSession, job_id: int, worker_id: str, error: str) -> bool:
+    stmt = (
+        update(ScreeningJob)
+        .where(_owned(job_id, worker_id))
+        .values(state=ScreeningJobState.FAILED, locked_until=None, last_error=error)
+    )
+    return (await session.execute(stmt)).rowcount > 0
+
+
+async def batch_progress(
+    session: AsyncSession, batch_id: str
+) -> dict[ScreeningJobState, int]:
+    stmt = (
+        select(ScreeningJob.state, func.count())
+        .where(ScreeningJob.batch_id == batch_id)
+        .group_by(ScreeningJob.state)
+    )
+    return {state: count for state, count in (await session.execute(stmt)).all()}
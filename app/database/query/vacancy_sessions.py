@@ -0,0 +1,47 @@
+from datetime import timedelta
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio.session import AsyncSession
+
+from app.database.schema import VacancySession
+
+
+async def upsert(
+    session: AsyncSession,
+    user_id: str,
+    file_name: str,
+    text: str,
+    shrunk: str | None,
+    vector: list[float] | None,
+) -> None:
+    values = {"file_name": file_name, "text": text, "shrunk": shrunk, "vector": vector}
+    stmt = (
+        insert(VacancySession)
+        .values(user_id=user_id, **values)
+        .on_conflict_do_update(
+            index_elements=[VacancySession.user_id],
+            set_={**values, "updated_at": func.now()},
+        )
+    )
+    await session.execute(stmt)
+    await session.flush()
+
+
+async def get(session: AsyncSession, user_id: str, ttl: float) -> VacancySession | None:
+    stmt = (
+        select(VacancySession)
+        .where(
+            VacancySession.user_id == user_id,
+            VacancySession.updated_at > func.now() - timedelta(seconds=ttl),
+        )
+        .limit(1)
+    )
+    return (await session.execute(stmt)).scalar()
+
+
+async def delete_expired(session: AsyncSession, ttl: float) -> None:
+    stmt = delete(VacancySession).where(
+        VacancySession.updated_at <= func.now() - timedelta(seconds=ttl)
+    )
+    await session.execute(stmt)
@@ -1,11 +1,21 @@
 import uuid
 from datetime import datetime, timedelta
 
-from sqlalchemy import TEXT, UUID, ForeignKey, Interval, LargeBinary, String, func
+from sqlalchemy import (
+    JSON,
+    TEXT,
+    UUID,
+    ForeignKey,
+    Index,
+    Interval,
+    LargeBinary,
+    String,
+    func,
+)
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.database.core import Base
-from app.enums import InterviewState
+from app.enums import InterviewState, ScreeningJobState
 
 
 class Chat(Base):
@@ -60,6 +70,51 @@ class Question(Base):
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True, index=True)
     question: Mapped[str] = mapped_column()
     answer: Mapped[str | None] = mapped_column(TEXT)
+    score: Mapped[float | None] = mapped_column()
+    comment: Mapped[str | None] = mapped_column(TEXT)
 
     interview_id: Mapped[int | None] = mapped_column(ForeignKey("interviews.id"))
     interview: Mapped[Interview] = relationship(back_populates="questions")
+
+
+class ScreeningJob(Base):
+    """Резюме из архива в очереди скрининга в БД: строку забирает воркер
+    любой реплики, после падения воркера она возвращается в очередь."""
+
+    __tablename__ = "screening_jobs"
+    __table_args__ = (Index("ix_screening_jobs_claim", "state", "run_after"),)
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    # Общий id резюме одного архива, его пользователь видит в /job
+    batch_id: Mapped[str] = mapped_column(String, index=True)
+    chat_id: Mapped[str] = mapped_column()
+    archive_name: Mapped[str] = mapped_column()
+    resume_name: Mapped[str] = mapped_column()
+    resume_format: Mapped[str] = mapped_column()
+    resume: Mapped[bytes] = mapped_column(LargeBinary)
+    vacancy_text: Mapped[str] = mapped_column(TEXT)
+    vacancy_shrunk: Mapped[str | None] = mapped_column(TEXT)
+    vacancy_vector: Mapped[list[float] | None] = mapped_column(JSON)
+
+    state: Mapped[ScreeningJobState] = mapped_column(default=ScreeningJobState.QUEUED)
+    attempts: Mapped[int] = mapped_column(default=0)
+    run_after: Mapped[datetime] = mapped_column(server_default=func.now())
+    locked_until: Mapped[datetime | None] = mapped_column()
+    locked_by: Mapped[str | None] = mapped_column()
+    last_error: Mapped[str | None] = mapped_column(TEXT)
+    # Оценка и сохранённый кандидат: после повтора задача не создаёт кандидата заново
+    result: Mapped[dict | None] = mapped_column(JSON)
+    created_at: Mapped[datetime] = mapped_column(server_default=func.now())
+
+
+class VacancySession(Base):
+    """Вакансия, загруженная пользователем бота, для реплик без общей памяти."""
+
+    __tablename__ = "vacancy_sessions"
+
+    user_id: Mapped[str] = mapped_column(primary_key=True)
+    file_name: Mapped[str] = mapped_column()
+    text: Mapped[str] = mapped_column(TEXT)
+    shrunk: Mapped[str | None] = mapped_column(TEXT)
+    vector: Mapped[list[float] | None] = mapped_column(JSON)
+    updated_at: Mapped[datetime] = mapped_column(server_default=func.now(), index=True)
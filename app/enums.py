@@ -5,3 +5,10 @@ class InterviewState(str, Enum):
     OPEN = "open"
     FINISHED = "finished"
     CLOSED = "closed"
+
+
+class ScreeningJobState(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
@@ -1,17 +1,26 @@
+import asyncio
 import os
 import uuid
 
-from fastapi import APIRouter, Depends, HTTPException, Response
-from fastapi.responses import RedirectResponse
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, RedirectResponse
 from loguru import logger
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.bot.start_bot import bot
 from app.database import query
-from app.database.core import get_async_session
+from app.database.core import async_session, get_async_session
 from app.enums import InterviewState
-from app.presentation.models import AnswersRequest, Question, QuestionsResponse
+from app.presentation.models import (
+    AnswerRequest,
+    AnswersRequest,
+    Question,
+    QuestionsResponse,
+)
 from cv_ai.answers_analize import AnswersAnalyzer
+from cv_ai.metrics import registry
+from cv_ai.warmup import readiness
+from cv_ai.workers import InferenceProxy
 
 router = APIRouter()
 
@@ -34,6 +43,63 @@ async def get_questions(
     )
 
 
+# Фоновые оценки ответов по id вопроса, чтобы post_answers мог их дождаться
+scoring_tasks: dict[int, asyncio.Task] = {}
+
+
+async def score_answer(question_id: int, question: str, answer: str) -> None:
+    try:
+        result = await InferenceProxy(AnswersAnalyzer).score_answer(question, answer)
+        async with async_session() as session, session.begin():
+            await query.questions.set_score(
+                session, question_id, answer, result["score"], result["comment"]
+            )
+    except Exception as e:
+        logger.error(f"Не удалось оценить ответ на вопрос {question_id}: {e}")
+
+
+def schedule_scoring(question_id: int, question: str, answer: str) -> None:
+    task = asyncio.create_task(score_answer(question_id, question, answer))
+    scoring_tasks[question_id] = task
+
+    def forget(done: asyncio.Task):
+        if scoring_tasks.get(question_id) is done:
+            del scoring_tasks[question_id]
+
+    task.add_done_callback(forget)
+
+
+@router.post("/api/v1/answers/{question_id}")
+async def post_answer(
+    question_id: int,
+    data: AnswerRequest,
+    background_tasks: BackgroundTasks,
+    session: AsyncSession = Depends(get_async_session),
+) -> Response:
+    interview = await query.interview.get_interview_by_alias(session, data.interview_id)
+
+    if interview is None:
+        raise HTTPException(status_code=404, detail="Interview not found")
+
+    if interview.state != InterviewState.OPEN:
+        raise HTTPException(
+            status_code=406, detail="Interview saving does not acceptable"
+        )
+
+    question = next((q for q in interview.questions if q.id == question_id), None)
+    if question is None:
+        raise HTTPException(status_code=404, detail="Question not found")
+
+    await query.questions.set_answer(session, question_id, data.answer)
+
+    # Оценка запускается после ответа клиенту, когда ответ уже закоммичен
+    background_tasks.add_task(
+        schedule_scoring, question_id, question.question, data.answer
+    )
+
+    return Response(status_code=202)
+
+
 @router.post("/api/v1/answers")
 async def post_answers(
     data: AnswersRequest, session: AsyncSession = Depends(get_async_session)
@@ -56,26 +122,58 @@ async def post_answers(
     if not hr_chat_id:
         raise HTTPException(status_code=404, detail="HR chat_id not found")
 
-    questions = [q.question for q in interview.questions]
-    answers = [answer.answer for answer in data.answers]
+    # Ответы, присланные по одному, уже оценены или оцениваются в фоне
+    pending = [
+        scoring_tasks[question.id]
+        for question in interview.questions
+        if question.id in scoring_tasks
+    ]
+    await asyncio.gather(*pending)
+
+    submitted = {answer.id: answer.answer for answer in data.answers}
+    questions = interview.questions
+    for question in questions:
+        await session.refresh(question, attribute_names=["answer", "score", "comment"])
+
+    unscored = [
+        question
+        for question in questions
+        if question.id in submitted
+        and (question.score is None or question.answer != submitted[question.id])
+    ]
+    analyzer = InferenceProxy(AnswersAnalyzer)
+    results = await asyncio.gather(
+        *(
+            analyzer.score_answer(question.question, submitted[question.id])
+            for question in unscored
+        )
+    )
+    scored = {question.id: result for question, result in zip(unscored, results)}
 
-    logger.info(answers)
+    logger.info(f"Дооценено ответов при завершении интервью: {len(unscored)}")
     logger.info(f"Попытка отправки отчета в чат: {hr_chat_id}")
-    logger.info(f"Тип chat_id: {type(hr_chat_id)}")
     logger.info(f"Данные кандидата: {candidate}")
 
-    analyzer = AnswersAnalyzer()
-    report = analyzer.analyze_answers(questions, answers)
+    rows = []
+    for question in questions:
+        result = scored.get(
+            question.id, {"score": question.score, "comment": question.comment}
+        )
+        answer = submitted.get(question.id, question.answer)
+        rows.append({"id": question.id, "answer": answer, **result})
+    await query.questions.set_answers(session, rows)
+
+    report = AnswersAnalyzer.aggregate_report(
+        [question.question for question in questions],
+        [row["score"] for row in rows],
+        [row["comment"] for row in rows],
+    )
     report = report + f"\nID кандидата: {candidate.id}"
 
     logger.info(report)
 
     await bot.send_message(int(hr_chat_id), report)
 
-    await query.questions.set_answers(
-        session, [answer.model_dump() for answer in data.answers]
-    )
-
     await query.interview.mark_as_finished(session, interview.id)
 
     return Response(status_code=201)
@@ -84,3 +182,22 @@ async def post_answers(
 @router.get("/api/v1/deeplink")
 async def deeplink(id: str) -> None:
     return RedirectResponse(url=f"vtbhackaton://interview/{id}")
+
+
+@router.get("/healthz")
+async def healthz() -> dict:
+    return {"status": "ok", **readiness.snapshot()}
+
+
+@router.get("/readyz")
+async def readyz() -> JSONResponse:
+    return JSONResponse(
+        readiness.snapshot(), status_code=200 if readiness.ready else 503
+    )
+
+
+@router.get("/metrics")
+async def metrics() -> PlainTextResponse:
+    return PlainTextResponse(
+        registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -27,3 +27,8 @@ class Answer(BaseScheme):
 class AnswersRequest(BaseScheme):
     interview_id: uuid.UUID
     answers: list[Answer]
+
+
+class AnswerRequest(BaseScheme):
+    interview_id: uuid.UUID
+    answer: str
@@ -1,49 +1,11 @@
-import torch
-from loguru import logger
-from transformers import (
-    AutoModelForCausalLM,
-    AutoTokenizer,
-    BitsAndBytesConfig,
-    pipeline,
-)
+import re
 
-from cv_ai.config import config
-from cv_ai.model_init import ModelManager
+from cv_ai.generation import GenerationTask
+from cv_ai.result_cache import cached_stage
+from cv_ai.stopping import StopSpec
 
 
-class AnswersAnalyzer:
-    def __init__(self):
-        self.model_manager = ModelManager()
-        self.model, self.tokenizer, self.pipe = self.model_manager.get_model()
-
-    def _run_model(self, prompt: str, max_new_tokens: int = 512) -> str:
-        try:
-            formatted_prompt = self.tokenizer.apply_chat_template(
-                [{"role": "user", "content": prompt}],
-                tokenize=False,
-                add_generation_prompt=True,
-            )
-
-            outputs = self.pipe(
-                formatted_prompt,
-                max_new_tokens=max_new_tokens,
-                do_sample=False,
-                num_beams=1,
-                temperature=0.0,
-                top_k=50,
-                top_p=0.95,
-                eos_token_id=self.tokenizer.eos_token_id,
-            )
-
-            generated_text = outputs[0]["generated_text"][
-                len(formatted_prompt) :
-            ].strip()
-            return generated_text
-
-        except Exception as e:
-            logger.info(f"Ошибка при генерации текста: {e}")
-            return ""
-
+class AnswersAnalyzer(GenerationTask):
     def analyze_answers(self, questions: list, answers: list) -> str:
         qa_text = "\n".join(
             [f"Вопрос: {q}\nОтвет: {a}" for q, a in zip(questions, answers)]
@@ -59,10 +21,69 @@ class AnswersAnalyzer:
             "Рекомендации: ..."
         )
 
-        user_prompt = f"Вот список вопросов и ответов кандидата (ответы могут быть неразборчивы):\n\n{qa_text}"
+        instruction = "Вот список вопросов и ответов кандидата (ответы могут быть неразборчивы):\n\n"
+        user_prompt = f"{instruction}{qa_text}"
 
         full_prompt = f"{system_prompt}\n\n{user_prompt}"
+        prefix = f"{system_prompt}\n\n{instruction}"
 
-        raw_output = self._run_model(full_prompt, max_new_tokens=256)
+        raw_output = self._run_model(full_prompt, max_new_tokens=256, prefix=prefix)
 
         return raw_output
+
+    @cached_stage(
+        "answer_score", version=1, should_cache=lambda r: r["score"] is not None
+    )
+    def score_answer(self, question: str, answer: str) -> dict:
+        """Оценивает один ответ: {"score": 0–100 или None, "comment": str}."""
+        system_prompt = (
+            "Ты — опытный интервьюер. Оцени ответ кандидата на вопрос собеседования "
+            "числом от 0 до 100, где 0 — очень плохо, 100 — идеально. "
+            "Ответь строго в две строки:\n"
+            "Оценка: <число>\n"
+            "Комментарий: <одно короткое предложение>"
+        )
+
+        instruction = "Вопрос и ответ кандидата (ответ может быть неразборчив):\n\n"
+        user_prompt = f"{instruction}Вопрос: {question}\nОтвет: {answer}"
+
+        full_prompt = f"{system_prompt}\n\n{user_prompt}"
+        prefix = f"{system_prompt}\n\n{instruction}"
+
+        raw_output = self._run_model(
+            full_prompt, max_new_tokens=96, prefix=prefix, stop=StopSpec(max_lines=2)
+        )
+
+        score = None
+        match = re.search(r"(\d{1,3})", raw_output)
+        if match:
+            score = max(0.0, min(100.0, float(match.group(1))))
+
+        comment = re.search(r"Комментарий:\s*(.+)", raw_output)
+        if comment:
+            comment = comment.group(1).strip()
+        else:
+            # Модель могла не соблюсти формат, берём всё кроме строки с оценкой
+            comment = "\n".join(
+                line for line in raw_output.splitlines() if "Оценка" not in line
+            ).strip()
+        return {"score": score, "comment": comment}
+
+    @staticmethod
+    def aggregate_report(
+        questions: list[str], scores: list[float | None], comments: list[str | None]
+    ) -> str:
+        """Итоговый отчёт из уже сохранённых оценок отдельных ответов, без LLM."""
+        rated = [score for score in scores if score is not None]
+        lines = [
+            f"Оценка: {sum(rated) / len(rated):.0f}" if rated else "Оценка: нет данных"
+        ]
+        for index, (question, score, comment) in enumerate(
+            zip(questions, scores, comments), start=1
+        ):
+            score_text = f"{score:.0f}" if score is not None else "—"
+            line = f"{index}. {question} — {score_text}"
+            if comment:
+                line += f": {comment}"
+            lines.append(line)
+        return "\n".join(lines)
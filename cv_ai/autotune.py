@@ -0,0 +1,236 @@
+"""Подбор настроек инференса под текущую машину.
+
+Запуск из корня репозитория:
+    python -m cv_ai.autotune --threads 4,8 --dtypes float32,bfloat16 \\
+        --compile on,off --batch-sizes 1,4,8 --objective latency
+
+Каждая комбинация потоков, dtype, torch.compile и квантизации запускается
+в отдельном процессе: так честно меряются загрузка, компиляция и пиковый RSS.
+Внутри процесса меряется задержка одиночных вызовов resume_shrink и оценки
+соответствия на промптах из cv_ai/samples.py и пропускная способность оценки
+при разных размерах батча. Лучшая конфигурация записывается в
+PERFORMANCE_PROFILE, ModelManager применяет её при старте.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def run_candidate(repeats: int, batch_sizes: list[int]) -> dict:
+    from cv_ai.config import config
+    from cv_ai.cv_analyze import ResumeVacancyAnalyze
+    from cv_ai.model_init import ModelManager
+    from cv_ai.samples import resume, vacancy
+    from cv_ai.shrink import Shrinker
+
+    started = time.perf_counter()
+    manager = ModelManager()
+    entry = manager.get_entry()
+    shrinker = Shrinker()
+    analyzer = ResumeVacancyAnalyze()
+    # Первый вызов включает компиляцию, его считаем частью старта
+    analyzer.analyze_resume_vs_vacancy(resume, vacancy)
+    startup_seconds = time.perf_counter() - started
+
+    def median_seconds(call) -> float:
+        durations = []
+        for _ in range(repeats):
+            call_started = time.perf_counter()
+            call()
+            durations.append(time.perf_counter() - call_started)
+        return statistics.median(durations)
+
+    latency = {
+        "resume_shrink": median_seconds(lambda: shrinker.resume_shrink(resume)),
+        "score": median_seconds(
+            lambda: analyzer.analyze_resume_vs_vacancy(resume, vacancy)
+        ),
+    }
+
+    throughput = {}
+    for batch_size in batch_sizes:
+        entry.scheduler.max_batch_size = batch_size
+        # Разные вакансии, чтобы запросы не совпадали между собой
+        vacancies = [f"{vacancy}\n#{index}" for index in range(batch_size * 2)]
+        with ThreadPoolExecutor(max_workers=len(vacancies)) as executor:
+            batch_started = time.perf_counter()
+            list(
+                executor.map(
+                    lambda text: analyzer.analyze_resume_vs_vacancy(resume, text),
+                    vacancies,
+                )
+            )
+        throughput[batch_size] = len(vacancies) / (time.perf_counter() - batch_started)
+
+    return {
+        "settings": {
+            "TORCH_THREADS": config.TORCH_THREADS,
+            "MODEL_DTYPE": config.MODEL_DTYPE,
+            "TORCH_COMPILE": config.TORCH_COMPILE,
+            "QUANTIZATION": config.QUANTIZATION,
+        },
+        "startup_seconds": startup_seconds,
+        "latency": latency,
+        "throughput": throughput,
+        # ru_maxrss в Linux — в килобайтах
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def run_subprocess(settings: dict, repeats: int, batch_sizes: list[int]) -> dict | None:
+    env = {
+        **os.environ,
+        **{name: str(value) for name, value in settings.items()},
+        "RESULT_CACHE_ENABLED": "false",
+        "PERFORMANCE_PROFILE": "",
+    }
+    try:
+        completed = subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                "cv_ai.autotune",
+                "--candidate",
+                "--repeats",
+                str(repeats),
+                "--batch-sizes",
+                ",".join(map(str, batch_sizes)),
+            ],
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except subprocess.CalledProcessError as e:
+        print(f"{settings}: ошибка\n{e.stderr[-2000:]}", file=sys.stderr)
+        return None
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    # JSON превращает ключи-числа в строки
+    result["throughput"] = {int(k): v for k, v in result["throughput"].items()}
+    return result
+
+
+def candidates(args) -> list[dict]:
+    grid = itertools.product(args.threads, args.dtypes, args.compile, args.quantization)
+    settings = []
+    for threads, dtype, compile_model, quantization in grid:
+        # int8 квантуется из float32 и не компилируется
+        if quantization == "int8" and (dtype != "float32" or compile_model):
+            continue
+        settings.append(
+            {
+                "TORCH_THREADS": threads,
+                "MODEL_DTYPE": dtype,
+                "TORCH_COMPILE": compile_model,
+                "QUANTIZATION": quantization,
+            }
+        )
+    return settings
+
+
+def choose(results: list[dict], objective: str, max_rss_mb: float) -> dict | None:
+    fitting = [
+        result
+        for result in results
+        if max_rss_mb <= 0 or result["max_rss_mb"] <= max_rss_mb
+    ]
+    if not fitting:
+        return None
+
+    def best_batch(result) -> tuple[int, float]:
+        return max(result["throughput"].items(), key=lambda item: item[1])
+
+    if objective == "throughput":
+        best = max(fitting, key=lambda result: best_batch(result)[1])
+    else:
+        best = min(fitting, key=lambda result: sum(result["latency"].values()))
+    return {**best["settings"], "BATCH_MAX_SIZE": best_batch(best)[0]}
+
+
+def parse_list(cast):
+    return lambda value: [cast(item) for item in value.split(",") if item]
+
+
+def parse_flag(value: str) -> bool:
+    return value in ("on", "true", "1")
+
+
+def main():
+    cpu_count = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--threads",
+        type=parse_list(int),
+        default=sorted({cpu_count, max(1, cpu_count // 2)}),
+    )
+    parser.add_argument(
+        "--dtypes", type=parse_list(str), default=["float32", "bfloat16"]
+    )
+    parser.add_argument("--compile", type=parse_list(parse_flag), default=[True, False])
+    parser.add_argument("--quantization", type=parse_list(str), default=["none"])
+    parser.add_argument("--batch-sizes", type=parse_list(int), default=[1, 4, 8])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument(
+        "--objective", choices=("latency", "throughput"), default="latency"
+    )
+    parser.add_argument(
+        "--max-rss-mb", type=float, default=0, help="Отбросить конфигурации тяжелее"
+    )
+    parser.add_argument("--output", help="Куда записать профиль")
+    parser.add_argument("--candidate", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.candidate:
+        print(json.dumps(run_candidate(args.repeats, args.batch_sizes)))
+        return
+
+    from cv_ai.config import config
+    from cv_ai.perf_profile import save_profile
+
+    results = []
+    for settings in candidates(args):
+        print(f"Замер {settings}...", file=sys.stderr)
+        result = run_subprocess(settings, args.repeats, args.batch_sizes)
+        if result is not None:
+            results.append(result)
+
+    header = f"{'потоки':>7}{'dtype':>10}{'compile':>9}{'квант.':>7}"
+    header += f"{'старт, с':>10}{'RSS, MB':>9}{'shrink, с':>11}{'оценка, с':>11}"
+    header += "".join(f"{f'b={size}, /с':>11}" for size in args.batch_sizes)
+    print(header)
+    for result in results:
+        settings = result["settings"]
+        line = (
+            f"{settings['TORCH_THREADS']:>7}{settings['MODEL_DTYPE']:>10}"
+            f"{'on' if settings['TORCH_COMPILE'] else 'off':>9}"
+            f"{settings['QUANTIZATION']:>7}"
+            f"{result['startup_seconds']:>10.1f}{result['max_rss_mb']:>9.0f}"
+            f"{result['latency']['resume_shrink']:>11.2f}"
+            f"{result['latency']['score']:>11.2f}"
+        )
+        line += "".join(
+            f"{result['throughput'][size]:>11.2f}" for size in args.batch_sizes
+        )
+        print(line)
+
+    best = choose(results, args.objective, args.max_rss_mb)
+    if best is None:
+        print("Ни одна конфигурация не подошла, профиль не записан")
+        return
+
+    output = args.output or config.PERFORMANCE_PROFILE
+    save_profile(output, config.BASE_MODEL, best, results)
+    print(f"\nЛучшая конфигурация ({args.objective}): {best}")
+    print(f"Профиль записан в {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,419 @@
+import asyncio
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import AsyncIterator
+
+import httpx
+from loguru import logger
+
+from cv_ai import metrics
+from cv_ai.config import config
+from cv_ai.model_init import ModelManager
+from cv_ai.prefix_cache import format_chat
+from cv_ai.stopping import GenerationTimeout, StopSpec
+
+
+class InferenceBackend(ABC):
+    """Источник генераций для классов cv_ai.
+
+    prompt — текст пользовательского сообщения без chat-шаблона, prefix — его
+    неизменное начало (системный промпт), которое бэкенд может кэшировать,
+    stop — условия досрочной остановки; ответ возвращается уже обрезанным.
+    """
+
+    model_name: str
+
+    @property
+    @abstractmethod
+    def tokenizer(self):
+        """Токенизатор модели: нужен для подсчёта токенов и нарезки документов."""
+
+    @abstractmethod
+    def generate(
+        self,
+        prompt: str,
+        max_new_tokens: int,
+        prefix: str | None = None,
+        stop: StopSpec | None = None,
+    ) -> str: ...
+
+    def generate_batch(
+        self,
+        prompts: list[str],
+        max_new_tokens: int,
+        prefix: str | None = None,
+        stop: StopSpec | None = None,
+    ) -> list[str]:
+        return [
+            self.generate(prompt, max_new_tokens, prefix, stop) for prompt in prompts
+        ]
+
+    async def agenerate(
+        self,
+        prompt: str,
+        max_new_tokens: int,
+        prefix: str | None = None,
+        stop: StopSpec | None = None,
+    ) -> str:
+        return await asyncio.to_thread(
+            self.generate, prompt, max_new_tokens, prefix, stop
+        )
+
+    async def astream(
+        self,
+        prompt: str,
+        max_new_tokens: int,
+        prefix: str | None = None,
+        stop: StopSpec | None = None,
+    ) -> AsyncIterator[str]:
+        yield await self.agenerate(prompt, max_new_tokens, prefix, stop)
+
+
+class HFBackend(InferenceBackend):
+    """Локальная модель transformers через реестр ModelManager."""
+
+    def __init__(self, model_name: str | None = None):
+        self.model_manager = ModelManager()
+        self.model_name = model_name or self.model_manager.model_name
+
+    @property
+    def tokenizer(self):
+        return self.model_manager.get_entry(self.model_name).tokenizer
+
+    def _format(self, prompt: str, prefix: str | None) -> tuple[str, str | None]:
+        return format_chat(self.tokenizer, prompt, prefix)
+
+    def generate(
+        self,
+        prompt: str,
+        max_new_tokens: int,
+        prefix: str | None = None,
+        stop: StopSpec | None = None,
+    ) -> str:
+        formatted_prompt, formatted_prefix = self._format(prompt, prefix)
+        return self.model_manager.generate(
+            formatted_prompt,
+            max_new_tokens=max_new_tokens,
+            prefix=formatted_prefix,
+            model_name=self.model_name,
+            stop=stop,
+        )
+
+    def generate_batch(
+        self,
+        prompts: list[str],
+        max_new_tokens: int,
+        prefix: str | None = None,
+        stop: StopSpec | None = None,
+    ) -> list[str]:
+        formatted = [self._format(prompt, prefix) for prompt in prompts]
+        formatted_prefix = formatted[0][1] if formatted else None
+        return self.model_manager.generate_batch(
+            [prompt for prompt, _ in formatted],
+            max_new_tokens=max_new_tokens,
+            prefix=formatted_prefix,
+            model_name=self.model_name,
+            stop=stop,
+        )
+
+
+class HTTPBackend(InferenceBackend):
+    """Ollama (/api/chat) или OpenAI-совместимый сервер (/v1/chat/completions).
+
+    Все запросы идут через один httpx.AsyncClient с keep-alive, живущий в
+    отдельном потоке со своим event loop: так пул соединений общий и для
+    синхронных вызовов из cv_ai, и для корутин из приложения. Число
+    одновременных запросов ограничено семафором.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        model_name: str,
+        api: str = "ollama",
+        api_key: str = "",
+        max_connections: int = 8,
+        timeout: float = 120.0,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.model_name = model_name
+        self.api = api
+        self.api_key = api_key
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.transport = transport
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._client: httpx.AsyncClient | None = None
+        self._semaphore: asyncio.Semaphore | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def tokenizer(self):
+        # Веса не нужны, только токенизатор базовой модели для подсчёта токенов
+        return ModelManager().get_entry(config.BASE_MODEL, role="tokenizer").tokenizer
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            # После fork поток цикла в дочернем процессе не существует
+            if self._thread is None or not self._thread.is_alive():
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever, name="http-backend", daemon=True
+                )
+                self._thread.start()
+                self._client = None
+            return self._loop
+
+    async def _ensure_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            headers = {}
+            if self.api_key:
+                headers["Authorization"] = f"Bearer {self.api_key}"
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=headers,
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+                transport=self.transport,
+            )
+            self._semaphore = asyncio.Semaphore(self.max_connections)
+        return self._client
+
+    def _request(
+        self, prompt: str, max_new_tokens: int, stream: bool, stop: StopSpec | None
+    ):
+        messages = [{"role": "user", "content": prompt}]
+        # Строки-стопы сервер умеет сам, строки и числа дообрезаются в trim
+        stop_strings = list(stop.stop_strings) if stop else []
+        if self.api == "openai":
+            payload = {
+                "model": self.model_name,
+                "messages": messages,
+                "max_tokens": max_new_tokens,
+                "temperature": 0,
+                "stream": stream,
+            }
+            if stop_strings:
+                payload["stop"] = stop_strings
+            return "/v1/chat/completions", payload
+        options = {"num_predict": max_new_tokens, "temperature": 0}
+        if stop_strings:
+            options["stop"] = stop_strings
+        return "/api/chat", {
+            "model": self.model_name,
+            "messages": messages,
+            "stream": stream,
+            "options": options,
+        }
+
+    def _timeout(self, stop: StopSpec | None) -> float:
+        return stop.max_time if stop and stop.max_time else self.timeout
+
+    def _parse_chunk(self, line: str) -> tuple[str, bool]:
+        """Разбирает строку потокового ответа: (кусок текста, конец потока)."""
+        if self.api == "openai":
+            if not line.startswith("data:"):
+                return "", False
+            data = line[len("data:") :].strip()
+            if data == "[DONE]":
+                return "", True
+            delta = json.loads(data)["choices"][0].get("delta", {})
+            return delta.get("content") or "", False
+        chunk = json.loads(line)
+        return chunk.get("message", {}).get("content", ""), chunk.get("done", False)
+
+    async def _generate(
+        self, prompt: str, max_new_tokens: int, stop: StopSpec | None = None
+    ) -> str:
+        client = await self._ensure_client()
+        path, payload = self._request(prompt, max_new_tokens, False, stop)
+        queued = time.perf_counter()
+        async with self._semaphore:
+            started = time.perf_counter()
+            try:
+                response = await client.post(
+                    path, json=payload, timeout=self._timeout(stop)
+                )
+            except httpx.TimeoutException:
+                # Не уложились в max_time: сервер не отдаёт недописанный ответ
+                if stop is not None and stop.max_time:
+                    raise GenerationTimeout() from None
+                raise
+        finished = time.perf_counter()
+        response.raise_for_status()
+        data = response.json()
+        self._record(data, started - queued, finished - started)
+        if self.api == "openai":
+            text = data["choices"][0]["message"]["content"]
+        else:
+            text = data["message"]["content"]
+        return stop.trim(text) if stop else text.strip()
+
+    def _record(self, data: dict, queue_seconds: float, request_seconds: float):
+        model = self.model_name
+        metrics.QUEUE_WAIT.observe(queue_seconds, model=model)
+        if self.api == "openai":
+            usage = data.get("usage") or {}
+            prompt_tokens = usage.get("prompt_tokens")
+            generated = usage.get("completion_tokens")
+            # Сервер не сообщает фазы, всё время запроса считаем декодированием
+            prefill_seconds, decode_seconds = None, request_seconds
+        else:
+            # Ollama отдаёт длительности в наносекундах
+            prompt_tokens = data.get("prompt_eval_count")
+            generated = data.get("eval_count")
+            prefill_seconds = data.get("prompt_eval_duration", 0) / 1e9 or None
+            decode_seconds = data.get("eval_duration", 0) / 1e9 or request_seconds
+
+        if prompt_tokens is not None:
+            metrics.PROMPT_TOKENS.observe(prompt_tokens, model=model)
+        if prefill_seconds is not None:
+            metrics.PREFILL_SECONDS.observe(prefill_seconds, model=model)
+        metrics.DECODE_SECONDS.observe(decode_seconds, model=model)
+        if generated:
+            metrics.GENERATED_TOKENS.observe(generated, model=model)
+            metrics.TOKENS_PER_SECOND.observe(generated / decode_seconds, model=model)
+
+    async def _stream(
+        self, prompt: str, max_new_tokens: int, stop: StopSpec | None = None
+    ) -> AsyncIterator[str]:
+        client = await self._ensure_client()
+        path, payload = self._request(prompt, max_new_tokens, True, stop)
+        async with self._semaphore:
+            async with client.stream(
+                "POST", path, json=payload, timeout=self._timeout(stop)
+            ) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.strip():
+                        continue
+                    text, done = self._parse_chunk(line)
+                    if text:
+                        yield text
+                    if done:
+                        return
+
+    def generate(
+        self,
+        prompt: str,
+        max_new_tokens: int,
+        prefix: str | None = None,
+        stop: StopSpec | None = None,
+    ) -> str:
+        loop = self._ensure_loop()
+        future = asyncio.run_coroutine_threadsafe(
+            self._generate(prompt, max_new_tokens, stop), loop
+        )
+        return future.result()
+
+    def generate_batch(
+        self,
+        prompts: list[str],
+        max_new_tokens: int,
+        prefix: str | None = None,
+        stop: StopSpec | None = None,
+    ) -> list[str]:
+        loop = self._ensure_loop()
+
+        async def gather():
+            return await asyncio.gather(
+                *(self._generate(prompt, max_new_tokens, stop) for prompt in prompts)
+            )
+
+        return asyncio.run_coroutine_threadsafe(gather(), loop).result()
+
+    async def agenerate(
+        self,
+        prompt: str,
+        max_new_tokens: int,
+        prefix: str | None = None,
+        stop: StopSpec | None = None,
+    ) -> str:
+        loop = self._ensure_loop()
+        return await asyncio.wrap_future(
+            asyncio.run_coroutine_threadsafe(
+                self._generate(prompt, max_new_tokens, stop), loop
+            )
+        )
+
+    async def astream(
+        self,
+        prompt: str,
+        max_new_tokens: int,
+        prefix: str | None = None,
+        stop: StopSpec | None = None,
+    ) -> AsyncIterator[str]:
+        loop = self._ensure_loop()
+        caller_loop = asyncio.get_running_loop()
+        chunks: asyncio.Queue = asyncio.Queue()
+
+        def push(item):
+            caller_loop.call_soon_threadsafe(chunks.put_nowait, item)
+
+        async def produce():
+            try:
+                async for text in self._stream(prompt, max_new_tokens, stop):
+                    push(text)
+                push(None)
+            except Exception as e:
+                push(e)
+
+        producer = asyncio.run_coroutine_threadsafe(produce(), loop)
+        try:
+            while True:
+                item = await chunks.get()
+                if item is None:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            # Потребитель прервал поток или отменён: закрываем запрос
+            # и освобождаем слот семафора, не дочитывая ответ
+            producer.cancel()
+
+    def close(self):
+        if self._loop is None:
+            return
+        if self._client is not None:
+            asyncio.run_coroutine_threadsafe(self._client.aclose(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop = None
+        self._thread = None
+        self._client = None
+
+
+_backend: InferenceBackend | None = None
+_backend_lock = threading.Lock()
+
+
+def get_backend() -> InferenceBackend:
+    """Бэкенд процесса, выбранный через INFERENCE_BACKEND (hf, ollama, openai)."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            if config.INFERENCE_BACKEND == "hf":
+                _backend = HFBackend()
+            elif config.INFERENCE_BACKEND in ("ollama", "openai"):
+                _backend = HTTPBackend(
+                    config.OLLAMA_URL,
+                    config.LLM,
+                    api=config.INFERENCE_BACKEND,
+                    api_key=config.BACKEND_API_KEY,
+                    max_connections=config.BACKEND_MAX_CONNECTIONS,
+                    timeout=config.BACKEND_TIMEOUT,
+                )
+            else:
+                raise ValueError(
+                    f"Неизвестный бэкенд инференса: {config.INFERENCE_BACKEND}"
+                )
+            logger.info(f"Бэкенд инференса: {config.INFERENCE_BACKEND}")
+        return _backend
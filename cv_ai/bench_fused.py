@@ -0,0 +1,99 @@
+"""Сравнение пошагового и fused-скрининга резюме.
+
+Запуск из корня репозитория:
+    python -m cv_ai.bench_fused --repeats 3
+
+multistep — resume_shrink, vacancy_shrink, оценка и вопросы (до четырёх
+генераций), fused — один вызов с JSON-ответом. Кэш результатов выключается,
+чтобы повторы действительно вызывали модель. Промпты из cv_ai/samples.py.
+"""
+
+import argparse
+import os
+import statistics
+import time
+
+# Порог прохождения отбора, как в app/bot/analize.py
+PASS_THRESHOLD = 70.0
+
+
+def run_multistep(resume: str, vacancy: str, num_questions: int) -> dict:
+    from cv_ai.cv_analyze import ResumeVacancyAnalyze
+    from cv_ai.questions_gen import QuestionsGenerator
+    from cv_ai.shrink import Shrinker
+
+    shrinker = Shrinker()
+    resume_summary = shrinker.resume_shrink(resume)
+    vacancy_summary = shrinker.vacancy_shrink(vacancy)
+    score = ResumeVacancyAnalyze().analyze_resume_vs_vacancy(
+        resume_summary, vacancy_summary
+    )
+    questions = QuestionsGenerator().generate_questions(
+        vacancy_summary, resume_summary, num_questions
+    )
+    return {"score": score, "summary": resume_summary, "questions": questions}
+
+
+def run_fused(resume: str, vacancy: str, num_questions: int) -> dict | None:
+    from cv_ai.fused import FusedScreener
+
+    return FusedScreener().screen(resume, vacancy, num_questions)
+
+
+def measure(call, repeats: int) -> tuple[float, object]:
+    durations = []
+    result = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = call()
+        durations.append(time.perf_counter() - started)
+    return statistics.median(durations), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--questions", type=int, default=8)
+    args = parser.parse_args()
+
+    os.environ["RESULT_CACHE_ENABLED"] = "false"
+    from cv_ai.model_init import ModelManager
+    from cv_ai.samples import resume, vacancy
+
+    # Загрузка модели не должна попасть в замер первого режима
+    ModelManager().get_model()
+
+    multistep_seconds, multistep = measure(
+        lambda: run_multistep(resume, vacancy, args.questions), args.repeats
+    )
+    fused_seconds, fused = measure(
+        lambda: run_fused(resume, vacancy, args.questions), args.repeats
+    )
+
+    print(f"{'режим':<12}{'латентность, с':>16}{'оценка':>10}{'вопросов':>10}")
+    print(
+        f"{'multistep':<12}{multistep_seconds:>16.2f}"
+        f"{multistep['score']:>10.1f}{len(multistep['questions']):>10}"
+    )
+    if fused is None:
+        print(f"{'fused':<12}{fused_seconds:>16.2f}  ответ не прошёл схему")
+        return
+    print(
+        f"{'fused':<12}{fused_seconds:>16.2f}"
+        f"{fused['score']:>10.1f}{len(fused['questions']):>10}"
+    )
+
+    same_decision = (multistep["score"] >= PASS_THRESHOLD) == (
+        fused["score"] >= PASS_THRESHOLD
+    )
+    print()
+    print(f"Ускорение: {multistep_seconds / fused_seconds:.2f}x")
+    print(f"Разница оценок: {abs(multistep['score'] - fused['score']):.1f}")
+    print(
+        f"Решение по порогу {PASS_THRESHOLD:.0f}%: "
+        f"{'совпало' if same_decision else 'различается'}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""Сравнение рантаймов генерации: transformers (torch) и ONNX Runtime.
+
+Запуск из корня репозитория (нужен poetry install -E onnx):
+    python -m cv_ai.bench_onnx --repeats 3 --batch-size 8 --check
+
+Каждый рантайм запускается в отдельном процессе с MODEL_RUNTIME=torch|onnx.
+Паритет: жадные ответы этапов resume_shrink, оценки и вопросов на промптах
+из cv_ai/samples.py должны совпасть, а логарифмы вероятностей следующего
+токена — различаться не больше --tolerance. С --check при расхождении
+скрипт завершается с кодом 1. Первый запуск onnx включает экспорт модели
+в model_cache/onnx, повторные загружают готовый экспорт.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+RUNTIMES = ("torch", "onnx")
+# Сколько самых вероятных токенов сравнивать
+TOP_K = 20
+
+
+def next_token_logprobs(manager, prompt: str) -> dict[int, float]:
+    import torch
+
+    from cv_ai.prefix_cache import format_chat
+
+    model, tokenizer, _ = manager.get_model()
+    formatted_prompt, _ = format_chat(tokenizer, prompt)
+    inputs = tokenizer(formatted_prompt, return_tensors="pt")
+    with torch.no_grad():
+        logits = model(**inputs).logits[0, -1].float()
+    logprobs = torch.log_softmax(logits, dim=-1)
+    values, indices = logprobs.topk(TOP_K)
+    return {int(i): float(v) for i, v in zip(indices, values)}
+
+
+def run_candidate(repeats: int, batch_size: int) -> dict:
+    from cv_ai.config import config
+    from cv_ai.cv_analyze import ResumeVacancyAnalyze
+    from cv_ai.model_init import ModelManager
+    from cv_ai.questions_gen import QuestionsGenerator
+    from cv_ai.samples import resume, vacancy
+    from cv_ai.shrink import Shrinker
+
+    started = time.perf_counter()
+    manager = ModelManager()
+    entry = manager.get_entry()
+    load_seconds = time.perf_counter() - started
+
+    shrinker = Shrinker()
+    analyzer = ResumeVacancyAnalyze()
+    generator = QuestionsGenerator()
+    calls = {
+        "resume_shrink": lambda: shrinker.resume_shrink(resume),
+        "score": lambda: analyzer._generate_scores([resume], vacancy)[0],
+        "questions": lambda: generator.generate_questions(vacancy, resume, 5),
+    }
+
+    outputs = {name: call() for name, call in calls.items()}
+    latency = {}
+    for name, call in calls.items():
+        durations = []
+        for _ in range(repeats):
+            call_started = time.perf_counter()
+            call()
+            durations.append(time.perf_counter() - call_started)
+        latency[name] = statistics.median(durations)
+
+    entry.scheduler.max_batch_size = batch_size
+    vacancies = [f"{vacancy}\n#{index}" for index in range(batch_size * 2)]
+    with ThreadPoolExecutor(max_workers=len(vacancies)) as executor:
+        batch_started = time.perf_counter()
+        list(
+            executor.map(
+                lambda text: analyzer._generate_scores([resume], text)[0], vacancies
+            )
+        )
+    throughput = len(vacancies) / (time.perf_counter() - batch_started)
+
+    return {
+        "runtime": config.MODEL_RUNTIME,
+        "load_seconds": load_seconds,
+        "size_mb": entry.size_bytes / 2**20,
+        "outputs": outputs,
+        "logprobs": next_token_logprobs(manager, f"{vacancy}\n\n{resume}"),
+        "latency": latency,
+        "throughput": throughput,
+    }
+
+
+def run_subprocess(runtime: str, repeats: int, batch_size: int) -> dict | None:
+    env = {
+        **os.environ,
+        "MODEL_RUNTIME": runtime,
+        "RESULT_CACHE_ENABLED": "false",
+        "SCORE_MODE": "generate",
+    }
+    try:
+        completed = subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                "cv_ai.bench_onnx",
+                "--candidate",
+                "--repeats",
+                str(repeats),
+                "--batch-size",
+                str(batch_size),
+            ],
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except subprocess.CalledProcessError as e:
+        print(f"{runtime}: ошибка\n{e.stderr[-2000:]}", file=sys.stderr)
+        return None
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    # JSON превращает ключи-числа в строки
+    result["logprobs"] = {int(k): v for k, v in result["logprobs"].items()}
+    return result
+
+
+def compare(reference: dict, candidate: dict) -> tuple[list[str], bool, float]:
+    """Этапы с разными ответами, совпадение top-1 и максимальная разница
+    логарифмов вероятностей по общим токенам top-k."""
+    mismatched = [
+        name
+        for name, output in reference["outputs"].items()
+        if candidate["outputs"].get(name) != output
+    ]
+    expected, actual = reference["logprobs"], candidate["logprobs"]
+    same_top1 = max(expected, key=expected.get) == max(actual, key=actual.get)
+    common = expected.keys() & actual.keys()
+    max_diff = max((abs(expected[i] - actual[i]) for i in common), default=float("inf"))
+    return mismatched, same_top1, max_diff
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=1e-2,
+        help="Допустимая разница логарифмов вероятностей",
+    )
+    parser.add_argument(
+        "--check", action="store_true", help="Код 1, если паритет нарушен"
+    )
+    parser.add_argument("--candidate", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.candidate:
+        print(json.dumps(run_candidate(args.repeats, args.batch_size)))
+        return
+
+    results = {}
+    for runtime in RUNTIMES:
+        print(f"Замер {runtime}...", file=sys.stderr)
+        result = run_subprocess(runtime, args.repeats, args.batch_size)
+        if result is None:
+            sys.exit(1)
+        results[runtime] = result
+
+    print(
+        f"{'рантайм':<8}{'загрузка, с':>13}{'размер, MB':>12}{'shrink, с':>11}"
+        f"{'оценка, с':>11}{'вопросы, с':>12}{f'b={args.batch_size}, /с':>11}"
+    )
+    for runtime, result in results.items():
+        latency = result["latency"]
+        print(
+            f"{runtime:<8}{result['load_seconds']:>13.1f}{result['size_mb']:>12.0f}"
+            f"{latency['resume_shrink']:>11.2f}{latency['score']:>11.2f}"
+            f"{latency['questions']:>12.2f}{result['throughput']:>11.2f}"
+        )
+
+    torch_result, onnx_result = results["torch"], results["onnx"]
+    mismatched, same_top1, max_diff = compare(torch_result, onnx_result)
+    print()
+    print(
+        "Ускорение onnx: "
+        f"{sum(torch_result['latency'].values()) / sum(onnx_result['latency'].values()):.2f}x "
+        "по задержке, "
+        f"{onnx_result['throughput'] / torch_result['throughput']:.2f}x "
+        "по пропускной способности"
+    )
+    print(
+        f"Жадные ответы: {'совпали' if not mismatched else f'различаются в {mismatched}'}"
+    )
+    print(f"Top-1 следующего токена: {'совпал' if same_top1 else 'различается'}")
+    print(f"Макс. разница log-вероятностей top-{TOP_K}: {max_diff:.2e}")
+
+    passed = not mismatched and same_top1 and max_diff <= args.tolerance
+    print(f"Паритет: {'да' if passed else 'нет'}")
+    if args.check and not passed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
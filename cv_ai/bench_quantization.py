@@ -0,0 +1,126 @@
+"""Сравнение fp32 и динамической int8-квантизации на CPU.
+
+Запуск из корня репозитория:
+    python -m cv_ai.bench_quantization --repeats 3
+
+Каждый режим выполняется в отдельном процессе, чтобы пиковый RSS не смешивался.
+Промпты те же, что в cv_ai/test.py. Первый запуск int8 включает квантизацию
+и сохранение весов в model_cache, повторный показывает время загрузки из кэша.
+"""
+
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+MODES = ("none", "int8")
+
+
+def run_mode(repeats: int) -> dict:
+    from cv_ai.answers_analize import AnswersAnalyzer
+    from cv_ai.config import config
+    from cv_ai.cv_analyze import ResumeVacancyAnalyze
+    from cv_ai.questions_gen import QuestionsGenerator
+    from cv_ai.samples import answers, questions, resume, vacancy
+
+    started = time.perf_counter()
+    cv_analyze = ResumeVacancyAnalyze()
+    load_seconds = time.perf_counter() - started
+
+    latency = {}
+
+    def measure(stage: str, call):
+        durations = []
+        for _ in range(repeats):
+            stage_started = time.perf_counter()
+            result = call()
+            durations.append(time.perf_counter() - stage_started)
+        latency[stage] = statistics.median(durations)
+        return result
+
+    score = measure(
+        "score", lambda: cv_analyze.analyze_resume_vs_vacancy(resume, vacancy)
+    )
+    generated_questions = measure(
+        "questions", lambda: QuestionsGenerator().generate_questions(resume, vacancy)
+    )
+    report = measure(
+        "answers", lambda: AnswersAnalyzer().analyze_answers(questions, answers)
+    )
+
+    return {
+        "mode": config.QUANTIZATION,
+        "load_seconds": load_seconds,
+        "latency": latency,
+        # ru_maxrss в Linux — в килобайтах
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "score": score,
+        "questions": generated_questions,
+        "report": report,
+    }
+
+
+def run_subprocess(mode: str, repeats: int) -> dict:
+    env = {**os.environ, "QUANTIZATION": mode, "RESULT_CACHE_ENABLED": "false"}
+    completed = subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "cv_ai.bench_quantization",
+            "--mode",
+            mode,
+            "--repeats",
+            str(repeats),
+        ],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.repeats), ensure_ascii=False))
+        return
+
+    results = {mode: run_subprocess(mode, args.repeats) for mode in MODES}
+
+    print(f"{'режим':<8}{'загрузка, с':>14}{'RSS, MB':>10}", end="")
+    stages = list(results["none"]["latency"])
+    for stage in stages:
+        print(f"{stage + ', с':>14}", end="")
+    print()
+    for mode, result in results.items():
+        print(
+            f"{mode:<8}{result['load_seconds']:>14.2f}{result['max_rss_mb']:>10.0f}",
+            end="",
+        )
+        for stage in stages:
+            print(f"{result['latency'][stage]:>14.2f}", end="")
+        print()
+
+    baseline, quantized = results["none"], results["int8"]
+    same_questions = sum(
+        a == b for a, b in zip(baseline["questions"], quantized["questions"])
+    )
+    print()
+    print(f"Оценка fp32: {baseline['score']}, int8: {quantized['score']}")
+    print(
+        f"Совпавших вопросов: {same_questions} из {len(baseline['questions'])}, "
+        f"отчёты {'совпали' if baseline['report'] == quantized['report'] else 'различаются'}"
+    )
+
+
+if __name__ == "__main__":
+    main()
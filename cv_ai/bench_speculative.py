@@ -0,0 +1,126 @@
+"""Ускорение от спекулятивного декодирования с черновой моделью.
+
+Запуск из корня репозитория (основная модель — BASE_MODEL):
+    BASE_MODEL=Vikhrmodels/Vikhr-Llama-3.2-1B-Instruct \\
+        python -m cv_ai.bench_speculative \\
+        --draft Vikhrmodels/Vikhr-Qwen-2.5-0.5b-Instruct --repeats 3
+
+Обычное и ассистированное декодирование запускаются в отдельных процессах
+на промптах resume_shrink и отчёта по ответам (analyze_answers) из
+cv_ai/samples.py. Жадное ассистированное декодирование не меняет ответ,
+поэтому ответы сверяются, а доля принятых черновых токенов берётся из
+метрики cv_ai_speculative_tokens_total.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+
+def run_candidate(repeats: int) -> dict:
+    from cv_ai import metrics
+    from cv_ai.answers_analize import AnswersAnalyzer
+    from cv_ai.samples import answers, questions, resume
+    from cv_ai.shrink import Shrinker
+    from cv_ai.warmup import Readiness, warm_up
+
+    # Загрузка и компиляция обеих моделей не должны попасть в замер
+    warm_up(Readiness())
+    metrics.SPECULATIVE_TOKENS.take()
+
+    shrinker = Shrinker()
+    analyzer = AnswersAnalyzer()
+    calls = {
+        "resume_shrink": lambda: shrinker.resume_shrink(resume),
+        "report": lambda: analyzer.analyze_answers(questions, answers),
+    }
+
+    outputs = {}
+    latency = {}
+    for name, call in calls.items():
+        durations = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            outputs[name] = call()
+            durations.append(time.perf_counter() - started)
+        latency[name] = statistics.median(durations)
+
+    tokens = {"drafted": 0, "accepted": 0}
+    for (_, result), amount in metrics.SPECULATIVE_TOKENS.take().items():
+        tokens[result] += amount
+    return {"outputs": outputs, "latency": latency, "tokens": tokens}
+
+
+def run_subprocess(draft_model: str, repeats: int) -> dict | None:
+    env = {
+        **os.environ,
+        "DRAFT_MODEL": draft_model,
+        "RESULT_CACHE_ENABLED": "false",
+    }
+    try:
+        completed = subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                "cv_ai.bench_speculative",
+                "--candidate",
+                "--repeats",
+                str(repeats),
+            ],
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except subprocess.CalledProcessError as e:
+        print(f"{draft_model or 'без черновой модели'}: ошибка\n{e.stderr[-2000:]}")
+        return None
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--draft", default="Vikhrmodels/Vikhr-Qwen-2.5-0.5b-Instruct")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--candidate", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.candidate:
+        print(json.dumps(run_candidate(args.repeats)))
+        return
+
+    print("Замер без черновой модели...", file=sys.stderr)
+    baseline = run_subprocess("", args.repeats)
+    print(f"Замер с черновой моделью {args.draft}...", file=sys.stderr)
+    speculative = run_subprocess(args.draft, args.repeats)
+    if baseline is None or speculative is None:
+        sys.exit(1)
+
+    print(f"{'этап':<15}{'обычно, с':>11}{'с черновой, с':>15}{'ускорение':>11}")
+    for name, seconds in baseline["latency"].items():
+        assisted = speculative["latency"][name]
+        print(
+            f"{name:<15}{seconds:>11.2f}{assisted:>15.2f}{seconds / assisted:>10.2f}x"
+        )
+
+    tokens = speculative["tokens"]
+    print()
+    if tokens["drafted"]:
+        print(
+            f"Принято черновых токенов: {tokens['accepted']:.0f} из "
+            f"{tokens['drafted']:.0f} ({tokens['accepted'] / tokens['drafted']:.0%})"
+        )
+    mismatched = [
+        name
+        for name, output in baseline["outputs"].items()
+        if speculative["outputs"][name] != output
+    ]
+    print(f"Ответы: {'совпали' if not mismatched else f'различаются в {mismatched}'}")
+
+
+if __name__ == "__main__":
+    main()
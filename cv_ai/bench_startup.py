@@ -0,0 +1,103 @@
+"""Время старта с сохранёнными артефактами torch.compile и без них.
+
+Запуск из корня репозитория:
+    python -m cv_ai.bench_startup --repeats 2
+
+Каждый запуск — отдельный процесс с чистым кэшем Inductor: cold компилирует
+модель с нуля и сохраняет артефакты в COMPILE_CACHE_DIR, warm загружает их.
+Меряется время от старта процесса до конца прогрева и задержка первого
+настоящего запроса после прогрева.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+PROCESS_STARTED = time.perf_counter()
+
+
+def run_candidate() -> dict:
+    from cv_ai.cv_analyze import ResumeVacancyAnalyze
+    from cv_ai.samples import resume, vacancy
+    from cv_ai.warmup import Readiness, warm_up
+
+    warm_up(Readiness())
+    startup_seconds = time.perf_counter() - PROCESS_STARTED
+
+    started = time.perf_counter()
+    ResumeVacancyAnalyze().analyze_resume_vs_vacancy(resume, vacancy)
+    return {
+        "startup_seconds": startup_seconds,
+        "first_request_seconds": time.perf_counter() - started,
+    }
+
+
+def run_subprocess(compile_cache_dir: str) -> dict | None:
+    # Свежий кэш Inductor, чтобы warm выигрывал только за счёт артефактов
+    inductor_dir = tempfile.mkdtemp(prefix="inductor-")
+    env = {
+        **os.environ,
+        "COMPILE_CACHE_DIR": compile_cache_dir,
+        "TORCHINDUCTOR_CACHE_DIR": inductor_dir,
+        "TORCH_COMPILE": "true",
+        "RESULT_CACHE_ENABLED": "false",
+        "PERFORMANCE_PROFILE": "",
+    }
+    try:
+        completed = subprocess.run(
+            [sys.executable, "-m", "cv_ai.bench_startup", "--candidate"],
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except subprocess.CalledProcessError as e:
+        print(f"Ошибка запуска\n{e.stderr[-2000:]}", file=sys.stderr)
+        return None
+    finally:
+        shutil.rmtree(inductor_dir, ignore_errors=True)
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=2)
+    parser.add_argument("--candidate", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.candidate:
+        print(json.dumps(run_candidate()))
+        return
+
+    results = {"cold": [], "warm": []}
+    for _ in range(args.repeats):
+        compile_cache_dir = tempfile.mkdtemp(prefix="compiled-")
+        try:
+            for mode in results:
+                print(f"Замер {mode}...", file=sys.stderr)
+                result = run_subprocess(compile_cache_dir)
+                if result is None:
+                    sys.exit(1)
+                results[mode].append(result)
+        finally:
+            shutil.rmtree(compile_cache_dir, ignore_errors=True)
+
+    print(f"{'режим':<8}{'старт, с':>10}{'первый запрос, с':>18}")
+    medians = {}
+    for mode, runs in results.items():
+        startup = statistics.median(run["startup_seconds"] for run in runs)
+        first_request = statistics.median(run["first_request_seconds"] for run in runs)
+        medians[mode] = startup
+        print(f"{mode:<8}{startup:>10.1f}{first_request:>18.2f}")
+    print()
+    print(f"Выигрыш на старте: {medians['cold'] - medians['warm']:.1f} с")
+
+
+if __name__ == "__main__":
+    main()
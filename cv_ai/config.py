@@ -13,4 +13,173 @@ class Config(BaseSettings):
         default="Vikhrmodels/Vikhr-Qwen-2.5-0.5b-Instruct", description="Базовая модель"
     )
 
+    BATCH_MAX_SIZE: int = Field(
+        default=8, description="Максимальное число промптов в одном вызове generate"
+    )
+    BATCH_WINDOW_MS: int = Field(
+        default=30, description="Окно ожидания промптов для сбора батча, мс"
+    )
+    MODEL_MEMORY_BUDGET_MB: int = Field(
+        default=8192,
+        description="Бюджет памяти под загруженные модели, MB (0 — без ограничения)",
+    )
+    MODEL_IDLE_TTL: int = Field(
+        default=0,
+        description="Через сколько секунд простоя выгружать модель (0 — не выгружать)",
+    )
+    PREFIX_CACHE_SIZE: int = Field(
+        default=16,
+        description="Сколько KV-кэшей системных промптов держать на модель (0 — выкл.)",
+    )
+    RESULT_CACHE_ENABLED: bool = Field(
+        default=True, description="Кэшировать результаты LLM-этапов"
+    )
+    RESULT_CACHE_SIZE: int = Field(
+        default=1024, description="Сколько результатов держать в памяти процесса"
+    )
+    RESULT_CACHE_DIR: str = Field(
+        default="./model_cache/results",
+        description="Каталог дискового кэша результатов (пусто — только память)",
+    )
+    SCORE_MODE: str = Field(
+        default="generate",
+        description="Оценка соответствия: generate — генерация числа, logits — один проход",
+    )
+    PRESCREEN_ENABLED: bool = Field(
+        default=False,
+        description="Отсеивать резюме по эмбеддингам до вызова LLM. По умолчанию "
+        "выключено: отсеянные резюме LLM не оценивает, а PRESCREEN_THRESHOLD "
+        "нужно подобрать на своих данных",
+    )
+    EMBEDDING_MODEL: str = Field(
+        default="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
+        description="Модель эмбеддингов для предварительного отбора",
+    )
+    PRESCREEN_THRESHOLD: float = Field(
+        default=0.25,
+        description="Минимальное косинусное сходство резюме с вакансией, "
+        "ниже которого резюме отсеивается при PRESCREEN_ENABLED",
+    )
+    PRESCREEN_TOP_N: int = Field(
+        default=0, description="Сколько лучших резюме пропускать к LLM (0 — все)"
+    )
+    EMBEDDING_BATCH_SIZE: int = Field(
+        default=32, description="Размер батча при расчёте эмбеддингов"
+    )
+    SHRINK_INPUT_TOKEN_BUDGET: int = Field(
+        default=1536,
+        description="Сколько токенов документа подавать в промпт сжатия без нарезки",
+    )
+    SHRINK_CHUNK_TOKENS: int = Field(
+        default=1024, description="Размер фрагмента длинного документа, токенов"
+    )
+    SHRINK_MAX_CHUNKS: int = Field(
+        default=6, description="Жёсткий предел числа фрагментов, остальное отбрасывается"
+    )
+    SHRINK_CHUNK_SUMMARY_TOKENS: int = Field(
+        default=192, description="Лимит генерации на конспект одного фрагмента"
+    )
+    QUANTIZATION: str = Field(
+        default="none",
+        description="Квантизация на CPU: none или int8 (динамическая, Linear-слои)",
+    )
+    INFERENCE_WORKERS: int = Field(
+        default=0,
+        description="Число процессов инференса (0 — инференс в основном процессе)",
+    )
+    INFERENCE_THREADS_PER_WORKER: int = Field(
+        default=0, description="torch.set_num_threads в воркере (0 — ядра поровну)"
+    )
+    INFERENCE_START_METHOD: str = Field(
+        default="fork",
+        description="fork — веса грузятся до fork и разделяются copy-on-write, "
+        "spawn — каждый воркер грузит модель сам",
+    )
+    INFERENCE_BACKEND: str = Field(
+        default="hf",
+        description="hf — локальная модель transformers, ollama или openai — HTTP-сервер",
+    )
+    OLLAMA_URL: str = Field(
+        description="URL сервера ollama/OpenAI-совместимого API",
+        default="http://localhost:11434",
+    )
+    LLM: str = Field(description="Модель на HTTP-сервере", default="llama3")
+    BACKEND_API_KEY: str = Field(
+        default="", description="Bearer-токен OpenAI-совместимого сервера"
+    )
+    BACKEND_MAX_CONNECTIONS: int = Field(
+        default=8, description="Пул соединений и предел одновременных HTTP-запросов"
+    )
+    BACKEND_TIMEOUT: float = Field(
+        default=120.0, description="Таймаут HTTP-запроса к серверу инференса, с"
+    )
+    PIPELINE_MODE: str = Field(
+        default="multistep",
+        description="multistep — сжатие, оценка и вопросы отдельными вызовами, "
+        "fused — один вызов с JSON-ответом и откатом на multistep",
+    )
+    FUSED_MAX_NEW_TOKENS: int = Field(
+        default=768, description="Лимит генерации JSON-ответа в режиме fused"
+    )
+    WARMUP_ENABLED: bool = Field(
+        default=True,
+        description="Загружать и прогревать модель при старте, а не на первом запросе",
+    )
+    WARMUP_MAX_NEW_TOKENS: int = Field(
+        default=8, description="Длина прогревочных генераций, токенов"
+    )
+    GENERATION_MAX_TIME: float = Field(
+        default=0,
+        description="Предел времени на один вызов generate, с (0 — без предела)",
+    )
+    PERFORMANCE_PROFILE: str = Field(
+        default="./model_cache/performance_profile.json",
+        description="Профиль от python -m cv_ai.autotune (пусто — не загружать)",
+    )
+    TORCH_THREADS: int = Field(
+        default=0,
+        description="torch.set_num_threads в основном процессе (0 — по умолчанию)",
+    )
+    MODEL_DTYPE: str = Field(
+        default="auto",
+        description="dtype модели: auto (float16 на GPU, float32 на CPU), "
+        "float32, bfloat16 или float16",
+    )
+    TORCH_COMPILE: bool = Field(
+        default=True, description="Компилировать модель через torch.compile"
+    )
+    COMPILE_CACHE_DIR: str = Field(
+        default="./model_cache/compiled",
+        description="Каталог артефактов torch.compile между перезапусками; "
+        "пустая строка отключает",
+    )
+    MODEL_RUNTIME: str = Field(
+        default="torch",
+        description="torch — transformers, onnx — ONNX Runtime на CPU "
+        "(нужен poetry install -E onnx)",
+    )
+    DRAFT_MODEL: str = Field(
+        default="",
+        description="Маленькая модель для спекулятивного декодирования BASE_MODEL, "
+        "например Vikhrmodels/Vikhr-Qwen-2.5-0.5b-Instruct (пусто — выключено)",
+    )
+    DRAFT_NUM_TOKENS: int = Field(
+        default=5, description="Сколько токенов черновая модель предлагает за шаг"
+    )
+    SHRINK_MAX_TIME: float = Field(
+        default=0,
+        description="Бюджет сжатия резюме или вакансии, с; при превышении берётся "
+        "обрезанный исходный текст (0 — без ограничения)",
+    )
+    SCORE_MAX_TIME: float = Field(
+        default=0,
+        description="Бюджет оценки соответствия, с; при превышении оценка считается "
+        "по эмбеддингам (0 — без ограничения)",
+    )
+    QUESTIONS_MAX_TIME: float = Field(
+        default=0,
+        description="Бюджет генерации вопросов, с; при превышении берутся успевшие "
+        "вопросы и общие (0 — без ограничения)",
+    )
+
 config = Config()
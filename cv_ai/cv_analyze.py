@@ -1,68 +1,67 @@
 import re
 
 import torch
-from aiogram import Bot
 from loguru import logger
-from transformers import (
-    AutoModelForCausalLM,
-    AutoTokenizer,
-    BitsAndBytesConfig,
-    pipeline,
-)
 
+from cv_ai.backends import HFBackend
 from cv_ai.config import config
-from cv_ai.model_init import ModelManager
-from cv_ai.shrink import Shrinker
+from cv_ai.generation import GenerationTask, time_budget
+from cv_ai.prefix_cache import format_chat
+from cv_ai.result_cache import cached_batch_stage
+from cv_ai.stopping import StopSpec
 
 
-class ResumeVacancyAnalyze:
-    def __init__(self):
-        self.model_manager = ModelManager()
-        self.model, self.tokenizer, self.pipe = self.model_manager.get_model()
-
-    def _run_model(self, prompt: str, max_new_tokens: int = 10) -> str:
-        try:
-            formatted_prompt = self.tokenizer.apply_chat_template(
-                [{"role": "user", "content": prompt}],
-                tokenize=False,
-                add_generation_prompt=True,
-            )
-
-            outputs = self.pipe(
-                formatted_prompt,
-                max_new_tokens=max_new_tokens,
-                do_sample=False,
-                num_beams=1,
-                temperature=0.0,
-                top_k=50,
-                top_p=0.95,
-                eos_token_id=self.tokenizer.eos_token_id,
-            )
-
-            generated_text = outputs[0]["generated_text"][
-                len(formatted_prompt) :
-            ].strip()
-            return generated_text
+class ResumeVacancyAnalyze(GenerationTask):
+    def analyze_resume_vs_vacancy(self, resume_text: str, vacancy_text: str) -> float:
+        return self.analyze_batch([resume_text], vacancy_text)[0]
 
-        except Exception as e:
-            logger.info(f"Ошибка при генерации текста: {e}")
-            return ""
+    @time_budget("SCORE_MAX_TIME")
+    def analyze_batch(self, resume_texts: list[str], vacancy_text: str) -> list[float]:
+        """Оценки нескольких резюме для одной вакансии: промпты уходят
+        в планировщик разом и считаются одним батчем модели."""
+        # Логиты доступны только у локальной модели
+        if config.SCORE_MODE == "logits" and isinstance(self.backend, HFBackend):
+            scored = self.score_resumes(resume_texts, vacancy_text)
+            for score, confidence in scored:
+                logger.info(
+                    f"Оценка по логитам: {score:.1f} (уверенность {confidence:.2f})"
+                )
+            return [score for score, _ in scored]
+        return self._generate_scores(resume_texts, vacancy_text)
 
-    def analyze_resume_vs_vacancy(self, resume_text: str, vacancy_text: str) -> float:
+    @cached_batch_stage(
+        "resume_score", version=1, should_cache=lambda score: score >= 0
+    )
+    def _generate_scores(
+        self, resume_texts: list[str], vacancy_text: str
+    ) -> list[float]:
         system_prompt = "Ты - эксперт по подбору персонала. Никакого дополнительного текста. Выводи только число от 0 до 100"
 
-        user_prompt = (
-            f"Оцени возможность кандидата пройти по данному резюме на работу по вакансии по шкале от 0 до 100, где 0 - полное несоответствие, 100 - идеальное соответствие.\n\n"
-            f"ВАКАНСИЯ:\n{vacancy_text}\n\n"
+        instruction = (
+            "Оцени возможность кандидата пройти по данному резюме на работу по вакансии по шкале от 0 до 100, где 0 - полное несоответствие, 100 - идеальное соответствие.\n\n"
+            "ВАКАНСИЯ:\n"
+        )
+
+        prompts = [
+            f"{system_prompt}\n\n{instruction}{vacancy_text}\n\n"
             f"РЕЗЮМЕ:\n{resume_text}\n\n"
             f"Оценка соответствия (только число):"
-        )
+            for resume_text in resume_texts
+        ]
+        prefix = f"{system_prompt}\n\n{instruction}"
 
-        full_prompt = f"{system_prompt}\n\n{user_prompt}"
+        raw_outputs = self._run_model_batch(
+            prompts,
+            max_new_tokens=10,
+            prefix=prefix,
+            stop=StopSpec(first_number=True),
+        )
+        return [self._parse_score(raw_output) for raw_output in raw_outputs]
 
-        raw_output = self._run_model(full_prompt, max_new_tokens=10)
+    @staticmethod
+    def _parse_score(raw_output: str) -> float:
         logger.info(f"Модель ответила: '{raw_output}'")
-        
+
         # Ищем число в ответе
         match = re.search(r"(\d{1,3})", raw_output)
         if match:
@@ -72,3 +71,62 @@ class ResumeVacancyAnalyze:
             logger.info(f"Не удалось извлечь число из ответа: '{raw_output}'")
             return -1
 
+    def _digit_token_ids(self) -> list[int]:
+        token_ids = []
+        for digit in "0123456789":
+            ids = self.tokenizer.encode(digit, add_special_tokens=False)
+            if len(ids) != 1:
+                raise ValueError(f"Токенизатор не кодирует цифру {digit} одним токеном")
+            token_ids.append(ids[0])
+        return token_ids
+
+    @staticmethod
+    def _logit_prompt(resume_text: str, vacancy_text: str) -> str:
+        system_prompt = "Ты - эксперт по подбору персонала. Никакого дополнительного текста. Выводи только одну цифру от 0 до 9"
+
+        user_prompt = (
+            f"Оцени возможность кандидата пройти по данному резюме на работу по вакансии по шкале от 0 до 9, где 0 - полное несоответствие, 9 - идеальное соответствие.\n\n"
+            f"ВАКАНСИЯ:\n{vacancy_text}\n\n"
+            f"РЕЗЮМЕ:\n{resume_text}\n\n"
+            f"Оценка соответствия (одна цифра):"
+        )
+
+        return f"{system_prompt}\n\n{user_prompt}"
+
+    def score_resume_vs_vacancy(
+        self, resume_text: str, vacancy_text: str
+    ) -> tuple[float, float]:
+        """Оценка без декодирования: один прямой проход и распределение по цифрам."""
+        return self.score_resumes([resume_text], vacancy_text)[0]
+
+    @cached_batch_stage("resume_score_logits", version=1)
+    def score_resumes(
+        self, resume_texts: list[str], vacancy_text: str
+    ) -> list[tuple[float, float]]:
+        return self.score_batch(
+            [(resume_text, vacancy_text) for resume_text in resume_texts]
+        )
+
+    def score_batch(self, pairs: list[tuple[str, str]]) -> list[tuple[float, float]]:
+        """Оценивает пары (резюме, вакансия) через планировщик модели: пары
+        склеиваются в батч с оценками из других потоков и не мешают генерации.
+
+        Модель просят ответить цифрой 0–9, на позиции ответа берутся вероятности
+        токенов цифр. Возвращает ожидаемую оценку 0–100 и уверенность
+        (вероятность самой вероятной цифры после нормировки).
+        """
+        prompts = [
+            format_chat(self.tokenizer, self._logit_prompt(*pair))[0] for pair in pairs
+        ]
+        probs = torch.tensor(
+            self.backend.model_manager.score(
+                prompts, self._digit_token_ids(), model_name=self.backend.model_name
+            )
+        )
+        digit_values = torch.arange(10, dtype=torch.float32) * 100 / 9
+        expected = (probs * digit_values).sum(dim=-1)
+        confidence = probs.max(dim=-1).values
+        return [
+            (float(score), float(conf))
+            for score, conf in zip(expected.tolist(), confidence.tolist())
+        ]
@@ -0,0 +1,84 @@
+import json
+import re
+
+from loguru import logger
+from pydantic import BaseModel, Field, ValidationError
+
+from cv_ai.config import config
+from cv_ai.generation import GenerationTask
+from cv_ai.result_cache import cached_stage
+from cv_ai.shrink import Shrinker
+
+
+class ScreeningResult(BaseModel):
+    score: float = Field(ge=0, le=100, description="Соответствие вакансии, 0–100")
+    summary: str = Field(min_length=1, description="Краткое резюме кандидата")
+    questions: list[str] = Field(min_length=1, description="Вопросы для интервью")
+
+
+class FusedScreener(GenerationTask):
+    """Скрининг одним вызовом модели: оценка, краткое резюме и вопросы в JSON.
+
+    Заменяет цепочку resume_shrink → vacancy_shrink → оценка → вопросы.
+    Если ответ не проходит схему ScreeningResult, screen возвращает None,
+    и вызывающий код идёт по многошаговому пути.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.shrinker = Shrinker()
+
+    @staticmethod
+    def parse(raw_output: str, num_questions: int) -> ScreeningResult | None:
+        # Модель может обернуть JSON в ```json ... ``` или добавить пояснения
+        match = re.search(r"\{.*\}", raw_output, re.DOTALL)
+        if not match:
+            logger.info(f"В ответе нет JSON: '{raw_output[:200]}'")
+            return None
+        try:
+            result = ScreeningResult.model_validate(json.loads(match.group(0)))
+        except (ValueError, ValidationError) as e:
+            logger.info(f"Ответ не соответствует схеме: {e}")
+            return None
+
+        questions = [q.strip() for q in result.questions if q.strip()]
+        if not questions:
+            return None
+        result.questions = questions[:num_questions]
+        return result
+
+    @cached_stage("fused_screening", version=1, should_cache=lambda r: r is not None)
+    def screen(
+        self, resume_text: str, vacancy_text: str, num_questions: int = 8
+    ) -> dict | None:
+        resume_text = self.shrinker.fit_budget(resume_text, "резюме")
+        vacancy_text = self.shrinker.fit_budget(vacancy_text, "вакансии")
+
+        system_prompt = (
+            "Ты — Senior HR-специалист. Отвечай только JSON-объектом без markdown "
+            "и комментариев."
+        )
+
+        instruction = (
+            "Сравни резюме кандидата с вакансией и верни JSON строго такого вида:\n"
+            '{"score": <число от 0 до 100, где 0 - полное несоответствие, '
+            "100 - идеальное соответствие>, "
+            '"summary": "<кандидат в 2-3 предложениях: должность, стаж, ключевые навыки>", '
+            f'"questions": [<ровно {num_questions} коротких вопросов для собеседования '
+            "по резюме и вакансии>]}\n\n"
+            "ВАКАНСИЯ:\n"
+        )
+
+        user_prompt = f"{instruction}{vacancy_text}\n\nРЕЗЮМЕ:\n{resume_text}\n\nJSON:"
+
+        full_prompt = f"{system_prompt}\n\n{user_prompt}"
+        prefix = f"{system_prompt}\n\n{instruction}"
+
+        raw_output = self._run_model(
+            full_prompt, max_new_tokens=config.FUSED_MAX_NEW_TOKENS, prefix=prefix
+        )
+
+        result = self.parse(raw_output, num_questions)
+        if result is None:
+            return None
+        return result.model_dump()
@@ -0,0 +1,130 @@
+import math
+import time
+from contextvars import ContextVar
+from dataclasses import replace
+from functools import wraps
+
+from loguru import logger
+
+from cv_ai.backends import get_backend
+from cv_ai.config import config
+from cv_ai.stopping import GenerationTimeout, StopSpec
+
+# Дедлайн текущего этапа (time.monotonic), общий для всех его генераций
+_deadline: ContextVar[float | None] = ContextVar("generation_deadline", default=None)
+
+
+def time_budget(setting: str):
+    """Ограничивает все генерации метода общим бюджетом config.<setting> секунд
+    (0 — без ограничения). Генерация останавливается по max_time, а метод
+    выбрасывает GenerationTimeout, чтобы вызывающий код выбрал запасной вариант."""
+
+    def decorator(method):
+        @wraps(method)
+        def wrapper(*args, **kwargs):
+            seconds = getattr(config, setting)
+            if seconds <= 0:
+                return method(*args, **kwargs)
+            deadline = time.monotonic() + seconds
+            current = _deadline.get()
+            if current is not None:
+                deadline = min(current, deadline)
+            token = _deadline.set(deadline)
+            try:
+                return method(*args, **kwargs)
+            finally:
+                _deadline.reset(token)
+
+        return wrapper
+
+    return decorator
+
+
+def deadline_passed() -> bool:
+    """Бюджет текущего этапа уже исчерпан: результат, полученный после
+    дедлайна, мог быть оборван и в кэш не попадает."""
+    deadline = _deadline.get()
+    return deadline is not None and time.monotonic() >= deadline
+
+
+class GenerationTask:
+    """Общая основа классов cv_ai, которые генерируют текст через бэкенд."""
+
+    def __init__(self):
+        self.backend = get_backend()
+        self.tokenizer = self.backend.tokenizer
+
+    def _limit_time(self, stop: StopSpec | None) -> StopSpec | None:
+        max_time = stop.max_time if stop is not None else None
+        if max_time is None:
+            max_time = config.GENERATION_MAX_TIME or None
+        deadline = _deadline.get()
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise GenerationTimeout()
+            # Округляем вниз до десятой секунды: планировщик группирует запросы
+            # по StopSpec, и одинаковые пределы позволяют им попасть в один батч,
+            # а округление вниз не выводит генерацию за бюджет
+            remaining = max(math.floor(remaining * 10) / 10, 0.1)
+            max_time = remaining if max_time is None else min(max_time, remaining)
+        if max_time is None:
+            return stop
+        return replace(stop or StopSpec(), max_time=max_time)
+
+    @staticmethod
+    def _check_deadline(partial: str = ""):
+        if deadline_passed():
+            raise GenerationTimeout(partial)
+
+    @staticmethod
+    def _on_timeout(error: GenerationTimeout) -> str:
+        # Без бюджета этапа предел GENERATION_MAX_TIME, как и раньше, просто
+        # укорачивает ответ; под бюджетом вызывающий код выбирает запасной вариант
+        if _deadline.get() is not None:
+            raise error
+        logger.info("Генерация остановлена по GENERATION_MAX_TIME")
+        return error.partial
+
+    def _run_model(
+        self,
+        prompt: str,
+        max_new_tokens: int = 256,
+        prefix: str | None = None,
+        stop: StopSpec | None = None,
+    ) -> str:
+        stop = self._limit_time(stop)
+        try:
+            raw_output = self.backend.generate(
+                prompt, max_new_tokens=max_new_tokens, prefix=prefix, stop=stop
+            )
+        except GenerationTimeout as e:
+            raw_output = self._on_timeout(e)
+        except Exception as e:
+            logger.info(f"Ошибка при генерации текста: {e}")
+            raw_output = ""
+        self._check_deadline(raw_output)
+        return raw_output
+
+    def _run_model_batch(
+        self,
+        prompts: list[str],
+        max_new_tokens: int = 256,
+        prefix: str | None = None,
+        stop: StopSpec | None = None,
+    ) -> list[str]:
+        """Как _run_model, но все промпты уходят в бэкенд разом, одним батчем."""
+        stop = self._limit_time(stop)
+        try:
+            raw_outputs = self.backend.generate_batch(
+                prompts, max_new_tokens=max_new_tokens, prefix=prefix, stop=stop
+            )
+        except GenerationTimeout as e:
+            # Ответы остальных строк батча потеряны вместе с оборванной
+            self._on_timeout(e)
+            raw_outputs = [""] * len(prompts)
+        except Exception as e:
+            logger.info(f"Ошибка при генерации текста: {e}")
+            raw_outputs = [""] * len(prompts)
+        self._check_deadline()
+        return raw_outputs
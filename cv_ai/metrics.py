@@ -0,0 +1,207 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Границы по умолчанию покрывают и миллисекундные этапы, и минутные генерации
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+TOKENS_BUCKETS = (1, 8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096)
+RATE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+class Histogram:
+    """Гистограмма в формате Prometheus с произвольными метками."""
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...], buckets):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # метки → [счётчики по корзинам, сумма, количество]
+        self._values: dict[tuple[str, ...], list] = {}
+
+    def _state(self, label_values: tuple[str, ...]) -> list:
+        state = self._values.get(label_values)
+        if state is None:
+            state = self._values[label_values] = [[0] * len(self.buckets), 0.0, 0]
+        return state
+
+    def observe(self, value: float, **labels: str):
+        label_values = tuple(str(labels.get(label, "")) for label in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._state(label_values)
+            if index < len(self.buckets):
+                state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def take(self) -> dict:
+        with self._lock:
+            values, self._values = self._values, {}
+        return values
+
+    def merge(self, values: dict):
+        with self._lock:
+            for label_values, (counts, total, count) in values.items():
+                state = self._state(label_values)
+                state[0] = [a + b for a, b in zip(state[0], counts)]
+                state[1] += total
+                state[2] += count
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for label_values, (counts, total, count) in items:
+            pairs = [f'{k}="{v}"' for k, v in zip(self.labels, label_values)]
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = ",".join([*pairs, f'le="{bound}"'])
+                lines.append(f"{self.name}_bucket{{{labels}}} {cumulative}")
+            labels = ",".join([*pairs, 'le="+Inf"'])
+            lines.append(f"{self.name}_bucket{{{labels}}} {count}")
+            labels = ",".join(pairs)
+            lines.append(f"{self.name}_sum{{{labels}}} {total}")
+            lines.append(f"{self.name}_count{{{labels}}} {count}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...]):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._lock = threading.Lock()
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str):
+        label_values = tuple(str(labels.get(label, "")) for label in self.labels)
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def take(self) -> dict:
+        with self._lock:
+            values, self._values = self._values, {}
+        return values
+
+    def merge(self, values: dict):
+        with self._lock:
+            for label_values, amount in values.items():
+                self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for label_values, amount in items:
+            labels = ",".join(f'{k}="{v}"' for k, v in zip(self.labels, label_values))
+            lines.append(f"{self.name}{{{labels}}} {amount}")
+        return lines
+
+
+class Registry:
+    """Метрики процесса. Воркеры пула инференса отдают накопленное через
+    take() родителю, который вливает его в свой реестр через merge()."""
+
+    def __init__(self):
+        self._metrics: dict[str, Histogram | Counter] = {}
+
+    def histogram(
+        self, name: str, help: str, labels: tuple[str, ...], buckets=SECONDS_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def counter(self, name: str, help: str, labels: tuple[str, ...]) -> Counter:
+        return self._register(Counter(name, help, labels))
+
+    def _register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def take(self) -> dict:
+        return {
+            name: values
+            for name, metric in self._metrics.items()
+            if (values := metric.take())
+        }
+
+    def merge(self, snapshot: dict):
+        for name, values in snapshot.items():
+            self._metrics[name].merge(values)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+PROMPT_TOKENS = registry.histogram(
+    "cv_ai_prompt_tokens", "Токенов в промпте запроса", ("model",), TOKENS_BUCKETS
+)
+GENERATED_TOKENS = registry.histogram(
+    "cv_ai_generated_tokens",
+    "Сгенерировано токенов на запрос",
+    ("model",),
+    TOKENS_BUCKETS,
+)
+QUEUE_WAIT = registry.histogram(
+    "cv_ai_queue_wait_seconds", "Ожидание запроса в очереди планировщика", ("model",)
+)
+BATCH_SIZE = registry.histogram(
+    "cv_ai_batch_size", "Промптов в одном вызове generate", ("model",), TOKENS_BUCKETS
+)
+PREFILL_SECONDS = registry.histogram(
+    "cv_ai_prefill_seconds", "Префилл и первый токен вызова generate", ("model",)
+)
+DECODE_SECONDS = registry.histogram(
+    "cv_ai_decode_seconds", "Декодирование после первого токена", ("model",)
+)
+TOKENS_PER_SECOND = registry.histogram(
+    "cv_ai_decode_tokens_per_second",
+    "Скорость декодирования одной строки батча",
+    ("model",),
+    RATE_BUCKETS,
+)
+STAGE_SECONDS = registry.histogram(
+    "cv_ai_stage_seconds",
+    "Время LLM-этапа cv_ai без учёта попаданий в кэш",
+    ("stage", "model"),
+)
+PIPELINE_SECONDS = registry.histogram(
+    "hr_pipeline_stage_seconds",
+    "Время этапа обработки резюме в боте, включая очередь пула",
+    ("stage", "model"),
+)
+SPECULATIVE_TOKENS = registry.counter(
+    "cv_ai_speculative_tokens_total",
+    "Токены черновой модели: предложенные и принятые основной",
+    ("model", "result"),
+)
+DEGRADED_STAGES = registry.counter(
+    "hr_pipeline_degraded_total",
+    "Этапы, не уложившиеся в бюджет времени и заменённые запасным вариантом",
+    ("stage",),
+)
+PIPELINE_ITEMS = registry.counter(
+    "hr_pipeline_items_total",
+    "Резюме, прошедшие этап конвейера обработки архива",
+    ("stage",),
+)
+RESULT_CACHE = registry.counter(
+    "cv_ai_result_cache_total", "Обращения к кэшу результатов", ("stage", "result")
+)
+
+
+@contextmanager
+def timer(histogram: Histogram, **labels: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - started, **labels)
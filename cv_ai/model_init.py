@@ -1,17 +1,481 @@
+import gc
 import os
+import queue
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable
 
 import torch
+import transformers
 from loguru import logger
-from transformers import (
-    AutoModelForCausalLM,
-    AutoTokenizer,
-    pipeline,
-)
+from sentence_transformers import SentenceTransformer
+from transformers import AutoModelForCausalLM, AutoTokenizer, StoppingCriteriaList
 
 from cv_ai.config import config
+from cv_ai.perf_profile import apply_profile
+from cv_ai.prefix_cache import PrefixCache
+from cv_ai import metrics
+from cv_ai.stopping import (
+    FirstTokenTimer,
+    GenerationTimeout,
+    StopSpec,
+    StopSpecCriteria,
+    TimeLimitCriteria,
+)
+
+
+@dataclass
+class GenerationRequest:
+    prompt: str
+    max_new_tokens: int
+    prefix: str | None = None
+    stop: StopSpec | None = None
+    # Запрос оценки: вместо генерации один прямой проход и распределение
+    # следующего токена по этим токенам
+    score_ids: tuple[int, ...] | None = None
+    future: Future = field(default_factory=Future)
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class BatchScheduler:
+    """Собирает промпты, пришедшие в пределах короткого окна, в один вызов generate."""
+
+    def __init__(
+        self,
+        model,
+        tokenizer,
+        max_batch_size: int,
+        window_ms: int,
+        prefix_cache: PrefixCache | None = None,
+        model_name: str = "",
+        draft: "ModelEntry | None" = None,
+    ):
+        self.model = model
+        self.model_name = model_name
+        self.tokenizer = tokenizer
+        self.prefix_cache = prefix_cache
+        self.draft = draft
+        self._draft_same_vocab: tuple[Any, bool] | None = None
+        self.max_batch_size = max(1, max_batch_size)
+        self.window = window_ms / 1000
+        self._queue: queue.Queue[GenerationRequest | None] = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def submit(
+        self,
+        prompt: str,
+        max_new_tokens: int,
+        prefix: str | None = None,
+        stop: StopSpec | None = None,
+    ) -> Future:
+        request = GenerationRequest(
+            prompt=prompt, max_new_tokens=max_new_tokens, prefix=prefix, stop=stop
+        )
+        return self._enqueue(request)
+
+    def submit_score(self, prompt: str, token_ids: tuple[int, ...]) -> Future:
+        """Вероятности следующего токена среди token_ids, нормированные на них.
+        Идёт в общую очередь: оценки не конкурируют с генерацией за модель
+        и склеиваются в батч друг с другом."""
+        request = GenerationRequest(
+            prompt=prompt, max_new_tokens=0, score_ids=tuple(token_ids)
+        )
+        return self._enqueue(request)
+
+    def _enqueue(self, request: GenerationRequest) -> Future:
+        self._ensure_worker()
+        self._queue.put(request)
+        return request.future
+
+    def generate(
+        self,
+        prompt: str,
+        max_new_tokens: int,
+        prefix: str | None = None,
+        stop: StopSpec | None = None,
+    ) -> str:
+        return self.submit(prompt, max_new_tokens, prefix, stop).result()
+
+    def stop(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None and thread.is_alive():
+            self._queue.put(None)
+            # Из собственного потока join невозможен: поток выйдет сам по маркеру
+            if thread is not threading.current_thread():
+                thread.join()
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._loop, name="batch-scheduler", daemon=True
+                )
+                self._thread.start()
+
+    def _collect(
+        self, first: GenerationRequest
+    ) -> tuple[list[GenerationRequest], bool]:
+        batch = [first]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if request is None:
+                return batch, True
+            batch.append(request)
+        return batch, False
+
+    def _loop(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch, stopping = self._collect(first)
+
+            # Промпты с разным лимитом токенов и условиями остановки гоняем
+            # раздельно, чтобы короткие задачи не ждали декодирования длинных
+            groups: dict[tuple, list[GenerationRequest]] = {}
+            for request in batch:
+                key = (request.max_new_tokens, request.stop, request.score_ids)
+                groups.setdefault(key, []).append(request)
+            for (max_new_tokens, stop, _), group in groups.items():
+                self._run_batch(group, max_new_tokens, stop)
+
+            if stopping:
+                return
+
+    def _run_batch(
+        self,
+        batch: list[GenerationRequest],
+        max_new_tokens: int,
+        stop: StopSpec | None,
+    ):
+        now = time.monotonic()
+        for request in batch:
+            metrics.QUEUE_WAIT.observe(now - request.enqueued_at, model=self.model_name)
+        metrics.BATCH_SIZE.observe(len(batch), model=self.model_name)
+
+        truncated = None
+        try:
+            if batch[0].score_ids is not None:
+                results = self._score_batch(batch)
+            else:
+                # Ассистированная генерация работает только с батчем из одного
+                # промпта, под нагрузкой выгоднее обычный батч
+                if len(batch) == 1 and self.draft is not None:
+                    texts, truncated = self._generate_assisted(
+                        batch[0], max_new_tokens, stop
+                    )
+                elif self._can_reuse_prefix(batch):
+                    texts, truncated = self._generate_with_prefix(
+                        batch, max_new_tokens, stop
+                    )
+                else:
+                    texts, truncated = self._generate_batch(batch, max_new_tokens, stop)
+                results = [stop.trim(text) if stop else text.strip() for text in texts]
+        except Exception as e:
+            for request in batch:
+                request.future.set_exception(e)
+            return
+
+        logger.debug(f"Батч из {len(batch)} промптов обработан за один проход")
+        for index, (request, result) in enumerate(zip(batch, results)):
+            # Ответ, оборванный пределом времени, неполный: отдаём его
+            # как GenerationTimeout, чтобы вызывающий код выбрал запасной вариант
+            if truncated is not None and truncated[index]:
+                request.future.set_exception(GenerationTimeout(result))
+            else:
+                request.future.set_result(result)
+
+    def _encode(self, request: GenerationRequest) -> list[int]:
+        if self.prefix_cache is not None:
+            return self.prefix_cache.encode(request.prompt, request.prefix)
+        return self.tokenizer(request.prompt, add_special_tokens=False)["input_ids"]
+
+    def _can_reuse_prefix(self, batch: list[GenerationRequest]) -> bool:
+        prefix = batch[0].prefix
+        return (
+            self.prefix_cache is not None
+            and bool(prefix)
+            and all(
+                request.prefix == prefix
+                and request.prompt.startswith(prefix)
+                and len(request.prompt) > len(prefix)
+                for request in batch
+            )
+        )
+
+    def _generate(
+        self,
+        input_ids,
+        attention_mask,
+        max_new_tokens: int,
+        stop: StopSpec | None = None,
+        **kwargs,
+    ):
+        """generate с метриками. Возвращает выходы модели и для каждой строки
+        батча признак, что её оборвал предел времени (None — предела нет)."""
+        timer = FirstTokenTimer()
+        criteria = StoppingCriteriaList([timer])
+        time_limit = None
+        if stop is not None:
+            if stop.checks_text:
+                criteria.append(
+                    StopSpecCriteria(self.tokenizer, stop, input_ids.shape[1])
+                )
+            if stop.max_time:
+                time_limit = TimeLimitCriteria(
+                    self.tokenizer, stop.max_time, input_ids.shape[1], stop
+                )
+                criteria.append(time_limit)
+
+        started = time.perf_counter()
+        with torch.inference_mode():
+            outputs = self.model.generate(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                max_new_tokens=max_new_tokens,
+                do_sample=False,
+                num_beams=1,
+                eos_token_id=self.tokenizer.eos_token_id,
+                pad_token_id=self.tokenizer.pad_token_id,
+                stopping_criteria=criteria,
+                **kwargs,
+            )
+        finished = time.perf_counter()
+
+        self._record(
+            # Маска покрывает весь промпт, включая префикс из кэша
+            attention_mask.sum(dim=1),
+            outputs[:, input_ids.shape[1] :],
+            started,
+            timer.first_token_at or finished,
+            finished,
+        )
+        if time_limit is None:
+            return outputs, None
+        return outputs, time_limit.truncated or [False] * outputs.shape[0]
+
+    def _record(self, prompt_tokens, new_tokens, started, first_token_at, finished):
+        model = self.model_name
+        decode_seconds = finished - first_token_at
+        metrics.PREFILL_SECONDS.observe(first_token_at - started, model=model)
+        metrics.DECODE_SECONDS.observe(decode_seconds, model=model)
+
+        generated = (new_tokens != self.tokenizer.pad_token_id).sum(dim=1).tolist()
+        for prompt_count, generated_count in zip(prompt_tokens.tolist(), generated):
+            metrics.PROMPT_TOKENS.observe(prompt_count, model=model)
+            metrics.GENERATED_TOKENS.observe(generated_count, model=model)
+            if decode_seconds > 0 and generated_count > 1:
+                metrics.TOKENS_PER_SECOND.observe(
+                    (generated_count - 1) / decode_seconds, model=model
+                )
+
+    def _generate_batch(
+        self,
+        batch: list[GenerationRequest],
+        max_new_tokens: int,
+        stop: StopSpec | None = None,
+    ) -> tuple[list[str], list[bool] | None]:
+        encoded = [self._encode(request) for request in batch]
+        width = max(len(ids) for ids in encoded)
+        pad_id = self.tokenizer.pad_token_id
+
+        # Для decoder-only моделей батч дополняется слева
+        input_ids = torch.tensor(
+            [[pad_id] * (width - len(ids)) + ids for ids in encoded],
+            device=self.model.device,
+        )
+        attention_mask = torch.tensor(
+            [[0] * (width - len(ids)) + [1] * len(ids) for ids in encoded],
+            device=self.model.device,
+        )
+
+        outputs, truncated = self._generate(
+            input_ids, attention_mask, max_new_tokens, stop
+        )
+        new_tokens = outputs[:, width:]
+        texts = self.tokenizer.batch_decode(new_tokens, skip_special_tokens=True)
+        return texts, truncated
+
+    def _score_batch(self, batch: list[GenerationRequest]) -> list[list[float]]:
+        encoded = [
+            self.tokenizer(request.prompt, add_special_tokens=False)["input_ids"]
+            for request in batch
+        ]
+        width = max(len(ids) for ids in encoded)
+        pad_id = self.tokenizer.pad_token_id
+
+        # Слева дополняем, чтобы позиция ответа была последней у всех строк
+        input_ids = torch.tensor(
+            [[pad_id] * (width - len(ids)) + ids for ids in encoded],
+            device=self.model.device,
+        )
+        attention_mask = torch.tensor(
+            [[0] * (width - len(ids)) + [1] * len(ids) for ids in encoded],
+            device=self.model.device,
+        )
+        position_ids = (attention_mask.cumsum(-1) - 1).clamp(min=0)
+        score_ids = torch.tensor(batch[0].score_ids, device=self.model.device)
+
+        started = time.perf_counter()
+        with torch.inference_mode():
+            logits = self.model(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                position_ids=position_ids,
+                use_cache=False,
+            ).logits[:, -1, :]
+        probs = torch.softmax(logits[:, score_ids].float(), dim=-1)
+        # Оценка — это только префилл, декодирования нет
+        metrics.PREFILL_SECONDS.observe(
+            time.perf_counter() - started, model=self.model_name
+        )
+        for prompt_tokens in attention_mask.sum(dim=1).tolist():
+            metrics.PROMPT_TOKENS.observe(prompt_tokens, model=self.model_name)
+        return probs.tolist()
+
+    def _generate_assisted(
+        self,
+        request: GenerationRequest,
+        max_new_tokens: int,
+        stop: StopSpec | None = None,
+    ) -> tuple[list[str], list[bool] | None]:
+        # Черновая модель предлагает токены, основная проверяет их за один проход
+        draft = self.draft
+        kwargs = {"assistant_model": draft.model}
+        if not self._same_vocab(draft.tokenizer):
+            kwargs["tokenizer"] = self.tokenizer
+            kwargs["assistant_tokenizer"] = draft.tokenizer
+
+        input_ids = torch.tensor([self._encode(request)], device=self.model.device)
+        with (
+            count_forwards(self.model) as verified,
+            count_forwards(draft.model) as drafted,
+        ):
+            outputs, truncated = self._generate(
+                input_ids, torch.ones_like(input_ids), max_new_tokens, stop, **kwargs
+            )
+        new_tokens = outputs[0, input_ids.shape[1] :]
+
+        # Каждый проход основной модели даёт принятые черновые токены плюс один свой
+        accepted = min(drafted[0], max(0, len(new_tokens) - verified[0]))
+        model = self.model_name
+        metrics.SPECULATIVE_TOKENS.inc(drafted[0], model=model, result="drafted")
+        metrics.SPECULATIVE_TOKENS.inc(accepted, model=model, result="accepted")
+        logger.debug(
+            f"Черновая модель: принято {accepted} из {drafted[0]} токенов "
+            f"за {verified[0]} проходов основной модели"
+        )
+        return [self.tokenizer.decode(new_tokens, skip_special_tokens=True)], truncated
+
+    def _same_vocab(self, draft_tokenizer) -> bool:
+        # Словари сравниваем один раз на каждый загруженный токенизатор
+        cached = self._draft_same_vocab
+        if cached is None or cached[0] is not draft_tokenizer:
+            same = draft_tokenizer.get_vocab() == self.tokenizer.get_vocab()
+            cached = self._draft_same_vocab = (draft_tokenizer, same)
+        return cached[1]
+
+    def _generate_with_prefix(
+        self,
+        batch: list[GenerationRequest],
+        max_new_tokens: int,
+        stop: StopSpec | None = None,
+    ) -> tuple[list[str], list[bool] | None]:
+        # Батч с общим системным промптом: подставляем его готовый KV-кэш,
+        # размноженный на все строки, префилл идёт только по резюме/вакансии
+        prefix_ids, past_key_values = self.prefix_cache.get(batch[0].prefix)
+        if len(batch) > 1:
+            past_key_values.batch_repeat_interleave(len(batch))
+        suffixes = [self._encode(request)[len(prefix_ids) :] for request in batch]
+        width = max(len(ids) for ids in suffixes)
+        pad_id = self.tokenizer.pad_token_id
+
+        # Паддинг встаёт между префиксом и хвостом: префикс в кэше общий,
+        # а position_ids из маски продолжают нумерацию хвоста сразу за ним
+        input_ids = torch.tensor(
+            [prefix_ids + [pad_id] * (width - len(ids)) + ids for ids in suffixes],
+            device=self.model.device,
+        )
+        attention_mask = torch.tensor(
+            [
+                [1] * len(prefix_ids) + [0] * (width - len(ids)) + [1] * len(ids)
+                for ids in suffixes
+            ],
+            device=self.model.device,
+        )
+
+        outputs, truncated = self._generate(
+            input_ids,
+            attention_mask,
+            max_new_tokens,
+            stop,
+            past_key_values=past_key_values,
+        )
+        new_tokens = outputs[:, input_ids.shape[1] :]
+        texts = self.tokenizer.batch_decode(new_tokens, skip_special_tokens=True)
+        return texts, truncated
+
+
+@contextmanager
+def count_forwards(module):
+    """Считает вызовы forward модуля внутри блока."""
+    calls = [0]
+
+    def hook(*_):
+        calls[0] += 1
+
+    # generate обёртки torch.compile вызывает исходный модуль, хук вешаем на него
+    module = getattr(module, "_orig_mod", module)
+    handle = module.register_forward_hook(hook)
+    try:
+        yield calls
+    finally:
+        handle.remove()
+
+
+@dataclass
+class ModelEntry:
+    model: Any
+    tokenizer: Any
+    pipe: Any = None
+    scheduler: BatchScheduler | None = None
+    size_bytes: int = 0
+    last_used: float = field(default_factory=time.monotonic)
+    # Куда сохранить артефакты torch.compile после прогрева
+    compile_cache: str | None = None
+
+
+def model_size_bytes(model) -> int:
+    # Считаем по state_dict: у квантованных Linear веса лежат в упакованных
+    # параметрах и не видны через parameters()
+    total = 0
+    for value in model.state_dict().values():
+        values = value if isinstance(value, tuple) else (value,)
+        for tensor in values:
+            if isinstance(tensor, torch.Tensor):
+                total += tensor.numel() * tensor.element_size()
+    return total
 
 
 class ModelManager:
+    """Реестр моделей: каждая пара (модель, dtype, роль) загружается один раз
+    и разделяется всеми классами cv_ai. Следит за бюджетом памяти (LRU)
+    и выгружает модели, к которым давно не обращались."""
+
     _instance = None
     _model_initialized = False
 
@@ -22,71 +486,504 @@ class ModelManager:
 
     def __init__(self):
         if not self._model_initialized:
+            apply_profile()
+            if config.TORCH_THREADS > 0:
+                torch.set_num_threads(config.TORCH_THREADS)
             self.model_name = config.BASE_MODEL
             self.cache_dir = "./model_cache"
-            self.model = None
-            self.tokenizer = None
-            self.pipe = None
+            self.memory_budget = config.MODEL_MEMORY_BUDGET_MB * 1024**2
+            self.idle_ttl = config.MODEL_IDLE_TTL
+            self._entries: OrderedDict[tuple[str, str, str], ModelEntry] = OrderedDict()
+            self._loaders: dict[str, Callable[[str, torch.dtype], ModelEntry]] = {
+                "generation": self._load_generation,
+                "embedding": self._load_embedding,
+                "tokenizer": self._load_tokenizer,
+            }
+            self._lock = threading.RLock()
+            self._reaper: threading.Thread | None = None
             self._model_initialized = True
             os.makedirs(self.cache_dir, exist_ok=True)
             logger.info(f"Кэш моделей: {os.path.abspath(self.cache_dir)}")
 
-    def initialize_model(self):
-        if self.model is not None:
-            return self.model, self.tokenizer, self.pipe
+    @staticmethod
+    def default_dtype() -> torch.dtype:
+        if config.MODEL_DTYPE != "auto":
+            return getattr(torch, config.MODEL_DTYPE)
+        # Выбираем dtype в зависимости от доступности GPU
+        return torch.float16 if torch.cuda.is_available() else torch.float32
+
+    def get_entry(
+        self,
+        model_name: str | None = None,
+        dtype: torch.dtype | None = None,
+        role: str = "generation",
+    ) -> ModelEntry:
+        model_name = model_name or self.model_name
+        dtype = dtype or self.default_dtype()
+        key = (model_name, str(dtype), role)
 
-        logger.info(f"Загрузка модели {self.model_name} без 4-бит квантизации...")
+        self.evict_idle()
+        evicted = []
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._loaders[role](model_name, dtype)
+                self._entries[key] = entry
+                evicted = self._enforce_budget(keep=key)
+                self._ensure_reaper()
+            self._entries.move_to_end(key)
+            entry.last_used = time.monotonic()
+        self._release(evicted)
+        return entry
+
+    def _load_generation(self, model_name: str, dtype: torch.dtype) -> ModelEntry:
+        onnx = config.MODEL_RUNTIME == "onnx"
+        quantized = (
+            not onnx and config.QUANTIZATION == "int8" and not torch.cuda.is_available()
+        )
+        runtime = "onnx" if onnx else "int8" if quantized else dtype
+        logger.info(f"Загрузка модели {model_name} ({runtime})...")
 
         try:
-            # Выбираем dtype в зависимости от доступности GPU
-            torch_dtype = torch.float16 if torch.cuda.is_available() else torch.float32
-
-            self.model = AutoModelForCausalLM.from_pretrained(
-                self.model_name,
-                device_map="auto" if torch.cuda.is_available() else None,
-                torch_dtype=torch_dtype,
-                low_cpu_mem_usage=True,
-                trust_remote_code=True,
-                cache_dir=self.cache_dir,
-            )
+            if onnx:
+                model, size_bytes = self._load_onnx(model_name)
+            elif quantized:
+                model = self._load_int8(model_name)
+            else:
+                model = AutoModelForCausalLM.from_pretrained(
+                    model_name,
+                    device_map="auto" if torch.cuda.is_available() else None,
+                    torch_dtype=dtype,
+                    low_cpu_mem_usage=True,
+                    trust_remote_code=True,
+                    cache_dir=self.cache_dir,
+                )
+            if not onnx:
+                size_bytes = model_size_bytes(model)
 
-            # Оптимизация PyTorch 2.0+ (если доступно)
+            # Оптимизация PyTorch 2.0+ (если доступно); динамически квантованные
+            # Linear torch.compile не ускоряет
+            compile_cache = None
             try:
-                self.model = torch.compile(self.model)
+                if not quantized and not onnx and config.TORCH_COMPILE:
+                    compile_cache = self._load_compile_cache(model_name, dtype)
+                    # Компилируем forward, а не модуль: generate обёртки
+                    # OptimizedModule выполнялся бы на исходной модели без графов
+                    model.forward = torch.compile(model.forward)
             except Exception as compile_err:
                 logger.warning(f"torch.compile не поддерживается: {compile_err}")
 
-            self.tokenizer = AutoTokenizer.from_pretrained(
-                self.model_name,
+            tokenizer = AutoTokenizer.from_pretrained(
+                model_name,
                 trust_remote_code=True,
                 cache_dir=self.cache_dir,
                 use_fast=True,
             )
 
-            if self.tokenizer.pad_token is None:
-                self.tokenizer.pad_token = self.tokenizer.eos_token
+            if tokenizer.pad_token is None:
+                tokenizer.pad_token = tokenizer.eos_token
+            tokenizer.padding_side = "left"
 
-            self.pipe = pipeline(
-                "text-generation",
-                model=self.model,
-                tokenizer=self.tokenizer,
-                device_map="auto" if torch.cuda.is_available() else None,
+            # KV-кэш ONNX Runtime хранится в своём формате, префиксы не переиспользуем
+            prefix_cache = None
+            if config.PREFIX_CACHE_SIZE > 0 and not onnx:
+                prefix_cache = PrefixCache(model, tokenizer, config.PREFIX_CACHE_SIZE)
+
+            # Черновая модель загружается и выгружается вместе с основной:
+            # поток планировщика не обращается к реестру и его блокировке
+            draft = None
+            if config.DRAFT_MODEL and not onnx:
+                draft = self._load_draft(config.DRAFT_MODEL, dtype)
+                size_bytes += draft.size_bytes
+
+            scheduler = BatchScheduler(
+                model,
+                tokenizer,
+                max_batch_size=config.BATCH_MAX_SIZE,
+                window_ms=config.BATCH_WINDOW_MS,
+                prefix_cache=prefix_cache,
+                model_name=model_name,
+                draft=draft,
             )
 
-            logger.info("Модель загружена и готова к работе (FP16/FP32).")
+            logger.info(
+                f"Модель {model_name} загружена и готова к работе "
+                f"({size_bytes / 1024**2:.0f}MB)."
+            )
         except Exception as e:
             logger.error(f"Ошибка при загрузке модели: {e}")
             raise
 
-        return self.model, self.tokenizer, self.pipe
+        return ModelEntry(
+            model=model,
+            tokenizer=tokenizer,
+            scheduler=scheduler,
+            size_bytes=size_bytes,
+            compile_cache=compile_cache,
+        )
+
+    def _load_draft(self, model_name: str, dtype: torch.dtype) -> ModelEntry:
+        """Маленькая модель для спекулятивного декодирования: без планировщика,
+        её вызывает generate основной модели."""
+        logger.info(f"Загрузка черновой модели {model_name} ({dtype})...")
+        model = AutoModelForCausalLM.from_pretrained(
+            model_name,
+            device_map="auto" if torch.cuda.is_available() else None,
+            torch_dtype=dtype,
+            low_cpu_mem_usage=True,
+            trust_remote_code=True,
+            cache_dir=self.cache_dir,
+        ).eval()
+        model.generation_config.num_assistant_tokens = config.DRAFT_NUM_TOKENS
+        tokenizer = AutoTokenizer.from_pretrained(
+            model_name, trust_remote_code=True, cache_dir=self.cache_dir, use_fast=True
+        )
+        return ModelEntry(
+            model=model, tokenizer=tokenizer, size_bytes=model_size_bytes(model)
+        )
+
+    def _compile_cache_path(self, model_name: str, dtype: torch.dtype) -> str:
+        # Скомпилированные графы зависят от версии torch, устройства, dtype
+        # и формы входа: батч ограничен BATCH_MAX_SIZE
+        name = model_name.strip("/").replace("/", "--")
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+        dtype_name = str(dtype).removeprefix("torch.")
+        return os.path.join(
+            config.COMPILE_CACHE_DIR,
+            f"{name}-{dtype_name}-{device}-b{config.BATCH_MAX_SIZE}"
+            f"-torch{torch.__version__}.bin",
+        )
+
+    def _load_compile_cache(self, model_name: str, dtype: torch.dtype) -> str | None:
+        """Подгружает сохранённые артефакты torch.compile до первой компиляции.
+        Возвращает путь, если артефактов ещё нет и их нужно сохранить после прогрева."""
+        if not config.COMPILE_CACHE_DIR or not hasattr(
+            torch.compiler, "load_cache_artifacts"
+        ):
+            return None
+        path = self._compile_cache_path(model_name, dtype)
+        if not os.path.exists(path):
+            return path
+        try:
+            with open(path, "rb") as file:
+                torch.compiler.load_cache_artifacts(file.read())
+            logger.info(f"Артефакты torch.compile загружены из {path}")
+            return None
+        except Exception as e:
+            logger.warning(f"Не удалось загрузить {path}, компилируем заново: {e}")
+            return path
+
+    def save_compile_cache(self):
+        """Сохраняет артефакты torch.compile, накопленные при прогреве,
+        чтобы следующий старт не компилировал модель заново."""
+        with self._lock:
+            entries = [e for e in self._entries.values() if e.compile_cache]
+        for entry in entries:
+            try:
+                artifacts = torch.compiler.save_cache_artifacts()
+                if artifacts is None:
+                    continue
+                data, _ = artifacts
+                os.makedirs(os.path.dirname(entry.compile_cache), exist_ok=True)
+                tmp_path = f"{entry.compile_cache}.{os.getpid()}.tmp"
+                with open(tmp_path, "wb") as file:
+                    file.write(data)
+                os.replace(tmp_path, entry.compile_cache)
+                logger.info(
+                    f"Артефакты torch.compile сохранены в {entry.compile_cache}"
+                )
+                entry.compile_cache = None
+            except Exception as e:
+                logger.warning(f"Не удалось сохранить артефакты torch.compile: {e}")
+
+    def _quantized_path(self, model_name: str) -> str:
+        # Сериализованный модуль привязан к версиям torch и transformers
+        name = model_name.strip("/").replace("/", "--")
+        return os.path.join(
+            self.cache_dir,
+            "quantized",
+            f"{name}-int8-torch{torch.__version__}-tf{transformers.__version__}.pt",
+        )
+
+    def _load_int8(self, model_name: str):
+        """Динамическая int8-квантизация Linear-слоёв для CPU. Готовая модель
+        сохраняется в model_cache, чтобы не квантовать заново при каждом старте."""
+        path = self._quantized_path(model_name)
+        if os.path.exists(path):
+            try:
+                model = torch.load(path, weights_only=False)
+                logger.info(f"Квантованная модель загружена из {path}")
+                return model.eval()
+            except Exception as e:
+                logger.warning(f"Не удалось загрузить {path}, квантуем заново: {e}")
+
+        model = AutoModelForCausalLM.from_pretrained(
+            model_name,
+            torch_dtype=torch.float32,
+            low_cpu_mem_usage=True,
+            trust_remote_code=True,
+            cache_dir=self.cache_dir,
+        )
+        model = torch.ao.quantization.quantize_dynamic(
+            model, {torch.nn.Linear}, dtype=torch.qint8
+        ).eval()
+
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            torch.save(model, tmp_path)
+            os.replace(tmp_path, path)
+            logger.info(f"Квантованная модель сохранена в {path}")
+        except Exception as e:
+            logger.warning(f"Не удалось сохранить квантованную модель: {e}")
+        return model
+
+    def _onnx_path(self, model_name: str) -> str:
+        import onnxruntime
+        import optimum.version
+
+        name = model_name.strip("/").replace("/", "--")
+        return os.path.join(
+            self.cache_dir,
+            "onnx",
+            f"{name}-optimum{optimum.version.__version__}-ort{onnxruntime.__version__}",
+        )
+
+    def _load_onnx(self, model_name: str):
+        """Экспорт в ONNX с KV-кэшем (decoder with past) и загрузка в ONNX Runtime.
+        Экспорт делается один раз и сохраняется в model_cache/onnx."""
+        try:
+            import onnxruntime
+            from optimum.onnxruntime import ORTModelForCausalLM
+        except ImportError as e:
+            raise RuntimeError(
+                "MODEL_RUNTIME=onnx требует optimum-onnx[onnxruntime]: poetry install -E onnx"
+            ) from e
+
+        session_options = onnxruntime.SessionOptions()
+        if config.TORCH_THREADS > 0:
+            session_options.intra_op_num_threads = config.TORCH_THREADS
+        options = {
+            "use_cache": True,
+            "provider": "CPUExecutionProvider",
+            "session_options": session_options,
+        }
+
+        path = self._onnx_path(model_name)
+        model = None
+        if os.path.isdir(path):
+            try:
+                model = ORTModelForCausalLM.from_pretrained(path, **options)
+                logger.info(f"ONNX-модель загружена из {path}")
+            except Exception as e:
+                logger.warning(f"Не удалось загрузить {path}, экспортируем заново: {e}")
+
+        if model is None:
+            model = ORTModelForCausalLM.from_pretrained(
+                model_name,
+                export=True,
+                trust_remote_code=True,
+                cache_dir=self.cache_dir,
+                **options,
+            )
+            try:
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                model.save_pretrained(tmp_path)
+                shutil.rmtree(path, ignore_errors=True)
+                os.replace(tmp_path, path)
+                logger.info(f"ONNX-модель сохранена в {path}")
+            except Exception as e:
+                logger.warning(f"Не удалось сохранить ONNX-модель: {e}")
+
+        size_bytes = 0
+        if os.path.isdir(path):
+            size_bytes = sum(
+                os.path.getsize(os.path.join(path, name))
+                for name in os.listdir(path)
+                if name.endswith((".onnx", ".onnx_data"))
+            )
+        return model, size_bytes
+
+    def _load_tokenizer(self, model_name: str, dtype: torch.dtype) -> ModelEntry:
+        # Только токенизатор: нужен удалённым бэкендам для подсчёта токенов
+        tokenizer = AutoTokenizer.from_pretrained(
+            model_name,
+            trust_remote_code=True,
+            cache_dir=self.cache_dir,
+            use_fast=True,
+        )
+        return ModelEntry(model=None, tokenizer=tokenizer)
+
+    def _load_embedding(self, model_name: str, dtype: torch.dtype) -> ModelEntry:
+        logger.info(f"Загрузка эмбеддинг-модели {model_name}...")
+
+        try:
+            model = SentenceTransformer(
+                model_name,
+                device="cuda" if torch.cuda.is_available() else "cpu",
+                cache_folder=self.cache_dir,
+                model_kwargs={"torch_dtype": dtype},
+            )
+        except Exception as e:
+            logger.error(f"Ошибка при загрузке эмбеддинг-модели: {e}")
+            raise
+
+        return ModelEntry(
+            model=model, tokenizer=model.tokenizer, size_bytes=model_size_bytes(model)
+        )
+
+    def initialize_model(self):
+        return self.get_model()
+
+    def get_model(
+        self,
+        model_name: str | None = None,
+        dtype: torch.dtype | None = None,
+        role: str = "generation",
+    ):
+        entry = self.get_entry(model_name, dtype, role)
+        return entry.model, entry.tokenizer, entry.pipe
+
+    def generate(
+        self,
+        prompt: str,
+        max_new_tokens: int,
+        prefix: str | None = None,
+        model_name: str | None = None,
+        dtype: torch.dtype | None = None,
+        stop: StopSpec | None = None,
+    ) -> str:
+        """Генерация через общий планировщик: конкурентные вызовы склеиваются в батч.
+        prefix — отформатированное неизменное начало prompt, его KV-кэш переиспользуется."""
+        entry = self.get_entry(model_name, dtype)
+        try:
+            return entry.scheduler.generate(prompt, max_new_tokens, prefix, stop)
+        finally:
+            entry.last_used = time.monotonic()
+
+    def generate_batch(
+        self,
+        prompts: list[str],
+        max_new_tokens: int,
+        prefix: str | None = None,
+        model_name: str | None = None,
+        dtype: torch.dtype | None = None,
+        stop: StopSpec | None = None,
+    ) -> list[str]:
+        """Отправляет все промпты в планировщик разом, чтобы они ушли одним батчем."""
+        entry = self.get_entry(model_name, dtype)
+        try:
+            futures = [
+                entry.scheduler.submit(prompt, max_new_tokens, prefix, stop)
+                for prompt in prompts
+            ]
+            return [future.result() for future in futures]
+        finally:
+            entry.last_used = time.monotonic()
+
+    def score(
+        self,
+        prompts: list[str],
+        token_ids: list[int],
+        model_name: str | None = None,
+        dtype: torch.dtype | None = None,
+    ) -> list[list[float]]:
+        """Распределение следующего токена по token_ids для каждого промпта,
+        через общий планировщик, как и генерация."""
+        entry = self.get_entry(model_name, dtype)
+        try:
+            futures = [
+                entry.scheduler.submit_score(prompt, tuple(token_ids))
+                for prompt in prompts
+            ]
+            return [future.result() for future in futures]
+        finally:
+            entry.last_used = time.monotonic()
+
+    def loaded_bytes(self) -> int:
+        with self._lock:
+            return sum(entry.size_bytes for entry in self._entries.values())
+
+    def _enforce_budget(self, keep: tuple[str, str, str]) -> list[ModelEntry]:
+        """Убирает из реестра модели сверх бюджета; освободить их
+        (_release) нужно уже без блокировки."""
+        evicted = []
+        if self.memory_budget <= 0:
+            return evicted
+        while self.loaded_bytes() > self.memory_budget:
+            victim = next((key for key in self._entries if key != keep), None)
+            if victim is None:
+                logger.warning(
+                    f"Модель {keep[0]} одна превышает бюджет памяти "
+                    f"{self.memory_budget / 1024**2:.0f}MB"
+                )
+                break
+            logger.info(f"Бюджет памяти превышен, выгружаем {victim[0]} ({victim[2]})")
+            evicted.append(self._entries.pop(victim))
+        return evicted
+
+    def evict_idle(self):
+        if self.idle_ttl <= 0:
+            return
+        now = time.monotonic()
+        evicted = []
+        with self._lock:
+            idle = [
+                key
+                for key, entry in self._entries.items()
+                if now - entry.last_used > self.idle_ttl
+            ]
+            for key in idle:
+                logger.info(f"Модель {key[0]} ({key[2]}) простаивает, выгружаем")
+                evicted.append(self._entries.pop(key))
+        self._release(evicted)
+
+    def _ensure_reaper(self):
+        if self.idle_ttl <= 0 or (self._reaper is not None and self._reaper.is_alive()):
+            return
+        self._reaper = threading.Thread(
+            target=self._reap, name="model-reaper", daemon=True
+        )
+        self._reaper.start()
+
+    def _reap(self):
+        while True:
+            time.sleep(max(1.0, self.idle_ttl / 2))
+            self.evict_idle()
+            with self._lock:
+                if not self._entries:
+                    self._reaper = None
+                    return
 
-    def get_model(self):
-        if self.model is None:
-            return self.initialize_model()
-        return self.model, self.tokenizer, self.pipe
+    def _release(self, entries: list[ModelEntry]):
+        """Останавливает планировщики выгруженных моделей и освобождает память.
+        Вызывается без self._lock: stop() ждёт поток планировщика, который
+        может сам ждать реестр."""
+        if not entries:
+            return
+        for entry in entries:
+            if entry.scheduler is not None:
+                entry.scheduler.stop()
+        entries.clear()
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
 
-    def clear_cache(self):
-        self.model = None
-        self.tokenizer = None
-        self.pipe = None
+    def clear_cache(
+        self,
+        model_name: str | None = None,
+        dtype: torch.dtype | None = None,
+        role: str | None = None,
+    ):
+        evicted = []
+        with self._lock:
+            for key in list(self._entries):
+                if model_name is not None and key[0] != model_name:
+                    continue
+                if dtype is not None and key[1] != str(dtype):
+                    continue
+                if role is not None and key[2] != role:
+                    continue
+                evicted.append(self._entries.pop(key))
+        self._release(evicted)
         logger.info("Кэш модели очищен")
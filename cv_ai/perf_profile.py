@@ -0,0 +1,77 @@
+import json
+import os
+import platform
+
+import torch
+from loguru import logger
+
+from cv_ai.config import config
+
+# Настройки, которые подбирает python -m cv_ai.autotune
+PROFILE_FIELDS = (
+    "TORCH_THREADS",
+    "MODEL_DTYPE",
+    "TORCH_COMPILE",
+    "BATCH_MAX_SIZE",
+    "QUANTIZATION",
+)
+
+
+def host_info() -> dict:
+    return {
+        "host": platform.node(),
+        "cpu_count": os.cpu_count(),
+        "cuda": torch.cuda.get_device_name(0) if torch.cuda.is_available() else None,
+        "torch": torch.__version__,
+    }
+
+
+def save_profile(path: str, model_name: str, settings: dict, results: list[dict]):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    profile = {
+        "model": model_name,
+        **host_info(),
+        "settings": settings,
+        "results": results,
+    }
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(profile, file, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def apply_profile(path: str | None = None) -> dict:
+    """Применяет профиль производительности к config.
+
+    Профиль снят для конкретной модели и машины, поэтому при другой модели или
+    другом числе ядер он игнорируется. Значения, явно заданные через
+    переменные окружения или .env, профиль не перекрывает.
+    Возвращает применённые настройки.
+    """
+    path = config.PERFORMANCE_PROFILE if path is None else path
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path, encoding="utf-8") as file:
+            profile = json.load(file)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Не удалось прочитать профиль производительности {path}: {e}")
+        return {}
+
+    if profile.get("model") != config.BASE_MODEL:
+        logger.info(
+            f"Профиль {path} снят для модели {profile.get('model')}, пропускаем"
+        )
+        return {}
+    if profile.get("cpu_count") != os.cpu_count():
+        logger.info(f"Профиль {path} снят на другой машине, пропускаем")
+        return {}
+
+    applied = {}
+    for name, value in profile.get("settings", {}).items():
+        if name in PROFILE_FIELDS and name not in config.model_fields_set:
+            setattr(config, name, value)
+            applied[name] = value
+    if applied:
+        logger.info(f"Применён профиль производительности: {applied}")
+    return applied
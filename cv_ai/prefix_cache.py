@@ -0,0 +1,91 @@
+import copy
+import threading
+from collections import OrderedDict
+
+import torch
+from loguru import logger
+
+# Маркер, по которому отрезаем неизменную часть промпта после chat-шаблона
+_SENTINEL = "<<<PREFIX_END>>>"
+
+
+def format_chat(
+    tokenizer, prompt: str, prefix: str | None = None
+) -> tuple[str, str | None]:
+    """Оборачивает промпт в chat-шаблон и возвращает его вместе с отформатированным
+    неизменным началом (если prefix задан и действительно является началом prompt)."""
+    formatted_prompt = tokenizer.apply_chat_template(
+        [{"role": "user", "content": prompt}],
+        tokenize=False,
+        add_generation_prompt=True,
+    )
+    if not prefix or not prompt.startswith(prefix):
+        return formatted_prompt, None
+
+    formatted_prefix = tokenizer.apply_chat_template(
+        [{"role": "user", "content": prefix + _SENTINEL}],
+        tokenize=False,
+        add_generation_prompt=True,
+    ).split(_SENTINEL)[0]
+    if not formatted_prompt.startswith(formatted_prefix):
+        return formatted_prompt, None
+    return formatted_prompt, formatted_prefix
+
+
+class PrefixCache:
+    """Хранит past_key_values для неизменных системных промптов одной модели,
+    чтобы на каждом вызове префилл шёл только по переменной части."""
+
+    def __init__(self, model, tokenizer, max_entries: int):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[list[int], object]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _tokenize(self, text: str) -> list[int]:
+        return self.tokenizer(text, add_special_tokens=False)["input_ids"]
+
+    def encode(self, prompt: str, prefix: str | None) -> list[int]:
+        """Токенизирует префикс и хвост раздельно, чтобы токены префикса совпадали
+        с закэшированными независимо от того, какой путь генерации выбран."""
+        if not prefix or not prompt.startswith(prefix):
+            return self._tokenize(prompt)
+        return self.prefix_ids(prefix) + self._tokenize(prompt[len(prefix) :])
+
+    def prefix_ids(self, prefix: str) -> list[int]:
+        with self._lock:
+            entry = self._entries.get(prefix)
+        if entry is not None:
+            return entry[0]
+        return self._tokenize(prefix)
+
+    def get(self, prefix: str):
+        """Возвращает (ids префикса, копию past_key_values), вычисляя их при промахе."""
+        with self._lock:
+            entry = self._entries.get(prefix)
+            if entry is not None:
+                self._entries.move_to_end(prefix)
+
+        if entry is None:
+            prefix_ids = self._tokenize(prefix)
+            with torch.inference_mode():
+                outputs = self.model(
+                    input_ids=torch.tensor([prefix_ids], device=self.model.device),
+                    use_cache=True,
+                )
+            entry = (prefix_ids, outputs.past_key_values)
+            logger.debug(f"Префикс из {len(prefix_ids)} токенов закэширован")
+
+            with self._lock:
+                self._entries[prefix] = entry
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+
+        prefix_ids, past_key_values = entry
+        # generate дописывает кэш на месте, поэтому отдаём копию
+        return prefix_ids, copy.deepcopy(past_key_values)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
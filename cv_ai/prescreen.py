@@ -0,0 +1,88 @@
+import numpy as np
+from loguru import logger
+
+from cv_ai.config import config
+from cv_ai.model_init import ModelManager
+
+
+class EmbeddingPrescreener:
+    def __init__(self):
+        self.model_manager = ModelManager()
+        self.model, self.tokenizer, _ = self.model_manager.get_model(
+            config.EMBEDDING_MODEL, role="embedding"
+        )
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        return self.model.encode(
+            texts,
+            batch_size=config.EMBEDDING_BATCH_SIZE,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False,
+        )
+
+    def similarities(
+        self,
+        vacancy_text: str,
+        resume_texts: list[str],
+        vacancy_vector: list[float] | None = None,
+    ) -> np.ndarray:
+        # Вакансия и все резюме считаются одним батчем, векторы уже нормированы,
+        # поэтому косинусное сходство — это просто матричное произведение
+        if vacancy_vector is not None:
+            return self.embed(resume_texts) @ np.asarray(vacancy_vector)
+        vectors = self.embed([vacancy_text, *resume_texts])
+        return vectors[1:] @ vectors[0]
+
+    def select(
+        self,
+        vacancy_text: str,
+        resume_texts: list[str],
+        threshold: float | None = None,
+        top_n: int | None = None,
+        vacancy_vector: list[float] | None = None,
+    ) -> tuple[list[int], np.ndarray]:
+        """Возвращает индексы резюме, прошедших порог и top-N, и все сходства."""
+        threshold = config.PRESCREEN_THRESHOLD if threshold is None else threshold
+        top_n = config.PRESCREEN_TOP_N if top_n is None else top_n
+
+        scores = self.similarities(vacancy_text, resume_texts, vacancy_vector)
+        keep = scores >= threshold
+        if top_n > 0:
+            best = np.zeros_like(keep)
+            best[np.argsort(-scores)[:top_n]] = True
+            keep &= best
+
+        kept = np.flatnonzero(keep).tolist()
+        logger.info(
+            f"Предотбор по эмбеддингам: {len(kept)} из {len(resume_texts)} резюме"
+        )
+        return kept, scores
+
+
+def prescreen(
+    vacancy_text: str,
+    resume_texts: list[str],
+    vacancy_vector: list[float] | None = None,
+) -> tuple[list[int], np.ndarray | None]:
+    """Предварительный отбор перед LLM; при выключенном отборе пропускает всех.
+    vacancy_vector — заранее посчитанный эмбеддинг вакансии, если есть."""
+    if not config.PRESCREEN_ENABLED or not resume_texts:
+        return list(range(len(resume_texts))), None
+    return EmbeddingPrescreener().select(
+        vacancy_text, resume_texts, vacancy_vector=vacancy_vector
+    )
+
+
+def embed_vacancy(vacancy_text: str) -> list[float] | None:
+    """Эмбеддинг вакансии для повторного предотбора без её пересчёта."""
+    if not config.PRESCREEN_ENABLED:
+        return None
+    return EmbeddingPrescreener().embed([vacancy_text])[0].tolist()
+
+
+def similarity_score(vacancy_text: str, resume_text: str) -> float:
+    """Оценка 0–100 по косинусному сходству эмбеддингов — запасной вариант,
+    когда LLM-оценка не уложилась во время."""
+    similarity = EmbeddingPrescreener().similarities(vacancy_text, [resume_text])[0]
+    return float(max(0.0, similarity) * 100)
@@ -1,76 +1,31 @@
-import torch
-from loguru import logger
-from transformers import (
-    AutoModelForCausalLM,
-    AutoTokenizer,
-    BitsAndBytesConfig,
-    pipeline,
-)
-
-from cv_ai.config import config
-from cv_ai.shrink import Shrinker
-
-
-class QuestionsGenerator:
-    def __init__(self):
-        self.model_name = config.BASE_MODEL
-
-        # bnb_config = BitsAndBytesConfig(
-        #     load_in_4bit=True,
-        #     bnb_4bit_compute_dtype=torch.bfloat16,  # можно заменить на torch.float16
-        #     bnb_4bit_use_double_quant=True,
-        #     bnb_4bit_quant_type="nf4"
-        # )
-
-        # quantization_config=bnb_config, # вместо torch_dtype
-
-        self.model = AutoModelForCausalLM.from_pretrained(
-            self.model_name,
-            device_map="cpu",
-            torch_dtype=torch.bfloat16,
-            low_cpu_mem_usage=True,
-            trust_remote_code=True,
-        )
-
-        self.tokenizer = AutoTokenizer.from_pretrained(
-            self.model_name, trust_remote_code=True
-        )
-
-        if self.tokenizer.pad_token is None:
-            self.tokenizer.pad_token = self.tokenizer.eos_token
-
-        self.pipe = pipeline(
-            "text-generation", model=self.model, tokenizer=self.tokenizer
-        )
-
-    def _run_model(self, prompt: str, max_new_tokens: int = 256) -> str:
-        try:
-            formatted_prompt = self.tokenizer.apply_chat_template(
-                [{"role": "user", "content": prompt}],
-                tokenize=False,
-                add_generation_prompt=True,
-            )
-
-            outputs = self.pipe(
-                formatted_prompt,
-                max_new_tokens=max_new_tokens,
-                do_sample=False,
-                num_beams=1,
-                temperature=0.0,
-                top_k=50,
-                top_p=0.95,
-                eos_token_id=self.tokenizer.eos_token_id,
-            )
-
-            generated_text = outputs[0]["generated_text"][
-                len(formatted_prompt) :
-            ].strip()
-            return generated_text
+from cv_ai.generation import GenerationTask, time_budget
+from cv_ai.result_cache import cached_stage
+from cv_ai.stopping import StopSpec
+
+
+# Общие вопросы на случай, если генерация не уложилась во время
+FALLBACK_QUESTIONS = [
+    "Расскажите о своём опыте, наиболее близком к задачам этой вакансии.",
+    "Какой проект вы считаете своим главным достижением и почему?",
+    "С какими технологиями из требований вакансии вы работали и в каком объёме?",
+    "Какую самую сложную техническую проблему вам приходилось решать?",
+    "Как вы проверяете качество своего кода?",
+    "Почему вас заинтересовала эта вакансия?",
+    "Как вы организуете работу в команде и взаимодействие с коллегами?",
+    "Чему вы хотели бы научиться на новом месте работы?",
+]
+
+
+class QuestionsGenerator(GenerationTask):
+    @staticmethod
+    def parse(raw_output: str, num_questions: int) -> list:
+        # Разбиваем результат построчно и убираем пустые строки
+        questions = [q.strip("- ") for q in raw_output.split("\n") if q.strip()]
 
-        except Exception as e:
-            logger.info(f"Ошибка при генерации текста: {e}")
-            return ""
+        return questions[:num_questions]
 
+    @time_budget("QUESTIONS_MAX_TIME")
+    @cached_stage("questions", version=1)
     def generate_questions(
         self, resume_text: str, vacancy_text: str, num_questions: int = 8
     ) -> list:
@@ -79,19 +34,27 @@ class QuestionsGenerator:
             "исходя из требований вакансии и опыта кандидата. Верни ТОЛЬКО вопросы."
         )
         
-        user_prompt = (
+        instruction = (
             f"Составь список из {num_questions} коротких вопросов для собеседования.\n"
             f"Основывайся на резюме и вакансии.\n\n"
-            f"ВАКАНСИЯ:\n{vacancy_text}\n\n"
+            f"ВАКАНСИЯ:\n"
+        )
+
+        user_prompt = (
+            f"{instruction}{vacancy_text}\n\n"
             f"РЕЗЮМЕ:\n{resume_text}\n\n"
             f"Вопросы:"
         )
 
         full_prompt = f"{system_prompt}\n\n{user_prompt}"
+        prefix = f"{system_prompt}\n\n{instruction}"
+
+        # Дальше N-й строки вопросы всё равно отбрасываются, не декодируем их
+        raw_output = self._run_model(
+            full_prompt,
+            max_new_tokens=256,
+            prefix=prefix,
+            stop=StopSpec(max_lines=num_questions),
+        )
 
-        raw_output = self._run_model(full_prompt, max_new_tokens=256)
-
-        # Разбиваем результат построчно и убираем пустые строки
-        questions = [q.strip("- ") for q in raw_output.split("\n") if q.strip()]
-
-        return questions[:num_questions]
+        return self.parse(raw_output, num_questions)
@@ -0,0 +1,194 @@
+import functools
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable
+
+from loguru import logger
+
+from cv_ai.config import config
+from cv_ai.generation import deadline_passed
+from cv_ai.metrics import RESULT_CACHE, STAGE_SECONDS, timer
+
+_MISSING = object()
+
+
+class ResultCache:
+    """Кэш результатов LLM-этапов по хэшу (модель, этап, версия промпта, входы).
+
+    Два уровня: LRU в памяти процесса и JSON-файлы на диске, которые переживают
+    перезапуск. Генерация жадная (do_sample=False), поэтому ответ детерминирован.
+    """
+
+    def __init__(self, max_entries: int, cache_dir: str | None):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir or None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory: OrderedDict[str, Any] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(model: list, stage: str, version: int, inputs: Any) -> str:
+        payload = json.dumps(
+            [model, stage, version, inputs], ensure_ascii=False, sort_keys=True
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return self._memory[key]
+
+        if self.cache_dir is not None:
+            try:
+                with open(self._path(key), encoding="utf-8") as file:
+                    value = json.load(file)
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError) as e:
+                logger.warning(f"Не удалось прочитать кэш {key}: {e}")
+            else:
+                with self._lock:
+                    self.disk_hits += 1
+                self._remember(key, value)
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return _MISSING
+
+    def set(self, key: str, value: Any):
+        self._remember(key, value)
+        if self.cache_dir is None:
+            return
+
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as file:
+                json.dump(value, file, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Не удалось записать кэш {key}: {e}")
+
+    def _remember(self, key: str, value: Any):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "memory_entries": len(self._memory),
+            }
+
+
+result_cache = ResultCache(config.RESULT_CACHE_SIZE, config.RESULT_CACHE_DIR)
+
+
+def _model_identity(backend) -> list:
+    """Модель и настройки, от которых зависит её ответ: рантайм, dtype и
+    квантизация меняют логиты, черновая модель — путь декодирования."""
+    identity = [backend.model_name]
+    if config.INFERENCE_BACKEND == "hf":
+        identity += [
+            config.MODEL_RUNTIME,
+            config.MODEL_DTYPE,
+            config.QUANTIZATION,
+            config.DRAFT_MODEL,
+        ]
+    return identity
+
+
+def cached_stage(stage: str, version: int, should_cache: Callable[[Any], bool] = bool):
+    """Кэширует результат метода LLM-этапа. version нужно поднимать при любом
+    изменении промпта этапа, иначе из кэша вернутся ответы на старый промпт."""
+
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            model = self.backend.model_name
+            if not config.RESULT_CACHE_ENABLED:
+                with timer(STAGE_SECONDS, stage=stage, model=model):
+                    return method(self, *args, **kwargs)
+
+            key = ResultCache.make_key(
+                _model_identity(self.backend), stage, version, [args, kwargs]
+            )
+            value = result_cache.get(key)
+            if value is not _MISSING:
+                logger.debug(f"Кэш {stage}: попадание")
+                RESULT_CACHE.inc(stage=stage, result="hit")
+                return value
+
+            RESULT_CACHE.inc(stage=stage, result="miss")
+            with timer(STAGE_SECONDS, stage=stage, model=model):
+                value = method(self, *args, **kwargs)
+            # Пустые ответы и -1 означают сбой генерации, их не запоминаем,
+            # как и ответы, полученные уже за дедлайном этапа
+            if should_cache(value) and not deadline_passed():
+                result_cache.set(key, value)
+            return value
+
+        return wrapper
+
+    return decorator
+
+
+def cached_batch_stage(
+    stage: str, version: int, should_cache: Callable[[Any], bool] = bool
+):
+    """cached_stage для метода, который принимает список первым аргументом
+    и возвращает список результатов. Каждый элемент кэшируется под тем же
+    ключом, что и одиночный вызов этапа, в метод уходят только промахи."""
+
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, items: list, *args):
+            model = self.backend.model_name
+            if not config.RESULT_CACHE_ENABLED:
+                with timer(STAGE_SECONDS, stage=stage, model=model):
+                    return method(self, items, *args)
+
+            identity = _model_identity(self.backend)
+            keys = [
+                ResultCache.make_key(identity, stage, version, [[item, *args], {}])
+                for item in items
+            ]
+            values = [result_cache.get(key) for key in keys]
+            missing = [index for index, value in enumerate(values) if value is _MISSING]
+            if len(missing) < len(items):
+                RESULT_CACHE.inc(len(items) - len(missing), stage=stage, result="hit")
+            if not missing:
+                return values
+
+            RESULT_CACHE.inc(len(missing), stage=stage, result="miss")
+            with timer(STAGE_SECONDS, stage=stage, model=model):
+                computed = method(self, [items[index] for index in missing], *args)
+            expired = deadline_passed()
+            for index, value in zip(missing, computed):
+                values[index] = value
+                if should_cache(value) and not expired:
+                    result_cache.set(keys[index], value)
+            return values
+
+        return wrapper
+
+    return decorator
@@ -1,50 +1,108 @@
-import torch
 from loguru import logger
-from transformers import (
-    AutoModelForCausalLM,
-    AutoTokenizer,
-    BitsAndBytesConfig,
-    pipeline,
-)
 
 from cv_ai.config import config
-from cv_ai.model_init import ModelManager
-
-
-class Shrinker:
-    def __init__(self):
-        self.model_manager = ModelManager()
-        self.model, self.tokenizer, self.pipe = self.model_manager.get_model()
-
-    def _run_model(self, prompt: str, max_new_tokens: int = 256) -> str:
-        try:
-            formatted_prompt = self.tokenizer.apply_chat_template(
-                [{"role": "user", "content": prompt}],
-                tokenize=False,
-                add_generation_prompt=True,
+from cv_ai.generation import GenerationTask, GenerationTimeout, time_budget
+from cv_ai.result_cache import cached_stage
+
+
+class Shrinker(GenerationTask):
+    def _count_tokens(self, text: str) -> int:
+        return len(self.tokenizer.encode(text, add_special_tokens=False))
+
+    def _split_chunks(self, text: str) -> list[str]:
+        """Режет текст на фрагменты не длиннее SHRINK_CHUNK_TOKENS, по возможности
+        по границам строк."""
+        chunk_tokens = config.SHRINK_CHUNK_TOKENS
+        chunks: list[str] = []
+        current: list[str] = []
+        current_tokens = 0
+
+        for line in text.splitlines():
+            line_ids = self.tokenizer.encode(line, add_special_tokens=False)
+            if len(line_ids) > chunk_tokens:
+                # Строка без переносов (частый случай в PDF) режется по токенам
+                if current:
+                    chunks.append("\n".join(current))
+                    current, current_tokens = [], 0
+                for start in range(0, len(line_ids), chunk_tokens):
+                    chunks.append(
+                        self.tokenizer.decode(line_ids[start : start + chunk_tokens])
+                    )
+                continue
+
+            if current_tokens + len(line_ids) > chunk_tokens and current:
+                chunks.append("\n".join(current))
+                current, current_tokens = [], 0
+            current.append(line)
+            current_tokens += len(line_ids) + 1
+
+        if current:
+            chunks.append("\n".join(current))
+        return [chunk for chunk in chunks if chunk.strip()]
+
+    def fit_budget(self, text: str, document: str) -> str:
+        """Ограничивает вход этапа сжатия бюджетом токенов.
+
+        Короткий документ возвращается как есть. Длинный режется на фрагменты,
+        конспекты фрагментов генерируются одним батчем и склеиваются (map-reduce),
+        поэтому время обработки не растёт вместе с длиной документа.
+        """
+        budget = config.SHRINK_INPUT_TOKEN_BUDGET
+        total_tokens = self._count_tokens(text)
+        if total_tokens <= budget:
+            return text
+
+        chunks = self._split_chunks(text)
+        if len(chunks) > config.SHRINK_MAX_CHUNKS:
+            logger.info(
+                f"Документ слишком длинный ({total_tokens} токенов), "
+                f"берём первые {config.SHRINK_MAX_CHUNKS} из {len(chunks)} фрагментов"
             )
+            chunks = chunks[: config.SHRINK_MAX_CHUNKS]
 
-            outputs = self.pipe(
-                formatted_prompt,
-                max_new_tokens=max_new_tokens,
-                do_sample=False,
-                num_beams=1,
-                temperature=0.0,
-                top_k=50,
-                top_p=0.95,
-                eos_token_id=self.tokenizer.eos_token_id,
+        instruction = (
+            f"Выпиши кратко и без комментариев ключевые факты из фрагмента {document}: "
+            "должности, опыт, навыки, требования, условия.\n\n"
+            "ФРАГМЕНТ:\n"
+        )
+        stop = self._limit_time(None)
+        try:
+            summaries = self.backend.generate_batch(
+                [f"{instruction}{chunk}" for chunk in chunks],
+                max_new_tokens=config.SHRINK_CHUNK_SUMMARY_TOKENS,
+                prefix=instruction,
+                stop=stop,
             )
-            
-            generated_text = outputs[0]["generated_text"][
-                len(formatted_prompt) :
-            ].strip()
-            return generated_text
-
+        except GenerationTimeout as e:
+            self._on_timeout(e)
+            summaries = []
         except Exception as e:
-            logger.info(f"Ошибка при генерации текста: {e}")
-            return ""
-
+            logger.info(f"Ошибка при конспектировании фрагментов: {e}")
+            summaries = []
+        self._check_deadline()
+
+        merged = "\n\n".join(summary for summary in summaries if summary)
+        if not merged:
+            merged = "\n\n".join(chunks)
+
+        # Склейка конспектов тоже обязана уложиться в бюджет
+        merged_ids = self.tokenizer.encode(merged, add_special_tokens=False)
+        if len(merged_ids) > budget:
+            merged = self.tokenizer.decode(merged_ids[:budget])
+        return merged
+
+    def truncate(self, text: str) -> str:
+        """Исходный текст, обрезанный до бюджета токенов, — запасной вариант,
+        когда сжатие не уложилось во время."""
+        ids = self.tokenizer.encode(text, add_special_tokens=False)
+        budget = config.SHRINK_INPUT_TOKEN_BUDGET
+        return text if len(ids) <= budget else self.tokenizer.decode(ids[:budget])
+
+    @time_budget("SHRINK_MAX_TIME")
+    @cached_stage("resume_shrink", version=2)
     def resume_shrink(self, resume_text: str) -> list:
+        resume_text = self.fit_budget(resume_text, "резюме")
+
         system_prompt = (
             """
             Анализируй предоставленное резюме как Senior HR-специалист. Сделай сжатый структурированный анализ по шаблону:
@@ -66,11 +124,18 @@ class Shrinker:
 
         full_prompt = f"{system_prompt}\n\n{user_prompt}"
 
-        raw_output = self._run_model(full_prompt, max_new_tokens=512)
+        # Всё до текста резюме одинаково на каждом вызове и берётся из KV-кэша
+        prefix = f"{system_prompt}\n\nРЕЗЮМЕ:\n"
+
+        raw_output = self._run_model(full_prompt, max_new_tokens=512, prefix=prefix)
 
         return raw_output
     
+    @time_budget("SHRINK_MAX_TIME")
+    @cached_stage("vacancy_shrink", version=2)
     def vacancy_shrink(self, vacancy_text: str) -> list:
+        vacancy_text = self.fit_budget(vacancy_text, "вакансии")
+
         system_prompt = (
             """
             Анализируй текст вакансии ниже как Senior HR-специалист. Сделай сжатый структурированный анализ по шаблону:
@@ -92,7 +157,10 @@ class Shrinker:
 
         full_prompt = f"{system_prompt}\n\n{user_prompt}"
 
-        raw_output = self._run_model(full_prompt, max_new_tokens=512)
+        # Всё до текста вакансии одинаково на каждом вызове и берётся из KV-кэша
+        prefix = f"{system_prompt}\n\nВАКАНСИЯ:\n"
+
+        raw_output = self._run_model(full_prompt, max_new_tokens=512, prefix=prefix)
 
         return raw_output
 
@@ -0,0 +1,143 @@
+import re
+import time
+from dataclasses import dataclass
+
+import torch
+from transformers import StoppingCriteria
+
+# Число, за которым уже идёт не цифра, или сразу три цифры (оценка 0–100)
+_COMPLETE_NUMBER = re.compile(r"\d+\D|\d{3}")
+
+
+class GenerationTimeout(Exception):
+    """Бюджет времени этапа исчерпан. partial — то, что модель успела
+    сгенерировать до остановки (может быть пустым)."""
+
+    def __init__(self, partial: str = ""):
+        super().__init__(partial)
+        self.partial = partial
+
+
+@dataclass(frozen=True)
+class StopSpec:
+    """Условия досрочной остановки генерации для конкретной задачи.
+
+    max_lines — остановиться после N непустых строк, first_number — после
+    первого числа, stop_strings — после любой из строк, max_time — предел
+    времени на вызов generate в секундах. Хэшируемый: планировщик группирует
+    по нему запросы в батчи.
+    """
+
+    max_lines: int | None = None
+    first_number: bool = False
+    stop_strings: tuple[str, ...] = ()
+    max_time: float | None = None
+
+    @property
+    def checks_text(self) -> bool:
+        return (
+            self.first_number or bool(self.stop_strings) or self.max_lines is not None
+        )
+
+    def is_done(self, text: str) -> bool:
+        if self.first_number and _COMPLETE_NUMBER.search(text):
+            return True
+        if self.stop_strings and any(stop in text for stop in self.stop_strings):
+            return True
+        if self.max_lines is not None:
+            complete_lines = text.split("\n")[:-1]
+            if sum(1 for line in complete_lines if line.strip()) >= self.max_lines:
+                return True
+        return False
+
+    def trim(self, text: str) -> str:
+        """Обрезает хвост, сгенерированный после срабатывания условия."""
+        for stop in self.stop_strings:
+            text = text.split(stop, 1)[0]
+        if self.first_number:
+            match = re.search(r"\d+", text)
+            if match:
+                text = text[: match.end()]
+        if self.max_lines is not None:
+            lines, filled = [], 0
+            for line in text.split("\n"):
+                if line.strip():
+                    if filled == self.max_lines:
+                        break
+                    filled += 1
+                lines.append(line)
+            text = "\n".join(lines)
+        return text.strip()
+
+
+class StopSpecCriteria(StoppingCriteria):
+    """Проверяет StopSpec по каждой строке батча отдельно: строка, выполнившая
+    условие, дальше не декодируется, остальные продолжают."""
+
+    def __init__(self, tokenizer, spec: StopSpec, prompt_length: int):
+        self.tokenizer = tokenizer
+        self.spec = spec
+        self.prompt_length = prompt_length
+
+    def __call__(
+        self, input_ids: torch.LongTensor, scores, **kwargs
+    ) -> torch.BoolTensor:
+        texts = self.tokenizer.batch_decode(
+            input_ids[:, self.prompt_length :], skip_special_tokens=True
+        )
+        return torch.tensor(
+            [self.spec.is_done(text) for text in texts],
+            dtype=torch.bool,
+            device=input_ids.device,
+        )
+
+
+class FirstTokenTimer(StoppingCriteria):
+    """Ничего не останавливает, только запоминает момент первого токена:
+    до него идёт префилл, после — декодирование."""
+
+    def __init__(self):
+        self.first_token_at: float | None = None
+
+    def __call__(
+        self, input_ids: torch.LongTensor, scores, **kwargs
+    ) -> torch.BoolTensor:
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        return torch.zeros(
+            input_ids.shape[0], dtype=torch.bool, device=input_ids.device
+        )
+
+
+class TimeLimitCriteria(StoppingCriteria):
+    """max_time из transformers, который запоминает, какие строки батча
+    оборвал именно предел времени, а не EOS или StopSpec: их ответ неполный."""
+
+    def __init__(
+        self, tokenizer, max_time: float, prompt_length: int, spec: StopSpec | None
+    ):
+        self.tokenizer = tokenizer
+        self.deadline = time.monotonic() + max_time
+        self.prompt_length = prompt_length
+        self.spec = spec
+        self.truncated: list[bool] | None = None
+
+    def __call__(
+        self, input_ids: torch.LongTensor, scores, **kwargs
+    ) -> torch.BoolTensor:
+        expired = time.monotonic() >= self.deadline
+        if expired and self.truncated is None:
+            new_tokens = input_ids[:, self.prompt_length :]
+            finished = (new_tokens == self.tokenizer.eos_token_id).any(dim=1).tolist()
+            if self.spec is not None and self.spec.checks_text:
+                texts = self.tokenizer.batch_decode(
+                    new_tokens, skip_special_tokens=True
+                )
+                finished = [
+                    done or self.spec.is_done(text)
+                    for done, text in zip(finished, texts)
+                ]
+            self.truncated = [not done for done in finished]
+        return torch.full(
+            (input_ids.shape[0],), expired, dtype=torch.bool, device=input_ids.device
+        )
@@ -0,0 +1,126 @@
+import asyncio
+import threading
+import time
+
+from loguru import logger
+
+from cv_ai.backends import HFBackend, get_backend
+from cv_ai.config import config
+from cv_ai.model_init import ModelManager
+
+# Разные длины и батч из двух промптов, чтобы torch.compile собрал графы для
+# типичных форм входа до первого настоящего запроса
+WARMUP_PREFIX = "Ты - эксперт по подбору персонала.\n\n"
+WARMUP_PROMPTS = (
+    "Оцени кандидата по шкале от 0 до 100.",
+    "Составь короткий вопрос для собеседования Python-разработчика "
+    "с опытом работы с базами данных и асинхронным кодом.",
+)
+
+
+class Readiness:
+    """Состояние готовности инференса для /healthz, /readyz и обработчиков бота.
+
+    state: pending → loading → warming → ready, либо failed. Если инференс идёт
+    в пуле процессов, состояние собирается из сообщений воркеров.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self.state = "pending"
+        self.model_loaded = False
+        self.compiled = False
+        self.error: str | None = None
+        self.workers_ready: int | None = None
+        self.workers_total: int | None = None
+        self.started_at = time.monotonic()
+        self.ready_seconds: float | None = None
+
+    def update(self, **fields):
+        with self._lock:
+            for name, value in fields.items():
+                setattr(self, name, value)
+            if self.state in ("ready", "failed") and not self._done.is_set():
+                self.ready_seconds = time.monotonic() - self.started_at
+                self._done.set()
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            snapshot = {
+                "state": self.state,
+                "model_loaded": self.model_loaded,
+                "compiled": self.compiled,
+                "error": self.error,
+                "ready_seconds": self.ready_seconds,
+            }
+            if self.workers_total is not None:
+                snapshot["workers_ready"] = self.workers_ready
+                snapshot["workers_total"] = self.workers_total
+            return snapshot
+
+    async def wait(self, poll_seconds: float = 0.5):
+        """Ждёт окончания прогрева. При ошибке прогрева тоже возвращается:
+        модель попробует загрузиться лениво на первом запросе."""
+        while not self._done.is_set():
+            await asyncio.sleep(poll_seconds)
+
+
+readiness = Readiness()
+
+
+def warm_up(state: Readiness = readiness):
+    """Загружает модели и прогоняет несколько коротких генераций."""
+    started = time.perf_counter()
+    backend = get_backend()
+
+    state.update(state="loading")
+    if isinstance(backend, HFBackend):
+        backend.model_manager.get_model(backend.model_name)
+    else:
+        # Токенизатор нужен для бюджета токенов и грузится отдельно
+        backend.tokenizer
+    if config.PRESCREEN_ENABLED:
+        model, _, _ = ModelManager().get_model(config.EMBEDDING_MODEL, role="embedding")
+        model.encode(list(WARMUP_PROMPTS), show_progress_bar=False)
+    state.update(state="warming", model_loaded=True)
+
+    max_new_tokens = config.WARMUP_MAX_NEW_TOKENS
+    for prompt in WARMUP_PROMPTS:
+        backend.generate(
+            f"{WARMUP_PREFIX}{prompt}",
+            max_new_tokens=max_new_tokens,
+            prefix=WARMUP_PREFIX,
+        )
+    backend.generate_batch(
+        [f"{WARMUP_PREFIX}{prompt}" for prompt in WARMUP_PROMPTS],
+        max_new_tokens=max_new_tokens,
+        prefix=WARMUP_PREFIX,
+    )
+    if isinstance(backend, HFBackend):
+        backend.model_manager.save_compile_cache()
+
+    state.update(state="ready", compiled=True)
+    logger.info(f"Прогрев модели завершён за {time.perf_counter() - started:.1f} с")
+
+
+def _warm_up_safely():
+    try:
+        warm_up()
+    except Exception as e:
+        logger.error(f"Ошибка прогрева модели: {e}")
+        readiness.update(state="failed", error=str(e))
+
+
+def start_warmup() -> threading.Thread | None:
+    """Запускает прогрев в фоновом потоке, не блокируя старт бота и API."""
+    if not config.WARMUP_ENABLED:
+        readiness.update(state="ready")
+        return None
+    thread = threading.Thread(target=_warm_up_safely, name="warmup", daemon=True)
+    thread.start()
+    return thread
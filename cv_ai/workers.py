@@ -0,0 +1,296 @@
+import asyncio
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+import torch
+from loguru import logger
+
+from cv_ai import metrics
+from cv_ai.config import config
+from cv_ai.model_init import ModelManager
+from cv_ai.warmup import readiness, warm_up
+
+
+def _worker_main(index: int, tasks, results, num_threads: int):
+    torch.set_num_threads(num_threads)
+    instances: dict[type, Any] = {}
+    instances_lock = threading.Lock()
+
+    def run(task_id: int, target: Callable, method: str | None, args, kwargs):
+        try:
+            if method is None:
+                value = target(*args, **kwargs)
+            else:
+                with instances_lock:
+                    instance = instances.get(target)
+                    if instance is None:
+                        instance = instances[target] = target()
+                value = getattr(instance, method)(*args, **kwargs)
+            results.put(("done", index, task_id, True, value))
+        except Exception as e:
+            try:
+                results.put(("done", index, task_id, False, e))
+            except Exception:
+                # Исключение может не сериализоваться, отдаём хотя бы текст
+                results.put(("done", index, task_id, False, RuntimeError(str(e))))
+        # Наблюдения метрик копятся в реестре воркера, родитель сливает их к себе
+        snapshot = metrics.registry.take()
+        if snapshot:
+            results.put(("metrics", index, snapshot))
+
+    # Задачи ждут в очереди, пока воркер прогревается
+    error = None
+    if config.WARMUP_ENABLED:
+        try:
+            warm_up()
+        except Exception as e:
+            error = str(e)
+    # Метрики, унаследованные от родителя при fork, и прогрев не считаем
+    metrics.registry.take()
+    results.put(("ready", index, error))
+
+    # Несколько задач в одном воркере выполняются параллельно, чтобы их
+    # генерации склеивались планировщиком ModelManager в общий батч
+    with ThreadPoolExecutor(max_workers=config.BATCH_MAX_SIZE) as executor:
+        while True:
+            task = tasks.get()
+            if task is None:
+                return
+            executor.submit(run, *task)
+
+
+class InferencePool:
+    """Пул процессов для инференса.
+
+    Модель загружается в родителе до fork, поэтому воркеры разделяют веса
+    copy-on-write. У каждого воркера свой torch.set_num_threads, вызовы идут
+    через очереди multiprocessing и ожидаются из asyncio, не блокируя цикл.
+    """
+
+    def __init__(self, workers: int, threads_per_worker: int):
+        self.workers = workers
+        self.threads_per_worker = threads_per_worker or max(
+            1, (os.cpu_count() or 1) // workers
+        )
+        self._context = multiprocessing.get_context(config.INFERENCE_START_METHOD)
+        self._results = self._context.Queue()
+        self._processes: list = [None] * workers
+        self._queues: list = [None] * workers
+        # Задачи, отданные воркеру и ещё не завершённые: при его падении
+        # они завершаются ошибкой, даже если воркер не успел их начать
+        self._assigned: dict[int, set[int]] = {index: set() for index in range(workers)}
+        self._ready: set[int] = set()
+        self._pending: dict[int, tuple[asyncio.AbstractEventLoop, asyncio.Future]] = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._listener: threading.Thread | None = None
+        self._stopping = False
+
+    def start(self):
+        readiness.update(state="loading", workers_ready=0, workers_total=self.workers)
+        if config.INFERENCE_START_METHOD == "fork":
+            # Веса загружаются до fork и дальше разделяются всеми воркерами
+            manager = ModelManager()
+            if config.INFERENCE_BACKEND == "hf":
+                manager.get_model()
+            if config.PRESCREEN_ENABLED:
+                manager.get_model(config.EMBEDDING_MODEL, role="embedding")
+            readiness.update(model_loaded=True)
+        readiness.update(state="warming")
+
+        for index in range(self.workers):
+            self._spawn(index)
+
+        self._listener = threading.Thread(
+            target=self._listen, name="inference-pool", daemon=True
+        )
+        self._listener.start()
+        logger.info(
+            f"Пул инференса запущен: {self.workers} процессов "
+            f"по {self.threads_per_worker} потоков"
+        )
+
+    def _spawn(self, index: int):
+        # У каждого воркера своя очередь задач: замена упавшего воркера
+        # не получит задачи, которые уже завершены ошибкой
+        tasks = self._context.Queue()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(index, tasks, self._results, self.threads_per_worker),
+            name=f"inference-worker-{index}",
+            daemon=True,
+        )
+        process.start()
+        self._queues[index] = tasks
+        self._processes[index] = process
+
+    def _pick_worker(self) -> int:
+        # Пока замена упавшего воркера прогревается, задачи идут готовым
+        candidates = [index for index in range(self.workers) if index in self._ready]
+        return min(
+            candidates or range(self.workers),
+            key=lambda index: len(self._assigned[index]),
+        )
+
+    async def call(self, target: Callable, method: str | None, *args, **kwargs):
+        """Выполняет target(*args) или target().method(*args) в одном из воркеров."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        task_id = next(self._ids)
+        with self._lock:
+            self._pending[task_id] = (loop, future)
+            index = self._pick_worker()
+            self._assigned[index].add(task_id)
+            self._queues[index].put((task_id, target, method, args, kwargs))
+        return await future
+
+    def _resolve(self, task_id: int, ok: bool, value):
+        with self._lock:
+            pending = self._pending.pop(task_id, None)
+        if pending is None:
+            return
+        loop, future = pending
+
+        def set_result():
+            if future.done():
+                return
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+        loop.call_soon_threadsafe(set_result)
+
+    def _listen(self):
+        while not self._stopping:
+            try:
+                message = self._results.get(timeout=1)
+            except queue.Empty:
+                message = None
+            if message is not None:
+                self._handle(message)
+            # Живость проверяем на каждом шаге: под нагрузкой очередь
+            # результатов не пустеет, и падение иначе осталось бы незамеченным
+            self._check_workers()
+
+    def _handle(self, message: tuple):
+        if message[0] == "metrics":
+            metrics.registry.merge(message[2])
+        elif message[0] == "ready":
+            _, index, error = message
+            self._worker_ready(index, error)
+        else:
+            _, index, task_id, ok, value = message
+            with self._lock:
+                self._assigned[index].discard(task_id)
+            self._resolve(task_id, ok, value)
+
+    def _worker_ready(self, index: int, error: str | None):
+        if error is not None:
+            logger.error(f"Ошибка прогрева воркера {index}: {error}")
+            readiness.update(state="failed", error=error)
+            return
+        with self._lock:
+            self._ready.add(index)
+            ready = len(self._ready)
+        readiness.update(workers_ready=ready, model_loaded=True)
+        if ready == self.workers:
+            readiness.update(state="ready", compiled=True)
+
+    def _check_workers(self):
+        for index, process in enumerate(self._processes):
+            if process.is_alive() or self._stopping:
+                continue
+            logger.error(f"Воркер инференса {index} упал (код {process.exitcode})")
+            with self._lock:
+                self._ready.discard(index)
+                ready = len(self._ready)
+                lost, self._assigned[index] = self._assigned[index], set()
+                dead_queue = self._queues[index]
+                self._spawn(index)
+            # Замена воркера прогревается: пока она не готова, пул не готов целиком
+            if readiness.state == "ready":
+                readiness.update(state="warming")
+            readiness.update(workers_ready=ready)
+            dead_queue.cancel_join_thread()
+            dead_queue.close()
+            for task_id in lost:
+                self._resolve(
+                    task_id, False, RuntimeError("Воркер инференса завершился аварийно")
+                )
+
+    def stop(self):
+        self._stopping = True
+        for tasks in self._queues:
+            tasks.put(None)
+        for process in self._processes:
+            process.join(timeout=5)
+        with self._lock:
+            pending = list(self._pending)
+        for task_id in pending:
+            self._resolve(task_id, False, RuntimeError("Пул инференса остановлен"))
+
+
+_pool: InferencePool | None = None
+
+
+def start_pool() -> InferencePool | None:
+    """Запускает пул, если INFERENCE_WORKERS > 0. Вызывать до старта event loop."""
+    global _pool
+    if config.INFERENCE_WORKERS > 0 and _pool is None:
+        _pool = InferencePool(
+            config.INFERENCE_WORKERS, config.INFERENCE_THREADS_PER_WORKER
+        )
+        _pool.start()
+    return _pool
+
+
+def get_pool() -> InferencePool | None:
+    return _pool
+
+
+def stop_pool():
+    global _pool
+    if _pool is not None:
+        _pool.stop()
+        _pool = None
+
+
+async def run_inference(function: Callable, *args, **kwargs):
+    """Вызывает функцию cv_ai в пуле, а без пула — в потоке текущего процесса,
+    чтобы не блокировать event loop бота и API."""
+    if _pool is not None:
+        return await _pool.call(function, None, *args, **kwargs)
+    return await asyncio.to_thread(function, *args, **kwargs)
+
+
+class InferenceProxy:
+    """Асинхронный двойник класса cv_ai (Shrinker, AnswersAnalyzer, ...): те же
+    методы с теми же аргументами, но корутины, исполняемые в пуле инференса."""
+
+    def __init__(self, cls: type):
+        self._cls = cls
+        self._local = None
+        self._local_lock = threading.Lock()
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        async def call(*args, **kwargs):
+            if _pool is not None:
+                return await _pool.call(self._cls, name, *args, **kwargs)
+            return await asyncio.to_thread(self._call_local, name, *args, **kwargs)
+
+        return call
+
+    def _call_local(self, name: str, *args, **kwargs):
+        with self._local_lock:
+            if self._local is None:
+                self._local = self._cls()
+        return getattr(self._local, name)(*args, **kwargs)
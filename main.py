@@ -6,6 +6,8 @@ from fastapi import FastAPI
 from app.bot.start_bot import start_bot
 from app.config import config
 from app.presentation.api import router
+from cv_ai.warmup import start_warmup
+from cv_ai.workers import start_pool, stop_pool
 
 app = FastAPI()
 app.include_router(router)
@@ -24,4 +26,11 @@ async def main() -> None:
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    # Процессы инференса форкаются до запуска event loop, бота и uvicorn.
+    # Пул прогревает модель в воркерах, без пула прогрев идёт в фоновом потоке
+    if start_pool() is None:
+        start_warmup()
+    try:
+        asyncio.run(main())
+    finally:
+        stop_pool()
@@ -0,0 +1,55 @@
+import pytest
+import torch
+from tokenizers import Tokenizer, decoders, models, pre_tokenizers, trainers
+from transformers import PreTrainedTokenizerFast, Qwen2Config, Qwen2ForCausalLM
+
+CHAT_TEMPLATE = (
+    "{% for m in messages %}<|im_start|>{{ m['role'] }}\n{{ m['content'] }}"
+    "<|im_end|>\n{% endfor %}{% if add_generation_prompt %}<|im_start|>assistant\n"
+    "{% endif %}"
+)
+CORPUS = (
+    "Опытный Python-разработчик: FastAPI, PostgreSQL, Docker, asyncio. "
+    "Вакансия: backend-разработчик, требования — Python, SQL, REST API. "
+    "Оценка соответствия резюме вакансии от 0 до 100. Вопросы для интервью."
+)
+
+
+@pytest.fixture(scope="session")
+def tiny_model(tmp_path_factory) -> str:
+    """Маленькая случайная Qwen2 с обученным на лету BPE-токенизатором:
+    хватает для проверки рантаймов и генерации без скачивания весов."""
+    path = tmp_path_factory.mktemp("tiny-qwen2")
+
+    tokenizer = Tokenizer(models.BPE())
+    tokenizer.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    tokenizer.decoder = decoders.ByteLevel()
+    trainer = trainers.BpeTrainer(
+        vocab_size=400,
+        special_tokens=["<|endoftext|>", "<|im_start|>", "<|im_end|>"],
+        initial_alphabet=pre_tokenizers.ByteLevel.alphabet(),
+    )
+    tokenizer.train_from_iterator([CORPUS] * 3, trainer)
+    fast_tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=tokenizer,
+        eos_token="<|im_end|>",
+        pad_token="<|endoftext|>",
+        model_input_names=["input_ids", "attention_mask"],
+    )
+    fast_tokenizer.chat_template = CHAT_TEMPLATE
+    fast_tokenizer.save_pretrained(path)
+
+    torch.manual_seed(0)
+    model_config = Qwen2Config(
+        vocab_size=len(fast_tokenizer),
+        hidden_size=64,
+        intermediate_size=128,
+        num_hidden_layers=2,
+        num_attention_heads=4,
+        num_key_value_heads=2,
+        max_position_embeddings=1024,
+        eos_token_id=fast_tokenizer.eos_token_id,
+        pad_token_id=fast_tokenizer.pad_token_id,
+    )
+    Qwen2ForCausalLM(model_config).save_pretrained(path)
+    return str(path)
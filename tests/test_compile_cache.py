@@ -0,0 +1,55 @@
+import os
+
+import pytest
+import torch
+
+from cv_ai.config import config
+from cv_ai.model_init import ModelManager
+
+PROMPT = "Вакансия: backend-разработчик Python. Резюме: FastAPI, PostgreSQL."
+
+
+@pytest.fixture
+def manager(tiny_model, tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "MODEL_RUNTIME", "torch")
+    monkeypatch.setattr(config, "QUANTIZATION", "none")
+    monkeypatch.setattr(config, "DRAFT_MODEL", "")
+    monkeypatch.setattr(config, "TORCH_COMPILE", True)
+    monkeypatch.setattr(config, "COMPILE_CACHE_DIR", str(tmp_path / "compiled"))
+    manager = ModelManager()
+    monkeypatch.setattr(manager, "cache_dir", str(tmp_path))
+    monkeypatch.setattr(manager, "idle_ttl", 0)
+    manager.clear_cache()
+    torch.compiler.reset()
+    yield manager
+    manager.clear_cache()
+    torch.compiler.reset()
+
+
+@pytest.mark.skipif(
+    not hasattr(torch.compiler, "load_cache_artifacts"),
+    reason="torch без переносимого кэша компиляции",
+)
+def test_second_start_loads_compiled_artifacts(manager, tiny_model, monkeypatch):
+    entry = manager.get_entry(tiny_model, torch.float32)
+    path = entry.compile_cache
+    assert path is not None
+    # Прогрев: generate вызывает скомпилированный forward и на префилле, и на декоде
+    entry.scheduler.generate(PROMPT, max_new_tokens=4)
+    manager.save_compile_cache()
+    assert os.path.getsize(path) > 0
+
+    # Второй старт: новый процесс видит только файл артефактов
+    manager.clear_cache()
+    torch.compiler.reset()
+    loaded = []
+    load = torch.compiler.load_cache_artifacts
+    monkeypatch.setattr(
+        torch.compiler,
+        "load_cache_artifacts",
+        lambda data: loaded.append(len(data)) or load(data),
+    )
+    entry = manager.get_entry(tiny_model, torch.float32)
+    assert entry.compile_cache is None
+    assert loaded and loaded[0] > 0
+    assert entry.scheduler.generate(PROMPT, max_new_tokens=4)
@@ -0,0 +1,173 @@
+import asyncio
+import json
+import threading
+
+import httpx
+import pytest
+
+from cv_ai.backends import HTTPBackend
+from cv_ai.stopping import StopSpec
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+def make_backend(handler, **kwargs) -> HTTPBackend:
+    kwargs.setdefault("api", "ollama")
+    return HTTPBackend(
+        "http://llm.local/",
+        "llama3",
+        transport=httpx.MockTransport(handler),
+        **kwargs,
+    )
+
+
+@pytest.fixture
+def backends():
+    created = []
+
+    def create(handler, **kwargs):
+        backend = make_backend(handler, **kwargs)
+        created.append(backend)
+        return backend
+
+    yield create
+    for backend in created:
+        backend.close()
+
+
+def test_ollama_payload(backends):
+    requests = []
+
+    def handler(request: httpx.Request):
+        requests.append(request)
+        return httpx.Response(
+            200,
+            json={
+                "message": {"content": " Оценка: 85\nлишнее"},
+                "prompt_eval_count": 12,
+                "eval_count": 4,
+                "eval_duration": 2_000_000,
+            },
+        )
+
+    backend = backends(handler)
+    text = backend.generate("Резюме", 16, stop=StopSpec(stop_strings=("\n",)))
+
+    assert text == "Оценка: 85"
+    request = requests[0]
+    assert request.url == "http://llm.local/api/chat"
+    assert json.loads(request.content) == {
+        "model": "llama3",
+        "messages": [{"role": "user", "content": "Резюме"}],
+        "stream": False,
+        "options": {"num_predict": 16, "temperature": 0, "stop": ["\n"]},
+    }
+
+
+def test_openai_payload(backends):
+    requests = []
+
+    def handler(request: httpx.Request):
+        requests.append(request)
+        return httpx.Response(
+            200,
+            json={
+                "choices": [{"message": {"content": "  готово  "}}],
+                "usage": {"prompt_tokens": 10, "completion_tokens": 2},
+            },
+        )
+
+    backend = backends(handler, api="openai", api_key="secret")
+    assert backend.generate("Резюме", 32) == "готово"
+
+    request = requests[0]
+    assert request.url == "http://llm.local/v1/chat/completions"
+    assert request.headers["Authorization"] == "Bearer secret"
+    assert json.loads(request.content) == {
+        "model": "llama3",
+        "messages": [{"role": "user", "content": "Резюме"}],
+        "max_tokens": 32,
+        "temperature": 0,
+        "stream": False,
+    }
+
+
+@pytest.mark.parametrize(
+    "api, body",
+    [
+        (
+            "ollama",
+            b'{"message": {"content": "\\u041f\\u0440"}, "done": false}\n'
+            b'{"message": {"content": "\\u0438\\u0432\\u0435\\u0442"}, "done": false}\n'
+            b'{"message": {"content": ""}, "done": true}\n'
+            b'{"message": {"content": "after done"}, "done": false}\n',
+        ),
+        (
+            "openai",
+            b'data: {"choices": [{"delta": {"role": "assistant"}}]}\n\n'
+            b'data: {"choices": [{"delta": {"content": "\\u041f\\u0440"}}]}\n\n'
+            b'data: {"choices": [{"delta": {"content": "\\u0438\\u0432\\u0435\\u0442"}}]}\n\n'
+            b"data: [DONE]\n\n",
+        ),
+    ],
+)
+async def test_stream(backends, api, body):
+    requests = []
+
+    def handler(request: httpx.Request):
+        requests.append(json.loads(request.content))
+        return httpx.Response(200, content=body)
+
+    backend = backends(handler, api=api)
+    chunks = [chunk async for chunk in backend.astream("Резюме", 8)]
+
+    assert chunks == ["Пр", "ивет"]
+    assert requests[0]["stream"] is True
+
+
+def test_concurrency_is_limited(backends):
+    active = 0
+    peak = 0
+
+    async def handler(request: httpx.Request):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.05)
+        active -= 1
+        return httpx.Response(200, json={"message": {"content": "ok"}})
+
+    backend = backends(handler, max_connections=2)
+    assert backend.generate_batch(["a"] * 6, 4) == ["ok"] * 6
+    assert peak == 2
+
+
+async def test_abandoned_stream_releases_connection(backends):
+    closed = threading.Event()
+
+    async def endless():
+        try:
+            while True:
+                yield b'{"message": {"content": "x"}, "done": false}\n'
+                await asyncio.sleep(0.01)
+        finally:
+            closed.set()
+
+    def handler(request: httpx.Request):
+        if json.loads(request.content)["stream"]:
+            return httpx.Response(200, content=endless())
+        return httpx.Response(200, json={"message": {"content": "ok"}})
+
+    # Один слот: пока брошенный поток держит его, следующий запрос не пройдёт
+    backend = backends(handler, max_connections=1)
+    stream = backend.astream("Резюме", 8)
+    assert await stream.__anext__() == "x"
+    await stream.aclose()
+
+    assert await asyncio.wait_for(backend.agenerate("Резюме", 4), timeout=5) == "ok"
+    assert closed.is_set()
@@ -0,0 +1,167 @@
+import threading
+
+import pytest
+import torch
+
+from cv_ai.config import config
+from cv_ai.model_init import (
+    BatchScheduler,
+    GenerationRequest,
+    ModelManager,
+    count_forwards,
+)
+from cv_ai.stopping import GenerationTimeout, StopSpec
+
+PROMPT = "Вакансия: backend-разработчик Python. Резюме: FastAPI, PostgreSQL."
+
+
+@pytest.fixture
+def manager(tiny_model, tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "MODEL_RUNTIME", "torch")
+    monkeypatch.setattr(config, "QUANTIZATION", "none")
+    monkeypatch.setattr(config, "TORCH_COMPILE", False)
+    monkeypatch.setattr(config, "DRAFT_MODEL", tiny_model)
+    manager = ModelManager()
+    monkeypatch.setattr(manager, "cache_dir", str(tmp_path))
+    monkeypatch.setattr(manager, "idle_ttl", 0)
+    manager.clear_cache()
+    yield manager
+    manager.clear_cache()
+
+
+def test_draft_is_loaded_with_generation(manager, tiny_model):
+    entry = manager.get_entry(tiny_model, torch.float32)
+    draft = entry.scheduler.draft
+    assert draft is not None
+    # Черновая модель учитывается в размере основной и не занимает место в реестре
+    assert entry.size_bytes >= 2 * draft.size_bytes
+    assert [key[2] for key in manager._entries] == ["generation"]
+
+
+def test_assisted_generation_under_tight_budget(manager, tiny_model, monkeypatch):
+    # Бюджет меньше основной и черновой моделей вместе: раньше поток
+    # планировщика выгружал собственную запись и падал на join самого себя
+    monkeypatch.setattr(manager, "memory_budget", 1)
+    text = manager.generate(PROMPT, max_new_tokens=8, model_name=tiny_model)
+    assert isinstance(text, str)
+
+
+def test_evict_while_generating_does_not_deadlock(manager, tiny_model):
+    entry = manager.get_entry(tiny_model, torch.float32)
+    future = entry.scheduler.submit(PROMPT, max_new_tokens=8)
+    clearing = threading.Thread(target=manager.clear_cache)
+    clearing.start()
+    clearing.join(timeout=60)
+    assert not clearing.is_alive()
+    future.result(timeout=60)
+
+
+def test_time_limit_is_reported(manager, tiny_model, monkeypatch):
+    monkeypatch.setattr(config, "DRAFT_MODEL", "")
+    # Ответ, оборванный max_time, не выдаётся за полный
+    with pytest.raises(GenerationTimeout):
+        manager.generate(
+            PROMPT,
+            max_new_tokens=64,
+            model_name=tiny_model,
+            stop=StopSpec(max_time=1e-4),
+        )
+
+
+def test_stop_from_scheduler_thread(tiny_model):
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+
+    model = AutoModelForCausalLM.from_pretrained(tiny_model).eval()
+    tokenizer = AutoTokenizer.from_pretrained(tiny_model)
+    scheduler = BatchScheduler(model, tokenizer, max_batch_size=1, window_ms=0)
+    scheduler.generate(PROMPT, max_new_tokens=2)
+    thread = scheduler._thread
+    # Остановка, вызванная из кода, который выполняется в потоке планировщика
+    errors = []
+    done = threading.Event()
+
+    def stop_inside():
+        try:
+            scheduler.stop()
+        except Exception as e:
+            errors.append(e)
+        finally:
+            done.set()
+
+    original = scheduler._run_batch
+
+    def run_batch(*args, **kwargs):
+        original(*args, **kwargs)
+        stop_inside()
+
+    scheduler._run_batch = run_batch
+    scheduler.submit(PROMPT, max_new_tokens=2).result(timeout=60)
+    assert done.wait(timeout=60)
+    assert not errors
+    thread.join(timeout=60)
+    assert not thread.is_alive()
+
+
+def test_count_forwards_sees_compiled_model(tiny_model):
+    from transformers import AutoModelForCausalLM
+
+    model = AutoModelForCausalLM.from_pretrained(tiny_model).eval()
+    compiled = torch.compile(model)
+    # generate обёртки выполняется исходным модулем, как в _generate_assisted
+    with count_forwards(compiled) as calls:
+        compiled._orig_mod(input_ids=torch.tensor([[1, 2, 3]]))
+    assert calls[0] == 1
+
+
+def test_score_goes_through_scheduler(manager, tiny_model, monkeypatch):
+    from transformers import AutoTokenizer
+
+    monkeypatch.setattr(config, "DRAFT_MODEL", "")
+    tokenizer = AutoTokenizer.from_pretrained(tiny_model)
+    token_ids = [5, 10, 20]
+    prompts = [PROMPT, "Резюме: Java, Spring."]
+    entry = manager.get_entry(tiny_model, torch.float32)
+    batches = []
+    score_batch = entry.scheduler._score_batch
+
+    def record(batch):
+        batches.append((threading.current_thread().name, len(batch)))
+        return score_batch(batch)
+
+    monkeypatch.setattr(entry.scheduler, "_score_batch", record)
+    probs = manager.score(prompts, token_ids, model_name=tiny_model)
+
+    # Обе оценки посчитал поток планировщика одним батчем
+    assert batches == [("batch-scheduler", 2)]
+    with torch.no_grad():
+        for prompt, row in zip(prompts, probs):
+            ids = tokenizer(prompt, return_tensors="pt", add_special_tokens=False)
+            logits = entry.model(**ids).logits[0, -1, token_ids]
+            expected = torch.softmax(logits, dim=-1)
+            assert torch.allclose(torch.tensor(row), expected, atol=1e-4)
+
+
+def test_prefix_cache_is_shared_by_batch(manager, tiny_model, monkeypatch):
+    monkeypatch.setattr(config, "DRAFT_MODEL", "")
+    scheduler = manager.get_entry(tiny_model, torch.float32).scheduler
+    prefix = "Оценка соответствия резюме вакансии от 0 до 100. "
+    batch = [
+        GenerationRequest(prompt=f"{prefix}{resume}", max_new_tokens=8, prefix=prefix)
+        for resume in ("Python, SQL.", "Опытный Python-разработчик: FastAPI, Docker.")
+    ]
+    scores = []
+    generate = scheduler.model.generate
+
+    def record(**kwargs):
+        outputs = generate(**kwargs, output_scores=True, return_dict_in_generate=True)
+        scores.append(torch.stack(outputs.scores))
+        return outputs.sequences
+
+    monkeypatch.setattr(scheduler.model, "generate", record)
+
+    assert scheduler._can_reuse_prefix(batch)
+    # Кэш префикса, размноженный на батч, даёт те же логиты, что полный префилл
+    cached, _ = scheduler._generate_with_prefix(batch, 8)
+    plain, _ = scheduler._generate_batch(batch, 8)
+    assert cached == plain
+    assert torch.allclose(scores[0], scores[1], atol=1e-4)
@@ -0,0 +1,45 @@
+import pytest
+import torch
+from transformers import AutoModelForCausalLM, AutoTokenizer
+
+from cv_ai.model_init import ModelManager
+
+pytest.importorskip("optimum.onnxruntime")
+
+PROMPT = "Вакансия: backend-разработчик Python. Резюме: FastAPI, PostgreSQL."
+
+
+@pytest.fixture
+def models(tiny_model, tmp_path, monkeypatch):
+    manager = ModelManager()
+    # Экспорт ONNX пишется во временный кэш, а не в model_cache репозитория
+    monkeypatch.setattr(manager, "cache_dir", str(tmp_path))
+    onnx_model, size_bytes = manager._load_onnx(tiny_model)
+    torch_model = AutoModelForCausalLM.from_pretrained(tiny_model).eval()
+    tokenizer = AutoTokenizer.from_pretrained(tiny_model)
+    return torch_model, onnx_model, tokenizer, size_bytes
+
+
+def test_export_is_saved(models):
+    *_, size_bytes = models
+    assert size_bytes > 0
+
+
+def test_next_token_logits_match(models):
+    torch_model, onnx_model, tokenizer, _ = models
+    inputs = tokenizer(PROMPT, return_tensors="pt")
+    with torch.no_grad():
+        expected = torch_model(**inputs).logits[0, -1]
+    actual = onnx_model(**inputs).logits[0, -1]
+    assert torch.allclose(expected, actual, atol=1e-4)
+    assert expected.argmax() == actual.argmax()
+
+
+def test_greedy_generation_matches(models):
+    torch_model, onnx_model, tokenizer, _ = models
+    inputs = tokenizer(PROMPT, return_tensors="pt")
+    options = {"max_new_tokens": 16, "do_sample": False, "min_new_tokens": 16}
+    with torch.no_grad():
+        expected = torch_model.generate(**inputs, **options)
+    actual = onnx_model.generate(**inputs, **options)
+    assert torch.equal(expected, actual)
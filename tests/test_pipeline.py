@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+
+from app.bot.pipeline import Pipeline, Stage
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+async def source(items, delay: float = 0.0):
+    for item in items:
+        if delay:
+            await asyncio.sleep(delay)
+        yield item
+
+
+async def run(stages, items, delay: float = 0.0):
+    results = []
+
+    async def sink(item):
+        results.append(item)
+
+    await Pipeline(stages=[*stages, Stage("sink", sink)]).run(source(items, delay))
+    return results
+
+
+async def test_batch_is_sent_when_full():
+    batches = []
+
+    async def double(items):
+        batches.append(list(items))
+        return [item * 2 for item in items]
+
+    results = await run(
+        [Stage("double", double, batch_size=3, batch_wait=10)], range(7)
+    )
+
+    assert results == [item * 2 for item in range(7)]
+    assert batches == [[0, 1, 2], [3, 4, 5], [6]]
+
+
+async def test_batch_is_sent_after_wait():
+    batches = []
+
+    async def keep(items):
+        batches.append(list(items))
+        return items
+
+    # Элементы приходят реже окна ожидания: батч не ждёт, пока наберётся
+    results = await run(
+        [Stage("keep", keep, batch_size=8, batch_wait=0.01)], range(3), delay=0.05
+    )
+
+    assert results == [0, 1, 2]
+    assert batches == [[0], [1], [2]]
+
+
+async def test_batch_error_is_reported_for_every_item():
+    errors = []
+
+    async def fail(items):
+        raise ValueError("эмбеддинг не посчитан")
+
+    async def on_error(stage, item, error):
+        errors.append((stage.name, item))
+
+    pipeline = Pipeline(
+        stages=[Stage("fail", fail, batch_size=4, batch_wait=1)], on_error=on_error
+    )
+    stats = await pipeline.run(source(range(4)))
+
+    assert errors == [("fail", item) for item in range(4)]
+    assert stats["fail"].errors == 4
+
+
+async def test_concurrent_batches_are_filled():
+    batches = []
+
+    async def keep(items):
+        batches.append(list(items))
+        await asyncio.sleep(0.01)
+        return items
+
+    # Работники не делят поток между собой: батчи набираются полностью
+    results = await run(
+        [Stage("keep", keep, concurrency=2, batch_size=3, batch_wait=1)], range(6)
+    )
+
+    assert sorted(results) == list(range(6))
+    assert batches == [[0, 1, 2], [3, 4, 5]]
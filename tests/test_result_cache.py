@@ -0,0 +1,68 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from cv_ai import result_cache as cache_module
+from cv_ai.config import config
+from cv_ai.generation import time_budget
+from cv_ai.result_cache import ResultCache, cached_batch_stage, cached_stage
+
+
+class Stage:
+    def __init__(self):
+        self.backend = SimpleNamespace(model_name="qwen")
+        self.calls = 0
+
+    @cached_stage("single", version=1)
+    def run(self, text):
+        self.calls += 1
+        return f"{text}:{config.MODEL_DTYPE}"
+
+    @cached_batch_stage("batch", version=1)
+    def run_batch(self, texts):
+        self.calls += len(texts)
+        return [f"{text}:{config.MODEL_DTYPE}" for text in texts]
+
+    @time_budget("SHRINK_MAX_TIME")
+    @cached_stage("slow", version=1)
+    def run_slow(self, text):
+        self.calls += 1
+        time.sleep(0.05)
+        return text
+
+
+@pytest.fixture
+def stage(monkeypatch):
+    monkeypatch.setattr(cache_module, "result_cache", ResultCache(16, None))
+    monkeypatch.setattr(config, "RESULT_CACHE_ENABLED", True)
+    monkeypatch.setattr(config, "INFERENCE_BACKEND", "hf")
+    monkeypatch.setattr(config, "MODEL_DTYPE", "float32")
+    return Stage()
+
+
+@pytest.mark.parametrize(
+    "setting, value",
+    [
+        ("MODEL_DTYPE", "bfloat16"),
+        ("MODEL_RUNTIME", "onnx"),
+        ("QUANTIZATION", "int8"),
+        ("DRAFT_MODEL", "draft"),
+    ],
+)
+def test_runtime_settings_change_key(stage, monkeypatch, setting, value):
+    stage.run("резюме")
+    stage.run_batch(["резюме"])
+    assert stage.calls == 2
+
+    monkeypatch.setattr(config, setting, value)
+    stage.run("резюме")
+    stage.run_batch(["резюме"])
+    assert stage.calls == 4
+
+
+def test_result_after_deadline_is_not_cached(stage, monkeypatch):
+    monkeypatch.setattr(config, "SHRINK_MAX_TIME", 0.01)
+    stage.run_slow("резюме")
+    stage.run_slow("резюме")
+    assert stage.calls == 2
@@ -0,0 +1,102 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from cv_ai import workers
+from cv_ai.config import config
+from cv_ai.warmup import Readiness
+from cv_ai.workers import InferencePool
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+def crash():
+    os._exit(1)
+
+
+def sleep_and_return(seconds: float):
+    time.sleep(seconds)
+    return seconds
+
+
+def echo(value):
+    return value
+
+
+class RecordingReadiness(Readiness):
+    def __init__(self):
+        super().__init__()
+        self.states = []
+
+    def update(self, **fields):
+        super().update(**fields)
+        self.states.append(self.state)
+
+
+@pytest.fixture
+def readiness(monkeypatch):
+    readiness = RecordingReadiness()
+    monkeypatch.setattr(workers, "readiness", readiness)
+    return readiness
+
+
+@pytest.fixture
+async def pool(readiness, monkeypatch):
+    # Модель в родителе не грузим: воркерам нужны только функции тестов
+    monkeypatch.setattr(config, "INFERENCE_START_METHOD", "fork")
+    monkeypatch.setattr(config, "INFERENCE_BACKEND", "ollama")
+    monkeypatch.setattr(config, "PRESCREEN_ENABLED", False)
+    monkeypatch.setattr(config, "WARMUP_ENABLED", False)
+    pools = []
+
+    async def start(size: int) -> InferencePool:
+        pool = InferencePool(size, 1)
+        pools.append(pool)
+        pool.start()
+        await asyncio.wait_for(wait_ready(readiness), timeout=30)
+        return pool
+
+    yield start
+    for pool in pools:
+        pool.stop()
+
+
+async def wait_ready(readiness: Readiness):
+    while not readiness.ready:
+        await asyncio.sleep(0.05)
+
+
+async def test_crash_fails_every_task_of_the_worker(pool, readiness):
+    inference = await pool(1)
+    # Задача в очереди воркера, которую он так и не начал, тоже не теряется
+    crashed = asyncio.ensure_future(inference.call(crash, None))
+    queued = asyncio.ensure_future(inference.call(sleep_and_return, None, 0))
+
+    for task in (crashed, queued):
+        with pytest.raises(RuntimeError, match="аварийно"):
+            await asyncio.wait_for(task, timeout=10)
+
+    assert "warming" in readiness.states
+    await asyncio.wait_for(wait_ready(readiness), timeout=30)
+    assert await asyncio.wait_for(inference.call(echo, None, 5), timeout=10) == 5
+
+
+async def test_crash_is_noticed_under_load(pool):
+    inference = await pool(2)
+    crashed = asyncio.ensure_future(inference.call(crash, None))
+    # Результаты соседнего воркера идут чаще таймаута очереди результатов
+    deadline = time.monotonic() + 10
+    while not crashed.done() and time.monotonic() < deadline:
+        await asyncio.gather(
+            *(inference.call(sleep_and_return, None, 0.05) for _ in range(4)),
+            return_exceptions=True,
+        )
+    with pytest.raises(RuntimeError, match="аварийно"):
+        await asyncio.wait_for(crashed, timeout=0.1)